@@ -0,0 +1,482 @@
+"""Local read-only JSON API of the visitor data.
+
+Serves the same series that VisitorTracker plots, so other dashboards can
+use them without opening the database. Doesn't import tkinter or matplotlib.
+
+Examples:
+    python api_server.py --port 8080
+    python api_server.py --db server.db --host 0.0.0.0 --allow-origin "*"
+
+Endpoints (GET, JSON):
+    /locations                          [{"location_id": 1, "location_name": ...}]
+    /dates?location=1                   dates with data, DD-MM-YYYY
+    /series?location=1&date=06-05-2024  hourly values of a day
+    /series?location=1&start=EPOCH&end=EPOCH&mode=max&interval=900
+    /daily-average?location=1&weekday=mon
+
+Every response has an ETag. Requests with a matching If-None-Match get an
+empty 304 response. Results are cached until the database file changes, so
+repeated polls only cost a stat() of the database file.
+"""
+
+import argparse
+from collections import OrderedDict
+import contextlib
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from typing import Callable
+from urllib.parse import parse_qs, urlsplit
+
+import constants
+import database
+from database.db_manager import MODES
+from settings.settings import Settings
+import utils
+from utils.profiling import spans
+
+HOUR = 60 * 60
+# Largest number of values in one series
+MAX_SERIES_POINTS = 10_000
+# Range of SQLite integers
+MIN_INT, MAX_INT = -(1 << 63), (1 << 63) - 1
+
+
+class ApiError(Exception):
+    """Request can't be answered. Sent to the client with its status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """Read-only database handles shared by the request threads. Handles are
+    opened when they are first needed, at most `size` of them.
+
+    :param db_path: Database file.
+    :type db_path: str
+    :param size: Largest number of open handles, defaults to 4.
+    :type size: int, optional
+    :param timeout: Seconds that a query may take (and that a request waits
+        for a free handle), defaults to 10.
+    :type timeout: float, optional
+    """
+
+    def __init__(self, db_path: str, size: int = 4, timeout: float = 10):
+        self.db_path = db_path
+        self.timeout = timeout
+        # Idle handles and the data versions they were last used with
+        self._idle: queue.LifoQueue[
+            tuple[database.SQLiteDBManager, tuple | None]
+        ] = queue.LifoQueue()
+        self._free = threading.BoundedSemaphore(size)
+        self._handles: list[database.SQLiteDBManager] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def handle(self, data_version: tuple | None = None):
+        """Borrow a handle. Its queries are stopped after `timeout` seconds.
+
+        Handles remember the data_version they were last used with. A handle
+        that was used with another version reads the storage mode again
+        (SQLiteDBManager.refresh()), so it doesn't use a stale one.
+
+        Raises:
+        - ApiError: If no handle became free in `timeout` seconds.
+        - QueryTimeout: If a query took longer than `timeout` seconds.
+        """
+        if not self._free.acquire(timeout=self.timeout):
+            raise ApiError(503, "Server is busy")
+
+        try:
+            try:
+                db_handle, version = self._idle.get_nowait()
+            except queue.Empty:
+                db_handle = database.SQLiteDBManager(self.db_path, read_only=True)
+                db_handle.connect(check_same_thread=False)
+                version = data_version
+                with self._lock:
+                    self._handles.append(db_handle)
+
+            token = database.CancellationToken(self.timeout)
+            token.attach(db_handle.conn)
+            try:
+                if version != data_version:
+                    db_handle.refresh()
+                yield db_handle
+            except sqlite3.OperationalError:
+                # Query was interrupted by the token
+                if token.stopped:
+                    token.check()
+                raise
+            finally:
+                token.detach(db_handle.conn)
+                self._idle.put((db_handle, data_version))
+        finally:
+            self._free.release()
+
+    def close(self):
+        with self._lock:
+            for db_handle in self._handles:
+                db_handle.close()
+            self._handles.clear()
+
+
+class ResultCache:
+    """Bounded LRU cache of encoded responses.
+
+    :param max_entries: Largest number of kept responses, defaults to 256.
+    :type max_entries: int, optional
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, tuple[str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> tuple[str, bytes] | None:
+        """ETag and body of a cached response, None if it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, etag: str, body: bytes):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _get_int(params: dict[str, list[str]], name: str, default=None) -> int:
+    values = params.get(name)
+    if not values:
+        if default is None:
+            raise ApiError(400, f"Missing parameter '{name}'")
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise ApiError(400, f"Parameter '{name}' must be an integer") from None
+    if not MIN_INT <= value <= MAX_INT:
+        raise ApiError(400, f"Parameter '{name}' is out of range")
+    return value
+
+
+def _get_str(params: dict[str, list[str]], name: str, default=None) -> str:
+    values = params.get(name)
+    if not values:
+        if default is None:
+            raise ApiError(400, f"Missing parameter '{name}'")
+        return default
+    return values[0]
+
+
+def get_locations(db_handle: database.SQLiteDBManager, params) -> list[dict]:
+    return [
+        {"location_id": location_id, "location_name": location_name}
+        for location_id, location_name in db_handle.get_locations()
+    ]
+
+
+def get_dates(db_handle: database.SQLiteDBManager, params) -> list[str]:
+    return db_handle.get_unique_dates(_get_int(params, "location"))
+
+
+def get_series(db_handle: database.SQLiteDBManager, params) -> dict:
+    """Values of every interval between start and end, like the Calendar and
+    Time Range graphs. `date` (DD-MM-YYYY) selects a whole day instead of
+    start and end."""
+    location_id = _get_int(params, "location")
+    mode = _get_str(params, "mode", "avg").lower()
+    interval = _get_int(params, "interval", HOUR)
+
+    if "date" in params:
+        try:
+            start = utils.formatted_date_to_epoch(f"{params['date'][0]} 00:00:00")
+        except ValueError:
+            raise ApiError(400, "Parameter 'date' must be DD-MM-YYYY") from None
+        end = utils.next_time(start, days=1)
+    else:
+        start = _get_int(params, "start")
+        end = _get_int(params, "end")
+
+    if mode not in MODES:
+        raise ApiError(400, f"Parameter 'mode' must be one of {', '.join(MODES)}")
+    if interval < 1 or start < 0 or end < start:
+        raise ApiError(400, "Invalid start, end or interval")
+    if (end - start) // interval > MAX_SERIES_POINTS:
+        raise ApiError(400, f"Series can have at most {MAX_SERIES_POINTS} values")
+
+    values = db_handle.get_data_by_mode(location_id, start, end, mode, interval)
+
+    return {
+        "location_id": location_id,
+        "mode": mode,
+        "interval": interval,
+        "timestamps": database.helpers.calculate_timestamps(start, end, interval),
+        "values": values,
+    }
+
+
+def get_daily_average(db_handle: database.SQLiteDBManager, params) -> dict:
+    """Average visitors of every hour of a weekday, like the Daily Average
+    graph. Weekday is e.g. "mon" or "Monday"."""
+    location_id = _get_int(params, "location")
+    weekday = _get_str(params, "weekday")
+    weekday = constants.WEEKDAYS.get(weekday.capitalize(), weekday.lower())
+    if weekday not in constants.WEEKDAYS.values():
+        raise ApiError(400, "Unknown weekday")
+
+    return {
+        "location_id": location_id,
+        "weekday": weekday,
+        "hours": list(range(24)),
+        "values": db_handle.get_average_visitors(location_id, weekday),
+    }
+
+
+ENDPOINTS: dict[str, Callable[[database.SQLiteDBManager, dict], object]] = {
+    "/locations": get_locations,
+    "/dates": get_dates,
+    "/series": get_series,
+    "/daily-average": get_daily_average,
+}
+
+
+class ApiServer(ThreadingHTTPServer):
+    """Threaded HTTP server of the ENDPOINTS.
+
+    :param db_path: Database file. Only read.
+    :type db_path: str
+    :param host: Address to listen on, defaults to "127.0.0.1".
+    :type host: str, optional
+    :param port: Port to listen on, defaults to 8080 (0 for any free port).
+    :type port: int, optional
+    :param pool_size: Largest number of database connections, defaults to 4.
+    :type pool_size: int, optional
+    :param cache_size: Largest number of cached responses, defaults to 256.
+    :type cache_size: int, optional
+    :param query_timeout: Seconds that a request's queries may take,
+        defaults to 10.
+    :type query_timeout: float, optional
+    :param allow_origin: Access-Control-Allow-Origin header, defaults to None
+        (no header).
+    :type allow_origin: str | None, optional
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        db_path: str,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        pool_size: int = 4,
+        cache_size: int = 256,
+        query_timeout: float = 10,
+        allow_origin: str | None = None,
+    ):
+        super().__init__((host, port), _ApiHandler)
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, pool_size, query_timeout)
+        self.cache = ResultCache(cache_size)
+        self.allow_origin = allow_origin
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "ApiServer":
+        """Serve in a daemon thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def data_version(self) -> tuple[int, ...]:
+        """Changes whenever data is written to the database (modification
+        time and size of the database and its WAL file)."""
+        version = []
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                stat = os.stat(path)
+                version += [stat.st_mtime_ns, stat.st_size]
+            except FileNotFoundError:
+                version += [0, 0]
+        return tuple(version)
+
+    def respond(self, path: str, query: str) -> tuple[str, bytes]:
+        """ETag and body of a request, from the cache if the data hasn't
+        changed.
+
+        :raises ApiError: If the request is invalid.
+        """
+        path = path.rstrip("/") or "/"
+        endpoint = ENDPOINTS.get(path)
+        if endpoint is None:
+            raise ApiError(404, f"Unknown endpoint '{path}'")
+
+        params = parse_qs(query)
+        data_version = self.data_version()
+        key = (
+            path,
+            tuple((name, tuple(values)) for name, values in sorted(params.items())),
+            data_version,
+        )
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        with spans.span("api.query"), self.pool.handle(data_version) as db_handle:
+            result = endpoint(db_handle, params)
+
+        body = json.dumps(result, separators=(",", ":")).encode("utf-8")
+        etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self.cache.put(key, etag, body)
+
+        return etag, body
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    # Headers and body are written separately. Without TCP_NODELAY the body
+    # waits for the client's delayed ACK (~40 ms).
+    disable_nagle_algorithm = True
+    server: ApiServer
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            etag, body = self.server.respond(url.path, url.query)
+        except ApiError as err:
+            self._send_error(err.status, str(err))
+            return
+        except database.QueryTimeout:
+            self._send_error(503, "Query took too long")
+            return
+        except (ValueError, TypeError, OverflowError) as err:
+            self._send_error(400, str(err))
+            return
+        except sqlite3.Error as err:
+            self._send_error(500, f"Database error: {err}")
+            return
+
+        if_none_match = self.headers.get("If-None-Match", "")
+        if etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+            self._send(304, b"", etag)
+        else:
+            self._send(200, body, etag)
+
+    def _send_error(self, status: int, message: str):
+        body = json.dumps({"error": message}).encode("utf-8")
+        self._send(status, body)
+
+    def _send(self, status: int, body: bytes, etag: str | None = None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            # Clients may keep the response but must check it with the ETag
+            self.send_header("Cache-Control", "no-cache")
+        if self.server.allow_origin:
+            self.send_header("Access-Control-Allow-Origin", self.server.allow_origin)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Serve VisitorTracker data as a read-only JSON API."
+    )
+    parser.add_argument(
+        "--db", help="database file, defaults to the database in settings"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--pool", type=int, default=4, help="largest number of connections"
+    )
+    parser.add_argument(
+        "--cache", type=int, default=256, help="largest number of cached responses"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=10, help="seconds a request may take"
+    )
+    parser.add_argument(
+        "--allow-origin", help="Access-Control-Allow-Origin header, e.g. '*'"
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    db_path = args.db or Settings().db_path
+
+    try:
+        with database.SQLiteDBManager(db_path, read_only=True):
+            pass
+    except sqlite3.Error as err:
+        print(f"Can't open database '{db_path}': {err}", file=sys.stderr)
+        return 1
+
+    server = ApiServer(
+        db_path,
+        args.host,
+        args.port,
+        pool_size=args.pool,
+        cache_size=args.cache,
+        query_timeout=args.timeout,
+        allow_origin=args.allow_origin,
+    )
+    print(f"Serving {db_path} at {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
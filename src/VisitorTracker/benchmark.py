@@ -0,0 +1,261 @@
+"""Collector throughput benchmark.
+
+Fetches, parses and stores readings from a local stub server (see
+retrieve_data/stub_server.py) as fast as possible and reports samples per
+second, latency percentiles of every stage and CPU use. The stub server runs
+in its own process, so its CPU use isn't counted.
+
+Examples:
+    python benchmark.py --requests 500 --locations 20
+    python benchmark.py --write single --storage changes --change-rate 0.05
+    python benchmark.py --latency 0.02 --error-rate 0.05 --json before.json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import database
+from retrieve_data.http_client import HttpClient
+import retrieve_data.retrieve_data as rd
+
+STAGES = ("fetch", "parse", "write")
+WRITE_MODES = ("single", "batch", "spool")
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """q-th percentile (0-100) of sorted values with linear interpolation."""
+    if not sorted_values:
+        return 0.0
+
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def start_stub_server(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    """Start the stub server in a subprocess. Returns the process and its URL."""
+    command = [
+        sys.executable,
+        os.path.join(os.path.dirname(__file__), "retrieve_data", "stub_server.py"),
+        "--port",
+        "0",
+        "--locations",
+        str(args.locations),
+        "--latency",
+        str(args.latency),
+        "--error-rate",
+        str(args.error_rate),
+        "--change-rate",
+        str(args.change_rate),
+        # Every response has its own timestamp, so readings aren't duplicates
+        "--start-epoch",
+        str(int(time.time()) - args.requests * 30),
+        "--date-step",
+        "30",
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    match = re.search(r"http://\S+", process.stdout.readline())
+    if not match:
+        process.kill()
+        raise RuntimeError("Stub server didn't start")
+
+    return process, match.group(0)
+
+
+def run_benchmark(
+    url: str,
+    db_path: str,
+    requests: int,
+    write_mode: str = "batch",
+    storage_mode: str = "all",
+) -> dict:
+    """Fetch, parse and write `requests` responses one after another.
+
+    :return: Results: samples, failed requests, wall and CPU seconds and the
+        per-stage latencies in seconds.
+    :rtype: dict
+    """
+    timings: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    samples = 0
+    failed = 0
+
+    with database.SQLiteDBManager(db_path) as db_handle:
+        db_handle.set_storage_mode(storage_mode)
+        spool = None
+        if write_mode == "spool":
+            spool = database.Spool(db_path + ".spool")
+
+        with HttpClient(backoff=0.01) as client:
+            cpu_start = os.times()
+            wall_start = time.perf_counter()
+
+            for _ in range(requests):
+                start = time.perf_counter()
+                try:
+                    response = rd._get_html(url, client)
+                except Exception:
+                    failed += 1
+                    continue
+                fetched = time.perf_counter()
+                locations = rd._parse_locations_data(response)
+                parsed = time.perf_counter()
+
+                readings = [
+                    (
+                        location.location_id,
+                        location.location_name,
+                        location.epoch_timestamp,
+                        location.location_visitors,
+                        30,
+                    )
+                    for location in locations
+                ]
+                if write_mode == "single":
+                    for reading in readings:
+                        samples += db_handle.add_data(*reading)
+                elif write_mode == "spool":
+                    spool.append(readings)
+                    samples += spool.drain(db_handle)
+                else:
+                    samples += db_handle.add_many_data(readings)
+                written = time.perf_counter()
+
+                timings["fetch"].append(fetched - start)
+                timings["parse"].append(parsed - fetched)
+                timings["write"].append(written - parsed)
+
+            wall = time.perf_counter() - wall_start
+            cpu_end = os.times()
+
+        if spool is not None:
+            spool.close()
+            os.remove(spool.path)
+
+    return {
+        "requests": requests,
+        "failed": failed,
+        "samples": samples,
+        "wall": wall,
+        "cpu_user": cpu_end.user - cpu_start.user,
+        "cpu_system": cpu_end.system - cpu_start.system,
+        "timings": timings,
+    }
+
+
+def summarize(result: dict) -> dict:
+    """Samples per second, CPU share and percentiles (ms) of every stage."""
+    summary = {
+        "samples": result["samples"],
+        "failed_requests": result["failed"],
+        "wall_s": round(result["wall"], 3),
+        "samples_per_s": round(result["samples"] / result["wall"], 1)
+        if result["wall"]
+        else 0.0,
+        "cpu_s": round(result["cpu_user"] + result["cpu_system"], 3),
+        "cpu_percent": round(
+            100 * (result["cpu_user"] + result["cpu_system"]) / result["wall"], 1
+        )
+        if result["wall"]
+        else 0.0,
+        "stages": {},
+    }
+
+    for stage, values in result["timings"].items():
+        values = sorted(values)
+        summary["stages"][stage] = {
+            f"p{q}": round(percentile(values, q) * 1000, 3) for q in (50, 90, 99)
+        }
+        summary["stages"][stage]["max"] = round(max(values, default=0) * 1000, 3)
+
+    return summary
+
+
+def print_summary(summary: dict):
+    print(
+        f"{summary['samples']} samples in {summary['wall_s']} s: "
+        f"{summary['samples_per_s']} samples/s "
+        f"({summary['failed_requests']} failed requests)"
+    )
+    print(f"CPU: {summary['cpu_s']} s ({summary['cpu_percent']} % of wall time)")
+    print(f"{'stage':<8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)")
+    for stage, values in summary["stages"].items():
+        print(
+            f"{stage:<8}"
+            + "".join(f"{values[key]:>10.3f}" for key in ("p50", "p90", "p99", "max"))
+        )
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark fetching, parsing and storing collector data "
+        "against a local stub server."
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--locations", type=int, default=10)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="stub response delay in seconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of 503 responses (0-1)"
+    )
+    parser.add_argument(
+        "--change-rate",
+        type=float,
+        default=0.05,
+        help="chance that a visitor count changes between responses (0-1)",
+    )
+    parser.add_argument("--write", default="batch", choices=WRITE_MODES)
+    parser.add_argument(
+        "--storage", default="all", choices=database.db_manager.STORAGE_MODES
+    )
+    parser.add_argument(
+        "--db", help="database file, defaults to a new temporary database"
+    )
+    parser.add_argument("--url", help="use a running server instead of the stub")
+    parser.add_argument("--json", help="also write the results to a JSON file")
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_stub_server(args)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = args.db or os.path.join(tmp_dir, "benchmark.db")
+            result = run_benchmark(url, db_path, args.requests, args.write, args.storage)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    summary = summarize(result)
+    summary["options"] = {
+        key: getattr(args, key)
+        for key in ("requests", "locations", "latency", "error_rate", "write", "storage")
+    }
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""Headless data collector.
+
+Collects visitor data into the database without the GUI, e.g. on a server
+without a display. Imports nothing from tkinter or matplotlib.
+
+Examples:
+    python collector.py --interval 60
+    python collector.py --db server.db --location "FUN Oulu Ritaharju" --pid-file /run/visitortracker.pid
+
+SIGINT and SIGTERM write the readings that were already fetched and stop
+the collector. Only one collector can use the same PID file at a time.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import logging
+import os
+from pathlib import Path
+import signal
+import sys
+from typing import Callable, List
+
+import constants
+import database
+from retrieve_data.async_collector import AsyncCollector
+from retrieve_data.retrieve_data import Location
+from retrieve_data.sources import Source, get_sources
+from settings.settings import Settings
+
+logger = logging.getLogger("collector")
+
+
+class PidFileLocked(Exception):
+    """Another process holds the PID file."""
+
+
+class PidFile:
+    """PID file that is locked while the collector runs (fcntl on POSIX,
+    msvcrt on Windows). The lock is released automatically if the process
+    dies, so a stale file doesn't block the next start.
+
+    :param path: Path of the PID file.
+    :type path: str
+    :raises PidFileLocked: On enter, if another process holds the lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._file = None
+
+    def __enter__(self):
+        while True:
+            file = open(self.path, "a+", encoding="utf-8")
+            try:
+                self._lock(file)
+            except OSError as err:
+                file.seek(0)
+                pid = file.read().strip() or "unknown"
+                file.close()
+                raise PidFileLocked(
+                    f"{self.path} is locked by another collector (pid {pid})"
+                ) from err
+
+            if self._is_current(file):
+                break
+            # The previous collector removed the file after we opened it.
+            # Its lock no longer protects the path, so lock the new file.
+            self._unlock(file)
+            file.close()
+
+        file.seek(0)
+        file.truncate()
+        file.write(f"{os.getpid()}\n")
+        file.flush()
+        self._file = file
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # POSIX can remove a file that is still locked, Windows can't. A
+        # collector that opened the removed file notices it in __enter__.
+        if os.name != "nt":
+            self.path.unlink(missing_ok=True)
+        self._unlock(self._file)
+        self._file.close()
+        self._file = None
+        if os.name == "nt":
+            self.path.unlink(missing_ok=True)
+
+    def _is_current(self, file) -> bool:
+        """True if the locked file is still the file at the path. Always True
+        on Windows, where a locked file can't be removed."""
+        if os.name == "nt":
+            return True
+        try:
+            return os.stat(self.path).st_ino == os.fstat(file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _lock(file):
+        if os.name == "nt":
+            import msvcrt
+
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    @staticmethod
+    def _unlock(file):
+        if os.name == "nt":
+            import msvcrt
+
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def _location_filter(
+    parser: Callable, locations: List[str]
+) -> Callable[..., List[Location]]:
+    """Wrap a source parser so that it only returns the given locations
+    (names or IDs)."""
+
+    def parse(response) -> List[Location]:
+        return [
+            location
+            for location in parser(response)
+            if location.location_name in locations
+            or str(location.location_id) in locations
+        ]
+
+    return parse
+
+
+def _select_sources(
+    names: List[str], interval: int, locations: List[str]
+) -> List[Source]:
+    """Registered sources with the given names (all if empty), polled every
+    interval seconds and filtered to the given locations (all if empty).
+
+    :raises KeyError: If a source name isn't registered.
+    """
+    sources = {source.name: source for source in get_sources()}
+    for name in names:
+        if name not in sources:
+            raise KeyError(f"Unknown source '{name}'")
+
+    selected = []
+    for source in sources.values():
+        if names and source.name not in names:
+            continue
+        source = dataclasses.replace(source, interval=interval)
+        if locations:
+            source.parser = _location_filter(source.parser, locations)
+        selected.append(source)
+
+    return selected
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Collect VisitorTracker data without the GUI."
+    )
+    parser.add_argument(
+        "--db", help="database file, defaults to the database in settings"
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=constants.DATA_COL_INTERVALS[constants.DEFAULT_COL_INTERVAL],
+        help="seconds between collections, defaults to %(default)s",
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        default=[],
+        help="source to collect from (repeatable), defaults to all sources: "
+        + ", ".join(source.name for source in get_sources()),
+    )
+    parser.add_argument(
+        "--location",
+        action="append",
+        default=[],
+        help="location name or ID to store (repeatable), defaults to all",
+    )
+    parser.add_argument(
+        "--pid-file",
+        default="collector.pid",
+        help="PID/lock file, defaults to %(default)s",
+    )
+    parser.add_argument(
+        "--spool",
+        default="collector.spool",
+        help="spool file that keeps readings while the database is "
+        "unavailable, defaults to %(default)s",
+    )
+    parser.add_argument(
+        "--no-spool", action="store_true", help="write straight to the database"
+    )
+    parser.add_argument(
+        "--duration", type=float, help="stop after this many seconds"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="concurrent requests"
+    )
+    parser.add_argument("--log-file", help="write the log to a file")
+    parser.add_argument(
+        "--trace-sql",
+        action="store_true",
+        help="log slow SQL queries and full table scans as warnings",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="log only warnings and errors"
+    )
+
+    args = parser.parse_args(argv)
+    if args.interval < 1:
+        parser.error("--interval must be at least 1 second")
+
+    return args
+
+
+async def _collect(collector: AsyncCollector, duration: float | None):
+    """Run the collector until SIGINT/SIGTERM or duration."""
+    loop = asyncio.get_running_loop()
+
+    def stop():
+        logger.info("Stopping, writing fetched readings...")
+        collector.stop()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop)
+        except NotImplementedError:
+            # Windows event loops don't support signal handlers
+            signal.signal(sig, lambda *_: stop())
+
+    await collector.run(duration)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+
+    logging.basicConfig(
+        filename=args.log_file,
+        level=logging.WARNING if args.quiet else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+    db_path = args.db or Settings().db_path
+
+    if args.trace_sql:
+        database.query_log.enabled = True
+        database.query_log.on_alert = lambda record: logger.warning(
+            "%s (%.1f ms, %s rows): %s",
+            "Slow query" if record.slow else "Full table scan",
+            record.duration * 1000,
+            record.rows,
+            record.sql,
+        )
+
+    try:
+        sources = _select_sources(args.source, args.interval, args.location)
+    except KeyError as err:
+        logger.error(err.args[0])
+        return 1
+
+    collector = AsyncCollector(
+        db_path,
+        sources,
+        max_concurrency=args.concurrency,
+        on_event=logger.info,
+        spool_path=None if args.no_spool else args.spool,
+    )
+
+    try:
+        with PidFile(args.pid_file):
+            logger.info(
+                "Collecting %s every %s s into %s (pid %s)",
+                ", ".join(source.name for source in sources),
+                args.interval,
+                db_path,
+                os.getpid(),
+            )
+            try:
+                asyncio.run(_collect(collector, args.duration))
+            except OSError as err:
+                logger.error("Can't open spool %s: %s", args.spool, err)
+                return 1
+    except PidFileLocked as err:
+        logger.error(err)
+        return 1
+
+    for name, stats in collector.stats.items():
+        logger.info(
+            "%s: %s polls, %s failures, %s missed",
+            name,
+            stats.polls,
+            stats.failures,
+            stats.missed,
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,6 +14,14 @@ DATA_COL_INTERVALS = {
     "30 min": 30 * 60,
     "1 hour": 60 * 60,
 }
+# Interval adapts to how fast the visitor count changes
+ADAPTIVE_COL_INTERVAL = "Adaptive"
+ADAPTIVE_MIN_INTERVAL = 30
+ADAPTIVE_MAX_INTERVAL = 30 * 60
+# Collections that start this many seconds late are logged
+COL_LATENESS_WARNING = 1.0
+# Longest time in seconds that fetching data may take per collection, retries included
+FETCH_TIME_BUDGET = 20
 GRAPH_AMOUNTS = {"1": 1, "2": 2, "4": 4}
 DEFAULT_GRAPH_AMOUNT = 1
 MAX_GRAPH_AMOUNT = 4
@@ -39,6 +47,19 @@ DEFAULT_TIMEZONE = pytz.timezone("Europe/Helsinki")
 
 TEXTBOX_WIDTH = 350
 
+# Database events log
+LOG_MAX_ENTRIES = 500  # Entries shown in the textbox
+LOG_TRIM_SLACK = 100  # Textbox is trimmed when it has this many extra entries
+LOG_DRAIN_INTERVAL = 100  # ms
+LOG_FILE = "collector.log"
+LOG_FILE_MAX_BYTES = 1_000_000
+LOG_FILE_BACKUPS = 3
+
+# Performance page
+PERF_REFRESH_INTERVAL = 1000  # ms
+PERF_DEFAULT_FILENAME = "spans.json"
+QUERY_LOG_DEFAULT_FILENAME = "queries.json"
+
 
 DATE_ENTRY_FONT_SMALLNESS = 7  # Smaller number -> Smaller font size
 CALENDAR_FONT_SMALLNESS = 12  # Smaller number -> Smaller font size
@@ -64,6 +85,10 @@ DEFAULT_WEEKDAY = "Monday"
 TIME_RANGES = ["48 hours", "7 days", "1 month", "3 months", "6 months", "1 year", "ALL"]
 DEFAULT_TIME_RANGE = "48 hours"
 
+# Time ranges that can be updated live from collected data without the database
+LIVE_TIME_RANGES = ["48 hours"]
+LIVE_WINDOW = 48 * 60 * 60
+
 NO_LOCATIONS = {"No locations": 0}
 DEFAULT_LOCATION = next(iter(NO_LOCATIONS.keys()))
 
@@ -89,9 +114,38 @@ PAD = 8
 
 YMODES = ["Auto Limit", "No Limit", "Select Limit"]
 
+# "Shared Figure" draws the 2- and 4-graph layouts on a single figure
+GRAPH_LAYOUTS = ["Separate Figures", "Shared Figure"]
+DEFAULT_GRAPH_LAYOUT = "Separate Figures"
+
 DB_FILETYPES = [("SQLite Database (*.db)", "*.db")]
 DB_DEFAULTEXTENSION = DB_FILETYPES[0][1]
 DB_INITIALDIR= "src/VisitorTracker/database"
 
-IMG_FILETYPES = [("PNG (*.png)", "*.png"), ("JPEG (*.jpg)", "*.jpg")]
+IMG_FILETYPES = [
+    ("PNG (*.png)", "*.png"),
+    ("JPEG (*.jpg)", "*.jpg"),
+    ("SVG (*.svg)", "*.svg"),
+    ("PDF (*.pdf)", "*.pdf"),
+]
 IMG_DEFAULTEXTENSION = IMG_FILETYPES[0][1]
+
+EXPORT_DPIS = ["100", "150", "200", "300", "600"]
+DEFAULT_EXPORT_DPI = 200
+
+# Longest time in seconds that loading a graph may take, 0 for no limit
+QUERY_TIMEOUTS = {"5 s": 5, "10 s": 10, "30 s": 30, "1 min": 60, "No Limit": 0}
+DEFAULT_QUERY_TIMEOUT = 30
+PLOT_POLL_INTERVAL = 50  # ms
+
+# Data export
+EXPORT_FILE_FORMATS = {"CSV": "csv", "JSON Lines": "jsonl"}
+DEFAULT_EXPORT_FILE_FORMAT = "CSV"
+EXPORT_ALL_LOCATIONS = "All locations"
+EXPORT_TIME_RANGES = TIME_RANGES
+DEFAULT_EXPORT_TIME_RANGE = "ALL"
+EXPORT_POLL_INTERVAL = 100  # ms
+
+# Data import
+CSV_FILETYPES = [("CSV (*.csv)", "*.csv"), ("Compressed CSV (*.csv.gz)", "*.csv.gz")]
+IMPORT_POLL_INTERVAL = 100  # ms
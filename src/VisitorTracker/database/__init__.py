@@ -1,4 +1,20 @@
-__all__ = ["db_manager", "helpers"]
+__all__ = [
+    "cancellation",
+    "columnar",
+    "csv_import",
+    "db_manager",
+    "export",
+    "helpers",
+    "query_log",
+    "spool",
+    "startup_snapshot",
+]
 
+from .cancellation import CancellationToken, QueryCancelled, QueryTimeout
+from .csv_import import CsvImportError, DataImportJob, ImportResult, import_csv
 from .db_manager import SQLiteDBManager, DB_REL_PATH
+from .export import DataExportJob, export_activity, iter_activity
 from .helpers import *
+from .query_log import QueryLog, QueryRecord, query_log
+from .spool import Spool
+from .startup_snapshot import StartupSnapshot, load_startup_snapshot
@@ -0,0 +1,94 @@
+import sqlite3
+import threading
+import time
+
+# SQLite virtual machine instructions between deadline checks
+PROGRESS_STEPS = 10_000
+
+
+class QueryCancelled(Exception):
+    """A query was stopped with CancellationToken.cancel()."""
+
+
+class QueryTimeout(QueryCancelled):
+    """A query ran past the deadline of its CancellationToken."""
+
+
+class CancellationToken:
+    """Stops the queries of the SQLiteDBManagers that use it.
+
+    `cancel()` interrupts the running query right away with
+    Connection.interrupt(), and a progress handler stops queries that run
+    past the deadline or after cancel(). The handler runs every
+    PROGRESS_STEPS steps, so short queries aren't stopped by it. Instead
+    SQLiteDBManager checks the token when it connects and between the queries
+    of methods that run many of them. SQLiteDBManager raises QueryCancelled
+    or QueryTimeout when its with-block ends because of a stopped query.
+
+    cancel() can be called from any thread.
+
+    Example:
+        token = CancellationToken(timeout=10)
+        with SQLiteDBManager(db_path, token=token) as db_handle:
+            db_handle.get_average_visitors(location_id, "mon")
+
+    :param timeout: Seconds from now until queries are stopped, defaults to
+        None (no deadline).
+    :type timeout: float | None, optional
+    """
+
+    def __init__(self, timeout: float | None = None):
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self._cancelled = False
+        self._connections: set[sqlite3.Connection] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    @property
+    def stopped(self) -> bool:
+        """True if queries are stopped (cancelled or past the deadline)."""
+        return self._cancelled or self.expired
+
+    def cancel(self):
+        """Stop the running and future queries."""
+        with self._lock:
+            self._cancelled = True
+            for conn in self._connections:
+                conn.interrupt()
+
+    def check(self):
+        """
+        Raises:
+        - QueryCancelled: If the token has been cancelled.
+        - QueryTimeout: If the deadline has passed.
+        """
+        if self._cancelled:
+            raise QueryCancelled("Query was cancelled")
+        if self.expired:
+            raise QueryTimeout(f"Query took longer than {self.timeout} s")
+
+    def attach(self, conn: sqlite3.Connection):
+        """Stop the queries of the connection when the token is stopped.
+        Call detach() before closing the connection."""
+        conn.set_progress_handler(self._progress, PROGRESS_STEPS)
+        with self._lock:
+            self._connections.add(conn)
+            if self._cancelled:
+                conn.interrupt()
+
+    def detach(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._connections.discard(conn)
+        conn.set_progress_handler(None, 0)
+
+    def _progress(self) -> int:
+        # Non-zero stops the query with sqlite3.OperationalError("interrupted")
+        return int(self.stopped)
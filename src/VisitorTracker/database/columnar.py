@@ -0,0 +1,458 @@
+"""Columnar snapshots of visitor_activity for fast bulk transfer.
+
+A snapshot is a directory with four .npy arrays per location and a
+manifest.json that lists the locations:
+
+    manifest.json
+    1.epoch.npy      int64, sorted epoch timestamps
+    1.visitors.npy   int32
+    1.interval.npy   int32, sample intervals, 0 for readings without one
+    1.run.npy        int8, 1 for readings stored as runs (is_run)
+
+Version 1 snapshots have no run arrays. Their readings are runs if the
+manifest has "run_length".
+
+Arrays are plain .npy files, so they can be memory-mapped with
+np.load(mmap_mode="r") and only the pages that are used are read.
+SnapshotReader does that and answers the same questions as
+SQLiteDBManager (get_data_by_mode() etc.) straight from the arrays.
+
+Example:
+    with SQLiteDBManager(db_path, read_only=True) as db_handle:
+        export_snapshot(db_handle, "snapshot")
+    with SQLiteDBManager(other_db_path) as db_handle:
+        import_snapshot(db_handle, "snapshot")
+"""
+
+import contextlib
+import itertools
+import json
+import math
+import os
+import time
+from typing import Iterable, List
+
+import numpy as np
+
+from . import helpers
+from .csv_import import FAST_PRAGMAS, ImportResult, temporary_pragmas
+from .db_manager import (
+    DEFAULT_SAMPLE_INTERVAL,
+    KEEPALIVE_INTERVAL,
+    MODES,
+    SQLiteDBManager,
+)
+
+MANIFEST = "manifest.json"
+SNAPSHOT_FORMAT = "visitortracker-snapshot"
+SNAPSHOT_VERSION = 2
+# Sample interval of readings that don't have one
+NO_INTERVAL = 0
+
+_ROW_DTYPE = np.dtype(
+    [
+        ("epoch", np.int64),
+        ("visitors", np.int32),
+        ("interval", np.int32),
+        ("run", np.int8),
+    ]
+)
+
+
+class SnapshotError(ValueError):
+    """The directory isn't a snapshot or has an unsupported version."""
+
+
+def _array_path(snapshot_dir: str, location_id: int, column: str) -> str:
+    return os.path.join(snapshot_dir, f"{location_id}.{column}.npy")
+
+
+def read_manifest(snapshot_dir: str) -> dict:
+    """Manifest of a snapshot.
+
+    :raises SnapshotError: If the manifest is missing or not supported.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST), encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, json.JSONDecodeError) as err:
+        raise SnapshotError(f"'{snapshot_dir}' is not a snapshot: {err}") from err
+
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"'{snapshot_dir}' is not a snapshot")
+    if manifest.get("version", 0) > SNAPSHOT_VERSION:
+        raise SnapshotError(
+            f"Snapshot version {manifest['version']} is newer than supported "
+            f"version {SNAPSHOT_VERSION}"
+        )
+
+    return manifest
+
+
+def export_snapshot(
+    db_handle: SQLiteDBManager,
+    snapshot_dir: str,
+    location_ids: Iterable[int] | None = None,
+) -> dict:
+    """Write the readings of the locations to a snapshot directory.
+
+    Each location is read with one query straight into a NumPy array
+    (np.fromiter), without a list of rows in between. The manifest is
+    written last, so a directory without one is an unfinished snapshot.
+
+    :param db_handle: Open database handle.
+    :type db_handle: SQLiteDBManager
+    :param snapshot_dir: Directory to write. Created if it doesn't exist.
+    :type snapshot_dir: str
+    :param location_ids: Locations to export, defaults to None (all).
+    :type location_ids: Iterable[int] | None, optional
+    :return: The written manifest.
+    :rtype: dict
+    """
+    columns = _columns(db_handle)
+    interval = "sample_interval" if "sample_interval" in columns else "NULL"
+    is_run = "is_run" if "is_run" in columns else "NULL"
+    pstmt_rows = f"""SELECT
+            epoch_timestamp,
+            location_visitors,
+            COALESCE({interval}, {NO_INTERVAL}),
+            COALESCE({is_run}, 0)
+        FROM visitor_activity
+        WHERE (location_id = ?)
+        ORDER BY epoch_timestamp"""
+
+    names = dict(db_handle.get_locations())
+    if location_ids is None:
+        location_ids = sorted(names)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(os.path.join(snapshot_dir, MANIFEST))
+
+    locations = []
+    with contextlib.closing(db_handle.conn.cursor()) as cursor:
+        for location_id in location_ids:
+            db_handle._check_token()
+            cursor.execute(pstmt_rows, (location_id,))
+            rows = np.fromiter(cursor, dtype=_ROW_DTYPE)
+
+            for column in _ROW_DTYPE.names:
+                np.save(_array_path(snapshot_dir, location_id, column), rows[column])
+
+            locations.append(
+                {
+                    "location_id": location_id,
+                    "location_name": names.get(location_id, str(location_id)),
+                    "rows": len(rows),
+                    "first": int(rows["epoch"][0]) if len(rows) else None,
+                    "last": int(rows["epoch"][-1]) if len(rows) else None,
+                }
+            )
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created": int(time.time()),
+        "run_length": db_handle.run_length,
+        "locations": locations,
+    }
+    with open(os.path.join(snapshot_dir, MANIFEST), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+
+    return manifest
+
+
+def import_snapshot(
+    db_handle: SQLiteDBManager,
+    snapshot_dir: str,
+    location_ids: Iterable[int] | None = None,
+    fast: bool = True,
+) -> ImportResult:
+    """Add the readings of a snapshot that aren't in the database yet.
+
+    The existing timestamps of each location are read into an array and the
+    new readings are selected with np.isin(). All new readings are then added
+    with one executemany() in a single transaction.
+
+    If the snapshot has readings stored as runs, the database is marked to
+    have runs (like import_data()).
+
+    :param db_handle: Open, writable database handle.
+    :type db_handle: SQLiteDBManager
+    :param snapshot_dir: Snapshot directory.
+    :type snapshot_dir: str
+    :param location_ids: Locations to import, defaults to None (all in the
+        snapshot).
+    :type location_ids: Iterable[int] | None, optional
+    :param fast: Use FAST_PRAGMAS during the import, defaults to True.
+    :type fast: bool, optional
+    :raises SnapshotError: If the directory isn't a supported snapshot.
+    :return: Row counts of the import. Snapshots have no invalid rows.
+    :rtype: ImportResult
+    """
+    pstmt_existing = """SELECT epoch_timestamp FROM visitor_activity
+        WHERE (location_id = ?) AND (? <= epoch_timestamp AND epoch_timestamp <= ?)"""
+    pstmt_add_location = (
+        "INSERT OR IGNORE INTO locations(location_id, location_name) VALUES(?,?)"
+    )
+    pstmt_add_visitors = """INSERT OR IGNORE INTO visitor_activity(
+        location_id, epoch_timestamp, location_visitors, sample_interval, is_run)
+        VALUES(?,?,?,NULLIF(?,?),NULLIF(?,0))"""
+
+    reader = SnapshotReader(snapshot_dir)
+    wanted = None if location_ids is None else set(location_ids)
+    result = ImportResult()
+    new_rows = []
+
+    known_locations = {row[0] for row in db_handle.get_locations()}
+    with contextlib.closing(db_handle.conn.cursor()) as cursor:
+        for location in reader.manifest["locations"]:
+            location_id = location["location_id"]
+            if wanted is not None and location_id not in wanted:
+                continue
+            db_handle._check_token()
+
+            epochs, visitors, intervals, runs = reader.arrays(location_id)
+            result.rows += len(epochs)
+            if not len(epochs):
+                continue
+
+            cursor.execute(
+                pstmt_existing, (location_id, int(epochs[0]), int(epochs[-1]))
+            )
+            existing = np.fromiter((row[0] for row in cursor), dtype=np.int64)
+            new = ~np.isin(epochs, existing, assume_unique=True)
+
+            if new.any():
+                new_rows.append(
+                    (location_id, epochs[new], visitors[new], intervals[new], runs[new])
+                )
+
+        pragmas = (
+            temporary_pragmas(db_handle, FAST_PRAGMAS)
+            if fast
+            else contextlib.nullcontext()
+        )
+        with pragmas:
+            cursor.executemany(
+                pstmt_add_location,
+                [
+                    (location["location_id"], location["location_name"])
+                    for location in reader.manifest["locations"]
+                    if location["location_id"] not in known_locations
+                    and (wanted is None or location["location_id"] in wanted)
+                ],
+            )
+            result.locations = max(cursor.rowcount, 0)
+
+            cursor.executemany(
+                pstmt_add_visitors,
+                itertools.chain.from_iterable(
+                    zip(
+                        itertools.repeat(location_id),
+                        epochs.tolist(),
+                        visitors.tolist(),
+                        intervals.tolist(),
+                        itertools.repeat(NO_INTERVAL),
+                        runs.tolist(),
+                    )
+                    for location_id, epochs, visitors, intervals, runs in new_rows
+                ),
+            )
+            result.added = max(cursor.rowcount, 0)
+
+            if reader.run_length and not db_handle.run_length:
+                # Imported rows with is_run are valid until the next reading
+                cursor.execute(
+                    "INSERT OR REPLACE INTO meta(key, value) VALUES('run_length', '1')"
+                )
+                db_handle.run_length = True
+            db_handle.conn.commit()
+
+    result.duplicates = result.rows - result.added
+    return result
+
+
+def _weights(
+    epochs: np.ndarray, intervals: np.ndarray, first: int, last: int
+) -> np.ndarray:
+    """Weights of the readings first..last-1 in averages, like
+    db_manager.SAMPLE_WEIGHT: the sample interval, or for readings without one
+    the time until the next reading, at most DEFAULT_SAMPLE_INTERVAL."""
+    gaps = np.full(last - first, DEFAULT_SAMPLE_INTERVAL, dtype=np.int64)
+    following = epochs[first + 1 : last + 1]
+    gaps[: len(following)] = np.minimum(
+        following - epochs[first : first + len(following)], DEFAULT_SAMPLE_INTERVAL
+    )
+
+    return np.where(
+        intervals[first:last] == NO_INTERVAL, gaps, intervals[first:last]
+    ).astype(np.int64)
+
+
+def _columns(db_handle: SQLiteDBManager) -> list[str]:
+    """Columns of visitor_activity. Read-only connections to databases created
+    by old versions don't have sample_interval or is_run."""
+    with contextlib.closing(db_handle.conn.cursor()) as cursor:
+        cursor.execute("PRAGMA table_info(visitor_activity)")
+        return [row[1] for row in cursor.fetchall()]
+
+
+class SnapshotReader:
+    """Reads a snapshot with memory-mapped arrays. Query methods have the same
+    arguments and results as the methods of SQLiteDBManager with the same
+    names, without a database.
+
+    :param snapshot_dir: Snapshot directory.
+    :type snapshot_dir: str
+    :param mmap: Memory-map the arrays instead of reading them, defaults to
+        True.
+    :type mmap: bool, optional
+    :raises SnapshotError: If the directory isn't a supported snapshot.
+    """
+
+    def __init__(self, snapshot_dir: str, mmap: bool = True):
+        self.snapshot_dir = snapshot_dir
+        self.manifest = read_manifest(snapshot_dir)
+        self.run_length: bool = self.manifest.get("run_length", False)
+        self._mmap_mode = "r" if mmap else None
+        self._arrays: dict[int, tuple[np.ndarray, ...]] = {}
+
+    def arrays(self, location_id: int) -> tuple[np.ndarray, ...]:
+        """Epochs, visitors, sample intervals (NO_INTERVAL if unknown) and run
+        flags of the location. Empty arrays if the location isn't in the
+        snapshot."""
+        if location_id not in self._arrays:
+            if location_id in dict(self.get_locations()):
+                epochs, visitors, intervals = (
+                    np.load(
+                        _array_path(self.snapshot_dir, location_id, column),
+                        mmap_mode=self._mmap_mode,
+                    )
+                    for column in ("epoch", "visitors", "interval")
+                )
+                if self.manifest.get("version", 1) >= 2:
+                    runs = np.load(
+                        _array_path(self.snapshot_dir, location_id, "run"),
+                        mmap_mode=self._mmap_mode,
+                    )
+                else:
+                    runs = np.full(len(epochs), self.run_length, dtype=np.int8)
+                self._arrays[location_id] = (epochs, visitors, intervals, runs)
+            else:
+                self._arrays[location_id] = tuple(
+                    np.empty(0, dtype=_ROW_DTYPE[column])
+                    for column in _ROW_DTYPE.names
+                )
+
+        return self._arrays[location_id]
+
+    def get_locations(self) -> List[tuple[int, str]]:
+        return [
+            (location["location_id"], location["location_name"])
+            for location in self.manifest["locations"]
+        ]
+
+    def get_locations_dict(self) -> dict[str, int]:
+        return {name: location_id for location_id, name in self.get_locations()}
+
+    def get_activity_between(
+        self, location_id: int, start: int, end: int
+    ) -> List[tuple]:
+        """(epoch_timestamp, location_visitors) readings from start (inclusive)
+        to end (exclusive)."""
+        if not helpers.are_ints(location_id, start, end) or (start < 0 or end < 0):
+            return []
+
+        if self.run_length:
+            return helpers.expand_runs(
+                self._get_runs(location_id, start, end), start, end
+            )
+
+        epochs, visitors, _, _ = self.arrays(location_id)
+        first, last = np.searchsorted(epochs, [start, end])
+        return list(zip(epochs[first:last].tolist(), visitors[first:last].tolist()))
+
+    def get_data_by_mode(
+        self, location_id: int, start: int, end: int, mode: str, interval: int
+    ) -> list[int | float | None]:
+        """Aggregate of every interval from start to end, see
+        SQLiteDBManager.get_data_by_mode(). Calculated with np.bincount() and
+        ufunc.reduceat() instead of a query per interval.
+
+        :raises TypeError: If 'location_id', 'start', 'end' or 'interval' are
+            not integers.
+        :raises ValueError: If 'start', 'end', or 'interval' are negative.
+        """
+        if not helpers.are_ints(location_id, start, end, interval):
+            raise TypeError(
+                "Arguments 'location_id', 'start', and 'end' must be integers."
+            )
+        if start < 0 or end < 0 or interval < 0:
+            raise ValueError("Start and end values must be non-negative.")
+
+        mode = MODES.get(mode.lower())
+        if self.run_length:
+            return helpers.aggregate_runs(
+                self._get_runs(location_id, start, end), start, end, interval, mode
+            )
+
+        loops = math.floor((end - start) / interval)
+        epochs, visitors, intervals, _ = self.arrays(location_id)
+        first, last = np.searchsorted(epochs, [start, start + loops * interval])
+
+        bins = (epochs[first:last] - start) // interval
+        visitors = visitors[first:last].astype(np.int64)
+
+        counts = np.bincount(bins, minlength=loops)
+        if mode == "COUNT":
+            return counts.tolist()
+
+        if mode == "SUM":
+            values = np.bincount(bins, visitors, minlength=loops).astype(np.int64)
+            values = values.tolist()
+        elif mode == "AVG":
+            weights = _weights(epochs, intervals, first, last)
+            sums = np.bincount(bins, visitors * weights, minlength=loops)
+            seconds = np.bincount(bins, weights, minlength=loops)
+            values = (sums / np.where(seconds, seconds, 1)).tolist()
+        elif mode in ("MAX", "MIN"):
+            ufunc = np.maximum if mode == "MAX" else np.minimum
+            values = [None] * loops
+            if len(bins):
+                # Readings are sorted, so each bin is a contiguous slice
+                used, starts = np.unique(bins, return_index=True)
+                for index, value in zip(
+                    used.tolist(), ufunc.reduceat(visitors, starts).tolist()
+                ):
+                    values[index] = value
+        else:
+            raise ValueError(f"Unknown mode '{mode}'")
+
+        # Intervals without readings are None, like SQL aggregates of no rows
+        return [
+            value if count else None for value, count in zip(values, counts.tolist())
+        ]
+
+    def _get_runs(
+        self, location_id: int, start: int, end: int
+    ) -> List[tuple[int, int, int, int, bool]]:
+        """Runs that overlap start and end, see SQLiteDBManager._get_runs()."""
+        epochs, visitors, intervals, runs = self.arrays(location_id)
+        first, last = np.searchsorted(epochs, [start, end])
+        first = max(first - 1, 0)  # Last reading before start
+
+        rows = [
+            (epoch, visitors, None if interval == NO_INTERVAL else interval, is_run)
+            for epoch, visitors, interval, is_run in zip(
+                epochs[first:last].tolist(),
+                visitors[first:last].tolist(),
+                intervals[first:last].tolist(),
+                runs[first:last].tolist(),
+            )
+        ]
+        after = int(epochs[last]) if last < len(epochs) else None
+
+        return helpers.make_runs(
+            rows, after, KEEPALIVE_INTERVAL, DEFAULT_SAMPLE_INTERVAL
+        )
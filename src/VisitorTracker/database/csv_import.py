@@ -0,0 +1,300 @@
+"""Bulk import of visitor readings from CSV files.
+
+The file is parsed as a stream and inserted in chunks of CHUNK_SIZE rows with
+one executemany() and commit per chunk. Rows are sorted into primary key order
+before they are inserted, so the index is mostly appended to. Readings that
+already exist are skipped (INSERT OR IGNORE).
+
+While the import runs, the connection uses FAST_PRAGMAS (no fsync, larger
+page cache, temporary data in memory). The previous values are restored when
+the import ends. The rollback journal is kept, so an interrupted import
+leaves the database intact with the committed chunks.
+
+CSV files need a header row with at least the columns location_id,
+epoch_timestamp and location_visitors. location_name, sample_interval and
+is_run are optional, so files written by export_activity() can be imported as
+they are.
+Files ending with .gz are decompressed.
+"""
+
+import contextlib
+import csv
+from dataclasses import dataclass, field
+import gzip
+import io
+from operator import itemgetter
+import os
+import threading
+from typing import Callable, IO, Iterator, List
+
+from .cancellation import CancellationToken
+from .db_manager import SQLiteDBManager
+
+REQUIRED_COLUMNS = ("location_id", "epoch_timestamp", "location_visitors")
+OPTIONAL_COLUMNS = ("location_name", "sample_interval", "is_run")
+# Rows per executemany() and commit
+CHUNK_SIZE = 100_000
+FAST_PRAGMAS = {
+    "synchronous": "OFF",
+    "cache_size": "-262144",  # KiB
+    "temp_store": "MEMORY",
+}
+# Primary key of a row
+_KEY = itemgetter(0, 1)
+# Line numbers of invalid rows that are kept for the result
+MAX_INVALID_LINES = 20
+
+
+class CsvImportError(ValueError):
+    """The CSV file can't be imported (e.g. missing columns)."""
+
+
+@dataclass
+class ImportResult:
+    """Row counts of an import. `rows` doesn't include the header row."""
+
+    rows: int = 0
+    added: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    # Line numbers (header is line 1) of the first invalid rows
+    invalid_lines: list[int] = field(default_factory=list)
+    locations: int = 0  # New locations
+
+
+def import_csv(
+    db_handle: SQLiteDBManager,
+    file_path: str,
+    chunk_size: int = CHUNK_SIZE,
+    fast: bool = True,
+    reindex: bool = False,
+    progress: Callable[[int, int], None] | None = None,
+) -> ImportResult:
+    """Add the readings of a CSV file to the database.
+
+    Rows with missing or non-integer values are counted as invalid and
+    skipped. Readings whose (location_id, epoch_timestamp) already exists are
+    counted as duplicates. Locations that aren't in the database are added,
+    named by location_name or by their ID if the file has no names.
+
+    Readings are stored as they are, also in "changes" storage mode. If the
+    file has readings stored as runs (is_run), the database is marked to have
+    runs (like import_data()).
+
+    Every chunk is committed, so a cancelled (token of db_handle) or failed
+    import keeps the chunks that were already added. Importing the file again
+    adds the rest.
+
+    :param db_handle: Open, writable database handle.
+    :type db_handle: SQLiteDBManager
+    :param file_path: CSV file, optionally gzip compressed (.gz).
+    :type file_path: str
+    :param chunk_size: Rows per transaction, defaults to CHUNK_SIZE.
+    :type chunk_size: int, optional
+    :param fast: Use FAST_PRAGMAS during the import, defaults to True.
+    :type fast: bool, optional
+    :param reindex: Rebuild the indexes of visitor_activity and update the
+        query planner statistics after the import, defaults to False.
+    :type reindex: bool, optional
+    :param progress: Called with bytes read and the file size after every
+        chunk. Sizes of .gz files are compressed sizes.
+    :type progress: Callable[[int, int], None] | None, optional
+    :raises CsvImportError: If the header is missing or lacks required columns.
+    :return: Row counts of the import.
+    :rtype: ImportResult
+    """
+    pstmt_add_location = (
+        "INSERT OR IGNORE INTO locations(location_id, location_name) VALUES(?,?)"
+    )
+    pstmt_add_visitors = """INSERT OR IGNORE INTO visitor_activity(
+        location_id, epoch_timestamp, location_visitors, sample_interval, is_run)
+        VALUES(?,?,?,?,?)"""
+
+    result = ImportResult()
+    size = os.path.getsize(file_path)
+    names: dict[int, str] = {}
+
+    with contextlib.ExitStack() as stack:
+        raw = stack.enter_context(open(file_path, "rb"))
+        file = stack.enter_context(_open_text(raw, file_path.lower().endswith(".gz")))
+        cursor = stack.enter_context(contextlib.closing(db_handle.conn.cursor()))
+        if fast:
+            stack.enter_context(temporary_pragmas(db_handle, FAST_PRAGMAS))
+
+        known_locations = {row[0] for row in db_handle.get_locations()}
+
+        for chunk in _iter_chunks(file, chunk_size, names, result):
+            db_handle._check_token()
+
+            new_locations = names.keys() - known_locations
+            if new_locations:
+                cursor.executemany(
+                    pstmt_add_location,
+                    [(loc_id, names[loc_id]) for loc_id in sorted(new_locations)],
+                )
+                known_locations |= new_locations
+                result.locations += len(new_locations)
+
+            chunk.sort(key=_KEY)
+            cursor.executemany(pstmt_add_visitors, chunk)
+            result.added += max(cursor.rowcount, 0)
+            if not db_handle.run_length and any(row[4] for row in chunk):
+                # Imported rows with is_run are valid until the next reading
+                cursor.execute(
+                    "INSERT OR REPLACE INTO meta(key, value) VALUES('run_length', '1')"
+                )
+                db_handle.run_length = True
+            db_handle.conn.commit()
+
+            if progress:
+                progress(raw.tell(), size)
+
+        result.duplicates = result.rows - result.invalid - result.added
+
+    if reindex:
+        with contextlib.closing(db_handle.conn.cursor()) as cursor:
+            cursor.execute("REINDEX visitor_activity")
+            cursor.execute("ANALYZE visitor_activity")
+            db_handle.conn.commit()
+
+    return result
+
+
+def _open_text(raw: io.BufferedReader, compress: bool) -> io.TextIOWrapper:
+    if compress:
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+@contextlib.contextmanager
+def temporary_pragmas(db_handle: SQLiteDBManager, pragmas: dict[str, str]):
+    """Set the pragmas of the connection and restore them afterwards. Changes
+    that weren't committed are rolled back at the end."""
+    with contextlib.closing(db_handle.conn.cursor()) as cursor:
+        previous = {}
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}")
+            previous[name] = cursor.fetchone()[0]
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+    try:
+        yield
+    finally:
+        # Pragmas like synchronous can't be changed inside a transaction
+        db_handle.conn.rollback()
+        with contextlib.closing(db_handle.conn.cursor()) as cursor:
+            for name, value in previous.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def _iter_chunks(
+    file: IO[str],
+    chunk_size: int,
+    names: dict[int, str],
+    result: ImportResult,
+) -> Iterator[List[tuple[int, int, int, int | None, int | None]]]:
+    """Yield lists of (location_id, epoch_timestamp, location_visitors,
+    sample_interval, is_run) rows. Adds the location names to `names` and counts the
+    rows and invalid rows to `result`."""
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        raise CsvImportError("File is empty")
+
+    columns = {name.strip().lower(): index for index, name in enumerate(header)}
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise CsvImportError(f"Missing columns: {', '.join(missing)}")
+
+    id_col, epoch_col, visitors_col = (columns[name] for name in REQUIRED_COLUMNS)
+    name_col = columns.get("location_name")
+    interval_col = columns.get("sample_interval")
+    run_col = columns.get("is_run")
+
+    chunk = []
+    for row in reader:
+        try:
+            location_id = int(row[id_col])
+            reading = (
+                location_id,
+                int(row[epoch_col]),
+                int(row[visitors_col]),
+                (
+                    int(row[interval_col])
+                    if interval_col is not None and row[interval_col]
+                    else None
+                ),
+                (1 if run_col is not None and int(row[run_col] or 0) else None),
+            )
+        except (ValueError, IndexError):
+            result.rows += 1
+            result.invalid += 1
+            if len(result.invalid_lines) < MAX_INVALID_LINES:
+                result.invalid_lines.append(reader.line_num)
+            continue
+
+        if location_id not in names:
+            name = row[name_col] if name_col is not None else ""
+            names[location_id] = name or str(location_id)
+
+        chunk.append(reading)
+        if len(chunk) >= chunk_size:
+            result.rows += len(chunk)
+            yield chunk
+            chunk = []
+
+    if chunk:
+        result.rows += len(chunk)
+        yield chunk
+
+
+class DataImportJob(threading.Thread):
+    """Runs import_csv() on a worker thread with its own connection.
+
+    Poll `is_alive()` to find out when the import is done, and `read` and
+    `size` (bytes) for the progress. `cancel()` stops the import after the
+    current chunk. The row counts are in `result` and a failure in `error`
+    (QueryCancelled if it was cancelled).
+
+    Arguments are the same as import_csv() takes, except db_path instead of
+    an open database handle.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        file_path: str,
+        fast: bool = True,
+        reindex: bool = False,
+    ):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.file_path = file_path
+        self.fast = fast
+        self.reindex = reindex
+
+        self.token = CancellationToken()
+        self.read = 0
+        self.size = 0
+        self.result: ImportResult | None = None
+        self.error: Exception | None = None
+
+    def cancel(self):
+        """Stop the import. Safe to call from any thread."""
+        self.token.cancel()
+
+    def run(self):
+        try:
+            with SQLiteDBManager(self.db_path, token=self.token) as db_handle:
+                self.result = import_csv(
+                    db_handle,
+                    self.file_path,
+                    fast=self.fast,
+                    reindex=self.reindex,
+                    progress=self._set_read,
+                )
+        except Exception as err:
+            self.error = err
+
+    def _set_read(self, read: int, size: int):
+        self.read, self.size = read, size
@@ -6,10 +6,43 @@ import re
 import sqlite3
 from typing import List, Callable
 
+from utils.profiling import spans
+
 from . import helpers
+from .cancellation import CancellationToken
+from .query_log import query_log
 
 DB_REL_PATH = "visitorTrackingDB.db"
 
+# Rows collected before sample_interval existed have no interval. They
+# represent the time until the next reading of the location, but at most
+# DEFAULT_SAMPLE_INTERVAL seconds (data collection was stopped after them).
+DEFAULT_SAMPLE_INTERVAL = 30 * 60
+
+
+def _sample_weight(interval: str) -> str:
+    """Weight of a row in averages: seconds that the reading represents.
+    `interval` is the sample interval column, or NULL if there isn't one."""
+    return f"""COALESCE({interval}, MIN(COALESCE((
+            SELECT MIN(later.epoch_timestamp) FROM visitor_activity AS later
+            WHERE (later.location_id = visitor_activity.location_id)
+                AND (later.epoch_timestamp > visitor_activity.epoch_timestamp)
+            ) - visitor_activity.epoch_timestamp, {DEFAULT_SAMPLE_INTERVAL}),
+        {DEFAULT_SAMPLE_INTERVAL}))"""
+
+
+SAMPLE_WEIGHT = _sample_weight("sample_interval")
+
+# "all" stores every reading. "changes" stores a reading only when the visitor
+# count changes, plus keep-alive readings.
+STORAGE_MODES = ("all", "changes")
+DEFAULT_STORAGE_MODE = "all"
+
+# In "changes" mode a run of the same visitor count has a stored reading at
+# least every KEEPALIVE_INTERVAL seconds. A longer gap means that data
+# collection was stopped.
+KEEPALIVE_INTERVAL = 30 * 60
+
 MODES = {
     "avg": "AVG",
     "max": "MAX",
@@ -19,13 +52,58 @@ MODES = {
 }
 
 
+def _mode_expressions(weight: str) -> dict[str, str]:
+    """Aggregate expressions of the modes. AVG is weighted by `weight`, so
+    readings taken at different intervals are averaged correctly. SUM and
+    COUNT are the sum and the number of readings.
+
+    WEIGHTED_SUM (visitor seconds) and WEIGHT (seconds) aren't modes. They are
+    used to combine the averages of many days."""
+    return {
+        "AVG": f"SUM(location_visitors * {weight}) * 1.0 / SUM({weight})",
+        "MAX": "MAX(location_visitors)",
+        "MIN": "MIN(location_visitors)",
+        "SUM": "SUM(location_visitors)",
+        "COUNT": "COUNT(location_visitors)",
+        "WEIGHTED_SUM": f"SUM(location_visitors * {weight})",
+        "WEIGHT": f"COALESCE(SUM({weight}), 0)",
+    }
+
+
+MODE_EXPRESSIONS = _mode_expressions(SAMPLE_WEIGHT)
+# Read-only connections can't migrate databases that don't have sample_interval
+LEGACY_MODE_EXPRESSIONS = _mode_expressions(_sample_weight("NULL"))
+
+
 class SQLiteDBManager:
-    def __init__(self, dbpath):
+    def __init__(
+        self, dbpath, read_only=False, token: CancellationToken | None = None
+    ):
         """
         use "with SQLiteDBManager(dbpath) as db_handle:"
+
+        read_only=True opens the database in read-only mode. Tables aren't
+        created, so the database file must already exist.
+
+        token stops the queries of the handle when it's cancelled or its
+        deadline passes. The with-block then raises QueryCancelled or
+        QueryTimeout. Connecting with a stopped token raises right away.
         """
         self.dbpath = self._resolve_path(dbpath)
-        self.conn = sqlite3.connect(self.dbpath)
+        self.read_only = read_only
+        self.token = token
+        self.conn = None
+        self.mode_expressions = MODE_EXPRESSIONS
+        self.storage_mode = DEFAULT_STORAGE_MODE
+        # True if the database has readings stored as runs (is_run, it has
+        # been in "changes" mode). Aggregates are then calculated from runs.
+        self.run_length = False
+        self._has_runs_column = True
+
+        if read_only:
+            return
+
+        self.conn = query_log.connect(self.dbpath)
 
         sql_create_locations_table = """CREATE TABLE IF NOT EXISTS locations(
             location_id INTEGER PRIMARY KEY NOT NULL,
@@ -35,25 +113,163 @@ class SQLiteDBManager:
             location_id INTEGER NOT NULL,
             epoch_timestamp INTEGER NOT NULL,
             location_visitors INTEGER NOT NULL,
+            sample_interval INTEGER,
+            is_run INTEGER,
             PRIMARY KEY (location_id, epoch_timestamp)
             )"""
 
-        with contextlib.closing(self.conn.cursor()) as cursor:
-            cursor.execute(sql_create_locations_table)
-            cursor.execute(sql_create_visitor_activity_table)
-            self.conn.commit()
+        sql_create_meta_table = """CREATE TABLE IF NOT EXISTS meta(
+            key TEXT PRIMARY KEY NOT NULL,
+            value TEXT NOT NULL)"""
 
-        self._close()
+        try:
+            with contextlib.closing(self.conn.cursor()) as cursor:
+                cursor.execute(sql_create_locations_table)
+                cursor.execute(sql_create_visitor_activity_table)
+                cursor.execute(sql_create_meta_table)
+                self._migrate(cursor)
+                self.conn.commit()
+        finally:
+            # Also when the database is locked, so the connection isn't left
+            # open for __del__ in another thread
+            self._close()
 
     def __enter__(self):
-        self.conn = sqlite3.connect(self.dbpath)
-        return self
+        return self.connect()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self._close()
 
+        # Query was interrupted by the token
+        if (
+            self.token is not None
+            and isinstance(exc_val, sqlite3.OperationalError)
+            and self.token.stopped
+        ):
+            self.token.check()
+
+    def connect(self, check_same_thread=True):
+        """Open the database connection. Use for connections that are kept open
+        longer than a with-block, call close() when done.
+
+        check_same_thread=False lets other threads use the connection, one
+        thread at a time (e.g. a connection pool)."""
+        if self.read_only:
+            uri = f"{Path(self.dbpath).resolve().as_uri()}?mode=ro"
+            self.conn = query_log.connect(
+                uri, uri=True, check_same_thread=check_same_thread
+            )
+        else:
+            self.conn = query_log.connect(
+                self.dbpath, check_same_thread=check_same_thread
+            )
+
+        if self.token is not None:
+            self.token.attach(self.conn)
+            if self.token.stopped:
+                self._close()
+                self.token.check()
+
+        self.refresh()
+
+        return self
+
+    def refresh(self):
+        """Read the storage mode (meta table) and the columns of a read-only
+        database again. Done by connect(). Connections that are kept open
+        (e.g. in a pool) call it when another connection may have changed
+        them."""
+        if self.read_only:
+            with contextlib.closing(self.conn.cursor()) as cursor:
+                cursor.execute("PRAGMA table_info(visitor_activity)")
+                columns = [row[1] for row in cursor.fetchall()]
+
+            self.mode_expressions = (
+                MODE_EXPRESSIONS
+                if "sample_interval" in columns
+                else LEGACY_MODE_EXPRESSIONS
+            )
+            # Can't be migrated either, and has no rows stored as runs
+            self._has_runs_column = "is_run" in columns
+
+        meta = self._get_meta()
+        self.storage_mode = meta.get("storage_mode", DEFAULT_STORAGE_MODE)
+        self.run_length = meta.get("run_length") == "1" and self._has_runs_column
+
+    def close(self):
+        self._close()
+
+    def _migrate(self, cursor: sqlite3.Cursor, schema="main"):
+        """Add columns that are missing from databases created by older versions.
+
+        - sample_interval: seconds that the reading represents. NULL for old rows.
+        - is_run: 1 if the reading was stored in "changes" mode and is valid
+            until the next reading. NULL for other rows.
+        """
+        cursor.execute(f"PRAGMA {schema}.table_info(visitor_activity)")
+        columns = [row[1] for row in cursor.fetchall()]
+
+        if "sample_interval" not in columns:
+            cursor.execute(
+                f"ALTER TABLE {schema}.visitor_activity ADD COLUMN sample_interval INTEGER"
+            )
+        if "is_run" not in columns:
+            cursor.execute(
+                f"ALTER TABLE {schema}.visitor_activity ADD COLUMN is_run INTEGER"
+            )
+
+    def _get_meta(self) -> dict[str, str]:
+        """Key-value pairs of the meta table. Empty if the table doesn't exist
+        (read-only connection to a database created by an older version)."""
+        try:
+            with contextlib.closing(self.conn.cursor()) as cursor:
+                cursor.execute("SELECT key, value FROM meta")
+                return dict(cursor.fetchall())
+        except sqlite3.OperationalError:
+            return {}
+
+    def set_storage_mode(self, storage_mode: str):
+        """
+        Set how visitor readings are stored.
+
+        - "all": every reading is stored.
+        - "changes": a reading is stored only when the visitor count changes.
+            The newest reading of a run is kept by moving the last row of the
+            run forward, and a keep-alive row is stored every
+            KEEPALIVE_INTERVAL seconds. Each stored reading is valid until
+            the next one.
+
+        Rows stored in "changes" mode are marked with is_run. Only they are
+        aggregated as runs, rows stored in "all" mode (before or after) are
+        aggregated as single readings.
+
+        Raises:
+        - ValueError: If storage_mode is not in STORAGE_MODES.
+        """
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode '{storage_mode}'")
+
+        pstmt = "INSERT OR REPLACE INTO meta(key, value) VALUES(?, ?)"
+
+        with contextlib.closing(self.conn.cursor()) as cursor:
+            cursor.execute(pstmt, ("storage_mode", storage_mode))
+            if storage_mode == "changes":
+                cursor.execute(pstmt, ("run_length", "1"))
+            self.conn.commit()
+
+        self.storage_mode = storage_mode
+        self.run_length = self.run_length or storage_mode == "changes"
+
+    def _check_token(self):
+        """Raise QueryCancelled or QueryTimeout if the token has been stopped.
+        Used between the queries of methods that run many small queries."""
+        if self.token is not None:
+            self.token.check()
+
     def _close(self):
         if self.conn:
+            if self.token is not None:
+                self.token.detach(self.conn)
             self.conn.close()
             self.conn = None
 
@@ -146,10 +362,16 @@ class SQLiteDBManager:
             location_id INTEGER NOT NULL,
             epoch_timestamp INTEGER NOT NULL,
             location_visitors INTEGER NOT NULL,
+            sample_interval INTEGER,
+            is_run INTEGER,
             PRIMARY KEY (location_id, epoch_timestamp)
             )"""
         stmt_add_locs = f"INSERT OR {conflict_clause} INTO dest_db.locations SELECT * FROM main.locations"
-        stmt_add_vis_act = f"INSERT OR {conflict_clause} INTO dest_db.visitor_activity SELECT * FROM main.visitor_activity"
+        columns = (
+            "location_id, epoch_timestamp, location_visitors, sample_interval, is_run"
+        )
+        stmt_add_vis_act = f"""INSERT OR {conflict_clause} INTO dest_db.visitor_activity({columns})
+            SELECT {columns} FROM main.visitor_activity"""
 
         with contextlib.closing(self.conn.cursor()) as cursor:
             # print("Attach...", dest_db_path)
@@ -158,6 +380,17 @@ class SQLiteDBManager:
             cursor.execute(stmt_create_locs)
             # print("Create visitor activity...")
             cursor.execute(stmt_create_vis_act)
+            self._migrate(cursor, "dest_db")
+            if self.run_length:
+                # Imported rows with is_run are valid until the next reading
+                cursor.execute(
+                    """CREATE TABLE IF NOT EXISTS dest_db.meta(
+                    key TEXT PRIMARY KEY NOT NULL,
+                    value TEXT NOT NULL)"""
+                )
+                cursor.execute(
+                    "INSERT OR REPLACE INTO dest_db.meta(key, value) VALUES('run_length', '1')"
+                )
             # print("Add locations...")
             cursor.execute(stmt_add_locs)
             # print("Add visitor activity...")
@@ -166,12 +399,14 @@ class SQLiteDBManager:
             self.conn.commit()
             # print("Committed")
 
+    @spans.timed("db.add_data")
     def add_data(
         self,
         location_id: int,
         location_name: str,
         epoch_timestamp: int,
         location_visitors: int,
+        sample_interval: int | None = None,
     ) -> bool:
         try:
             self.add_location(location_id, location_name)
@@ -180,7 +415,7 @@ class SQLiteDBManager:
             return False
 
         success = self.add_visitor_activity(
-            location_id, epoch_timestamp, location_visitors
+            location_id, epoch_timestamp, location_visitors, sample_interval
         )
 
         return success
@@ -200,27 +435,182 @@ class SQLiteDBManager:
         return True
 
     def add_visitor_activity(
-        self, location_id: int, epoch_timestamp: int, location_visitors: int
+        self,
+        location_id: int,
+        epoch_timestamp: int,
+        location_visitors: int,
+        sample_interval: int | None = None,
+    ) -> bool:
+        """Add a visitor reading. sample_interval is the number of seconds the
+        reading represents (time until the next reading). It weights the reading
+        only in "avg" aggregations and in daily averages; "sum" and "count" use
+        the plain readings.
+
+        In "changes" storage mode a reading that doesn't change the visitor
+        count extends the current run instead of adding a row."""
+        with contextlib.closing(self.conn.cursor()) as cursor:
+            added = self._add_reading(
+                cursor, location_id, epoch_timestamp, location_visitors, sample_interval
+            )
+            self.conn.commit()
+
+        return added
+
+    @spans.timed("db.add_many_data")
+    def add_many_data(
+        self, readings: List[tuple[int, str, int, int, int | None]]
+    ) -> int:
+        """
+        Add many readings in a single transaction. Readings with a timestamp
+        that already exists are skipped.
+
+        Parameters:
+        - readings (List[tuple[int, str, int, int, int | None]]): (location_id,
+            location_name, epoch_timestamp, location_visitors, sample_interval)
+            tuples. Readings of a location must be in chronological order.
+
+        Returns:
+        - int: Number of added readings.
+        """
+        pstmt_add_location = (
+            "INSERT OR IGNORE INTO locations(location_id, location_name) VALUES(?,?)"
+        )
+        added = 0
+
+        with contextlib.closing(self.conn.cursor()) as cursor:
+            cursor.executemany(
+                pstmt_add_location,
+                {(reading[0], reading[1]) for reading in readings},
+            )
+            for location_id, _, epoch, visitors, sample_interval in readings:
+                added += self._add_reading(
+                    cursor, location_id, epoch, visitors, sample_interval
+                )
+            self.conn.commit()
+
+        return added
+
+    def _add_reading(
+        self,
+        cursor: sqlite3.Cursor,
+        location_id: int,
+        epoch_timestamp: int,
+        location_visitors: int,
+        sample_interval: int | None,
     ) -> bool:
+        """Add a reading without committing. Returns False if a reading with the
+        same timestamp already exists.
+
+        In "changes" mode readings at or before the newest stored reading of
+        the location are skipped. Their run has already been stored or moved
+        past them, e.g. when a spool is drained again after a crash."""
+        is_run = self.storage_mode == "changes"
+        if is_run:
+            newest = self._get_newest_rows(cursor, location_id)
+            if newest and epoch_timestamp <= newest[0][0]:
+                return False
+            if self._extend_run(
+                cursor,
+                location_id,
+                epoch_timestamp,
+                location_visitors,
+                sample_interval,
+                newest,
+            ):
+                return True
+
         pstmt_add_visitor_data: str = (
-            "INSERT INTO visitor_activity(location_id, epoch_timestamp, location_visitors) VALUES(?,?,?)"
+            "INSERT INTO visitor_activity(location_id, epoch_timestamp, location_visitors, sample_interval, is_run) VALUES(?,?,?,?,?)"
         )
 
         try:
-            with contextlib.closing(self.conn.cursor()) as cursor:
-                cursor.execute(
-                    pstmt_add_visitor_data,
-                    (location_id, epoch_timestamp, location_visitors),
-                )
-                self.conn.commit()
+            cursor.execute(
+                pstmt_add_visitor_data,
+                (
+                    location_id,
+                    epoch_timestamp,
+                    location_visitors,
+                    sample_interval,
+                    1 if is_run else None,
+                ),
+            )
         except sqlite3.IntegrityError:
             return False
 
         return True
 
+    def _get_newest_rows(
+        self, cursor: sqlite3.Cursor, location_id: int
+    ) -> List[tuple[int, int, int, int | None]]:
+        """(epoch_timestamp, location_visitors, sample_interval, is_run) of the
+        two newest rows of the location, newest first."""
+        pstmt_last_two = f"""SELECT epoch_timestamp, location_visitors,
+                COALESCE(sample_interval, {DEFAULT_SAMPLE_INTERVAL}), is_run
+            FROM visitor_activity
+            WHERE (location_id = ?)
+            ORDER BY epoch_timestamp DESC LIMIT 2"""
+
+        cursor.execute(pstmt_last_two, (location_id,))
+        return cursor.fetchall()
+
+    def _extend_run(
+        self,
+        cursor: sqlite3.Cursor,
+        location_id: int,
+        epoch_timestamp: int,
+        location_visitors: int,
+        sample_interval: int | None,
+        rows: List[tuple[int, int, int, int | None]],
+    ) -> bool:
+        """
+        Extend the newest run of the location to epoch_timestamp by moving its
+        last row forward. A run is only extended if its two newest rows were
+        stored as runs, they and the new reading have the same visitor count,
+        the rows are part of the same data collection and the run's first row
+        (or previous keep-alive row) is less than KEEPALIVE_INTERVAL seconds
+        old.
+
+        rows are the newest rows from _get_newest_rows().
+
+        Returns: True if the run was extended, False if the reading must be
+        added as a new row.
+        """
+        pstmt_move = """UPDATE visitor_activity
+            SET epoch_timestamp = ?, sample_interval = ?
+            WHERE (location_id = ? AND epoch_timestamp = ?)"""
+
+        if len(rows) < 2:
+            return False
+
+        (last_epoch, last_visitors, last_interval, last_is_run), (
+            prev_epoch,
+            prev_visitors,
+            prev_interval,
+            prev_is_run,
+        ) = rows
+
+        if not (
+            last_is_run
+            and prev_is_run
+            and location_visitors == last_visitors == prev_visitors
+            and epoch_timestamp > last_epoch
+            and epoch_timestamp - prev_epoch <= KEEPALIVE_INTERVAL
+            and epoch_timestamp - last_epoch <= KEEPALIVE_INTERVAL + last_interval
+            and last_epoch - prev_epoch <= KEEPALIVE_INTERVAL + prev_interval
+        ):
+            return False
+
+        cursor.execute(
+            pstmt_move,
+            (epoch_timestamp, sample_interval, location_id, last_epoch),
+        )
+
+        return True
+
     def add_many_visitors(self, visitor_activity: List[tuple[int, int, int]]):
 
-        pstmt_add_visitors = "INSERT INTO visitor_activity VALUES (?, ?, ?)"
+        pstmt_add_visitors = """INSERT INTO visitor_activity(
+            location_id, epoch_timestamp, location_visitors) VALUES (?, ?, ?)"""
 
         with contextlib.closing(self.conn.cursor()) as cursor:
             cursor.executemany(pstmt_add_visitors, visitor_activity)
@@ -234,6 +624,7 @@ class SQLiteDBManager:
             cursor.executemany(pstmt_add_locations, locations)
             self.conn.commit()
 
+    @spans.timed("db.get_activity_between")
     def get_activity_between(
         self, location_id: int, start: int, end: int
     ) -> List[tuple]:
@@ -259,6 +650,12 @@ class SQLiteDBManager:
         if not helpers.are_ints(location_id, start, end) or (start < 0 or end < 0):
             return activity_list
 
+        if self.run_length:
+            # Readings that were stored as runs are repeated every sample interval
+            return helpers.expand_runs(
+                self._get_runs(location_id, start, end), start, end
+            )
+
         pstmt_get_between: str = """SELECT epoch_timestamp, location_visitors
             FROM visitor_activity
             WHERE (location_id = ?) AND (? <= epoch_timestamp AND epoch_timestamp < ?)
@@ -271,6 +668,55 @@ class SQLiteDBManager:
 
         return activity_list
 
+    @spans.timed("db.get_sampled_activity_between")
+    def get_sampled_activity_between(
+        self, location_id: int, start: int, end: int
+    ) -> List[tuple[int, int, int, bool]]:
+        """
+        Readings of the location between start (inclusive) and end (exclusive)
+        with the number of seconds they represent, for calculating "avg"
+        aggregates outside the database (e.g. LiveSeries). In "changes" storage
+        mode the last reading before start is included, its run can still be
+        valid at start.
+
+        Parameters:
+        - location_id (int)
+        - start (int): Start time in epoch format.
+        - end (int): End time in epoch format.
+
+        Returns:
+        - List[tuple[int, int, int, bool]]: (epoch_timestamp, location_visitors,
+            sample_interval, is_run) tuples in chronological order. Readings
+            without a sample interval have the weight they have in "avg"
+            aggregates. Empty if the arguments aren't non-negative integers.
+        """
+        if not helpers.are_ints(location_id, start, end) or (start < 0 or end < 0):
+            return []
+
+        if self.run_length:
+            return [
+                (epoch, visitors, sample_interval, is_run)
+                for epoch, _, visitors, sample_interval, is_run in self._get_runs(
+                    location_id, start, end
+                )
+            ]
+
+        # The primary key makes every group a single row
+        pstmt_get_between = f"""SELECT epoch_timestamp, location_visitors,
+                {self.mode_expressions["WEIGHT"]}
+            FROM visitor_activity
+            WHERE (location_id = ?) AND (? <= epoch_timestamp AND epoch_timestamp < ?)
+            GROUP BY epoch_timestamp
+            ORDER BY epoch_timestamp"""
+
+        with contextlib.closing(self.conn.cursor()) as cursor:
+            cursor.execute(pstmt_get_between, (location_id, start, end))
+            return [
+                (epoch, visitors, weight, False)
+                for epoch, visitors, weight in cursor.fetchall()
+            ]
+
+    @spans.timed("db.get_average_visitors")
     def get_average_visitors(self, location_id: int, weekday: str) -> list[int]:
         """
         Calculates the average number of visitors and corresponding timestamps
@@ -294,19 +740,19 @@ class SQLiteDBManager:
         all_days = self._get_days(location_id, weekday)
 
         for day in all_days:
+            self._check_token()
             start = day[0]
             end = day[1]
 
             if not self._has_data(location_id, start, end):
                 continue
 
-            new_sums = self.get_data_by_mode(location_id, start, end, "sum", interval)
-            new_counts = self.get_data_by_mode(
-                location_id,
-                start,
-                end,
-                "count",
-                interval,
+            # Visitor seconds and seconds, so readings are weighted like in "avg"
+            new_sums = self._get_data_by_aggregate(
+                location_id, start, end, "WEIGHTED_SUM", interval
+            )
+            new_counts = self._get_data_by_aggregate(
+                location_id, start, end, "WEIGHT", interval
             )
 
             missing_hour = None
@@ -355,6 +801,7 @@ class SQLiteDBManager:
 
         return averages
 
+    @spans.timed("db.get_data_by_mode")
     def get_data_by_mode(
         self, location_id: int, start: int, end: int, mode: str, interval: int
     ) -> list[int]:
@@ -368,6 +815,8 @@ class SQLiteDBManager:
         - end (int): End time in epoch format.
         - mode (str): Data mode to follow for each interval
             - e.g., ("avg", "max", "min", "sum" or "count").
+            - "avg" weights each reading by its sample interval. "sum" and
+                "count" are the sum and the number of readings.
         - interval (int): Time interval in seconds for data retrieval.
 
         Returns:
@@ -377,8 +826,6 @@ class SQLiteDBManager:
         - TypeError: If 'location_id', 'start', 'end' or 'interval' are not integers.
         - ValueError: If 'start', 'end', or 'interval' are negative.
         """
-        activity_list: List[int] = []
-
         if not helpers.are_ints(location_id, start, end, interval):
             raise TypeError(
                 "Arguments 'location_id', 'start', and 'end' must be integers."
@@ -386,21 +833,42 @@ class SQLiteDBManager:
         if start < 0 or end < 0 or interval < 0:
             raise ValueError("Start and end values must be non-negative.")
 
+        return self._get_data_by_aggregate(
+            location_id, start, end, MODES.get(mode.lower()), interval
+        )
+
+    def _get_data_by_aggregate(
+        self, location_id: int, start: int, end: int, aggregate: str, interval: int
+    ) -> list[int]:
+        """get_data_by_mode() with a key of mode_expressions instead of a mode."""
+        activity_list: List[int] = []
+
+        if self.run_length:
+            return helpers.aggregate_runs(
+                self._get_runs(location_id, start, end),
+                start,
+                end,
+                interval,
+                aggregate,
+            )
+
         duration = end - start
         loops = math.floor(duration / interval)
 
         for i in range(loops):
+            self._check_token()
             start_time = start + i * interval
-            activity = self.get_single_by_mode(
+            activity = self._get_single_by_aggregate(
                 location_id,
                 start_time,
                 (start + (i + 1) * interval),
-                MODES.get(mode.lower()),
+                aggregate,
             )
             activity_list.append(activity)
 
         return activity_list
 
+    @spans.timed("db.get_single_by_mode")
     def get_single_by_mode(
         self, location_id: int, start: int, end: int, mode: str
     ) -> int | None:
@@ -412,7 +880,25 @@ class SQLiteDBManager:
         if start < 0 or end < 0:
             raise ValueError("Start and end values must be non-negative.")
 
-        pstmt: str = f"""SELECT {MODES.get(mode.lower())}(location_visitors) 
+        return self._get_single_by_aggregate(
+            location_id, start, end, MODES.get(mode.lower())
+        )
+
+    def _get_single_by_aggregate(
+        self, location_id: int, start: int, end: int, aggregate: str
+    ) -> int | None:
+        if self.run_length:
+            if end <= start:
+                return 0 if aggregate in ("COUNT", "WEIGHT") else None
+            return helpers.aggregate_runs(
+                self._get_runs(location_id, start, end),
+                start,
+                end,
+                end - start,
+                aggregate,
+            )[0]
+
+        pstmt: str = f"""SELECT {self.mode_expressions[aggregate]}
             FROM visitor_activity
             WHERE (location_id = ?) AND (? <= epoch_timestamp AND epoch_timestamp < ?)
             """
@@ -423,6 +909,45 @@ class SQLiteDBManager:
 
         return result[0]
 
+    def _get_runs(
+        self, location_id: int, start: int, end: int
+    ) -> List[tuple[int, int, int, int, bool]]:
+        """
+        Runs of the location that overlap start (inclusive) and end (exclusive).
+        Includes the last reading before start, which can still be valid at
+        start, and uses the first reading after end to find the end of the
+        last run.
+
+        Returns:
+        - List[tuple[int, int, int, int, bool]]: (start, end, location_visitors,
+            sample_interval, is_run) tuples from helpers.make_runs().
+        """
+        columns = "epoch_timestamp, location_visitors, sample_interval, is_run"
+        pstmt_before = f"""SELECT {columns} FROM visitor_activity
+            WHERE (location_id = ?) AND (epoch_timestamp < ?)
+            ORDER BY epoch_timestamp DESC LIMIT 1"""
+        pstmt_between = f"""SELECT {columns} FROM visitor_activity
+            WHERE (location_id = ?) AND (? <= epoch_timestamp AND epoch_timestamp < ?)
+            ORDER BY epoch_timestamp"""
+        pstmt_after = """SELECT epoch_timestamp FROM visitor_activity
+            WHERE (location_id = ?) AND (epoch_timestamp >= ?)
+            ORDER BY epoch_timestamp LIMIT 1"""
+
+        with contextlib.closing(self.conn.cursor()) as cursor:
+            cursor.execute(pstmt_before, (location_id, start))
+            rows = cursor.fetchall()
+            cursor.execute(pstmt_between, (location_id, start, end))
+            rows += cursor.fetchall()
+            cursor.execute(pstmt_after, (location_id, end))
+            after = cursor.fetchone()
+
+        return helpers.make_runs(
+            rows,
+            after[0] if after else None,
+            KEEPALIVE_INTERVAL,
+            DEFAULT_SAMPLE_INTERVAL,
+        )
+
     def _get_days(self, location_id: int, weekday: str) -> List[tuple[int, int]]:
         """
         Calculates upper (start of first target weekday) and lower limit (end of last target)
@@ -471,6 +996,7 @@ class SQLiteDBManager:
         else:
             return False
 
+    @spans.timed("db.get_first_time")
     def get_first_time(self, location_id: int | None = None) -> int | None:
         """
         Returns the first epoch timestamp in visitors table with matching
@@ -501,6 +1027,7 @@ class SQLiteDBManager:
 
         return result
 
+    @spans.timed("db.get_locations_dict")
     def get_locations_dict(self) -> dict[str:int]:
         locations = {}
 
@@ -511,9 +1038,11 @@ class SQLiteDBManager:
 
         return locations
 
+    @spans.timed("db.get_locations")
     def get_locations(self) -> List[tuple[int, str]]:
         return self.get_all("locations")
 
+    @spans.timed("db.get_unique_dates")
     def get_unique_dates(self, location_id: int) -> List[str]:
         """Retrieve all unique dates matching the location_id from the database.
 
@@ -526,20 +1055,17 @@ class SQLiteDBManager:
         if not helpers.are_ints(location_id):
             return unique_epochs
 
-        all_epochs = []
-
-        pstmt_get_between: str = """SELECT epoch_timestamp
+        # One epoch per hour is enough. Finnish UTC offsets are whole hours, so
+        # every timestamp in an hour has the same date.
+        pstmt_get_hours: str = """SELECT DISTINCT epoch_timestamp - epoch_timestamp % 3600
             FROM visitor_activity
             WHERE (location_id = ?)
             ORDER BY epoch_timestamp
             """
 
         with contextlib.closing(self.conn.cursor()) as cursor:
-            cursor.execute(pstmt_get_between, (location_id,))
-            all_epochs_tuple = cursor.fetchall()
-            for row in all_epochs_tuple:
-                if len(row) > 0:
-                    all_epochs.append(row[0])
+            cursor.execute(pstmt_get_hours, (location_id,))
+            all_epochs = [row[0] for row in cursor.fetchall()]
 
         unique_epochs = helpers.get_unique_epochs(all_epochs)
 
@@ -0,0 +1,329 @@
+"""Streaming export of visitor_activity to CSV or JSON Lines.
+
+Rows are read one location at a time with keyset pagination: every page
+continues after the last exported (location_id, epoch_timestamp) key. Each
+page is a short read, so the collector can write between pages, and memory
+use stays the same however many rows are exported.
+
+Databases in "changes" storage mode are exported as stored (one row per run,
+see SQLiteDBManager.set_storage_mode()). Rows stored as runs have is_run 1.
+"""
+
+import contextlib
+import csv
+import gzip
+import json
+import os
+import threading
+from typing import Callable, IO, Iterable, Iterator, List
+
+from .cancellation import CancellationToken
+from .db_manager import SQLiteDBManager
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_COLUMNS = (
+    "location_id",
+    "location_name",
+    "epoch_timestamp",
+    "location_visitors",
+    "sample_interval",
+    "is_run",
+)
+# Rows per page
+PAGE_SIZE = 10_000
+GZIP_LEVEL = 6
+
+
+def export_format(file_path: str) -> tuple[str, bool]:
+    """Format ("csv" or "jsonl") and compression of a file from its extension,
+    e.g. "data.csv.gz" -> ("csv", True).
+
+    :raises ValueError: If the extension isn't .csv, .jsonl or either with .gz.
+    """
+    name = file_path.lower()
+    compress = name.endswith(".gz")
+    if compress:
+        name = name[:-3]
+
+    for fmt in EXPORT_FORMATS:
+        if name.endswith(f".{fmt}"):
+            return fmt, compress
+
+    raise ValueError(f"Unsupported export file '{os.path.basename(file_path)}'")
+
+
+def count_activity(
+    db_handle: SQLiteDBManager,
+    location_ids: Iterable[int],
+    start: int | None = None,
+    end: int | None = None,
+) -> int:
+    """Number of rows that iter_activity() returns. Counted from the primary
+    key index."""
+    start, end = _range(start, end)
+    pstmt = """SELECT COUNT(*) FROM visitor_activity
+        WHERE (location_id = ?) AND (? <= epoch_timestamp AND epoch_timestamp < ?)"""
+
+    total = 0
+    with contextlib.closing(db_handle.conn.cursor()) as cursor:
+        for location_id in location_ids:
+            cursor.execute(pstmt, (location_id, start, end))
+            total += cursor.fetchone()[0]
+
+    return total
+
+
+def iter_activity(
+    db_handle: SQLiteDBManager,
+    location_ids: Iterable[int],
+    start: int | None = None,
+    end: int | None = None,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[List[tuple[int, int, int, int | None, int | None]]]:
+    """Yield pages of (location_id, epoch_timestamp, location_visitors,
+    sample_interval, is_run) rows in key order. sample_interval and is_run are
+    None if the database was created by an old version and opened read-only.
+
+    :param location_ids: Locations to export, in export order.
+    :type location_ids: Iterable[int]
+    :param start: First epoch (inclusive), defaults to None (no limit).
+    :type start: int | None, optional
+    :param end: Last epoch (exclusive), defaults to None (no limit).
+    :type end: int | None, optional
+    :param page_size: Rows per page, defaults to PAGE_SIZE.
+    :type page_size: int, optional
+    """
+    start, end = _range(start, end)
+    columns = _columns(db_handle)
+    interval = "sample_interval" if "sample_interval" in columns else "NULL"
+    is_run = "is_run" if "is_run" in columns else "NULL"
+    pstmt_page = f"""SELECT
+            location_id, epoch_timestamp, location_visitors, {interval}, {is_run}
+        FROM visitor_activity
+        WHERE (location_id = ?) AND (? <= epoch_timestamp AND epoch_timestamp < ?)
+        ORDER BY epoch_timestamp
+        LIMIT ?"""
+
+    with contextlib.closing(db_handle.conn.cursor()) as cursor:
+        cursor.arraysize = page_size
+
+        for location_id in location_ids:
+            after = start
+            while True:
+                cursor.execute(pstmt_page, (location_id, after, end, page_size))
+                page = cursor.fetchmany()
+                if not page:
+                    break
+
+                yield page
+
+                if len(page) < page_size:
+                    break
+                # Next page starts after the last key of this page
+                after = page[-1][1] + 1
+
+
+def export_activity(
+    db_handle: SQLiteDBManager,
+    file_path: str,
+    location_ids: Iterable[int] | None = None,
+    start: int | None = None,
+    end: int | None = None,
+    fmt: str | None = None,
+    compress: bool | None = None,
+    page_size: int = PAGE_SIZE,
+    progress: Callable[[int], None] | None = None,
+) -> int:
+    """Write visitor_activity rows to a CSV or JSON Lines file.
+
+    CSV files have a header row of EXPORT_COLUMNS. JSON Lines files have one
+    object per row with EXPORT_COLUMNS as keys. A file that wasn't finished
+    (error or cancelled token of db_handle) is removed.
+
+    :param db_handle: Open database handle.
+    :type db_handle: SQLiteDBManager
+    :param file_path: File to write.
+    :type file_path: str
+    :param location_ids: Locations to export, defaults to None (all).
+    :type location_ids: Iterable[int] | None, optional
+    :param start: First epoch (inclusive), defaults to None (no limit).
+    :type start: int | None, optional
+    :param end: Last epoch (exclusive), defaults to None (no limit).
+    :type end: int | None, optional
+    :param fmt: "csv" or "jsonl", defaults to None (from the file extension).
+    :type fmt: str | None, optional
+    :param compress: gzip the file, defaults to None (if the file ends with .gz).
+    :type compress: bool | None, optional
+    :param progress: Called with the number of rows written after every page.
+    :type progress: Callable[[int], None] | None, optional
+    :raises ValueError: If the format is unknown or wasn't given and the
+        file extension isn't a known format.
+    :return: Number of rows written.
+    :rtype: int
+    """
+    if fmt is None or compress is None:
+        try:
+            file_fmt, file_compress = export_format(file_path)
+        except ValueError:
+            if fmt is None:
+                raise
+            file_fmt, file_compress = fmt, False
+        fmt = file_fmt if fmt is None else fmt
+        compress = file_compress if compress is None else compress
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+
+    names = dict(db_handle.get_locations())
+    if location_ids is None:
+        location_ids = sorted(names)
+
+    written = 0
+    try:
+        with _open(file_path, compress) as file:
+            write_page = _csv_writer(file) if fmt == "csv" else _jsonl_writer(file)
+
+            for page in iter_activity(db_handle, location_ids, start, end, page_size):
+                db_handle._check_token()
+                write_page(page, names)
+                written += len(page)
+                if progress:
+                    progress(written)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(file_path)
+        raise
+
+    return written
+
+
+def _range(start: int | None, end: int | None) -> tuple[int, int]:
+    """Search range without limits replaced by 0 and the largest SQLite integer."""
+    return (0 if start is None else start), ((1 << 63) - 1 if end is None else end)
+
+
+def _columns(db_handle: SQLiteDBManager) -> list[str]:
+    """Columns of visitor_activity. Read-only connections to databases created
+    by old versions don't have sample_interval or is_run."""
+    with contextlib.closing(db_handle.conn.cursor()) as cursor:
+        cursor.execute("PRAGMA table_info(visitor_activity)")
+        return [row[1] for row in cursor.fetchall()]
+
+
+def _open(file_path: str, compress: bool) -> IO[str]:
+    if compress:
+        return gzip.open(
+            file_path, "wt", encoding="utf-8", newline="", compresslevel=GZIP_LEVEL
+        )
+    return open(file_path, "w", encoding="utf-8", newline="")
+
+
+def _csv_writer(file: IO[str]) -> Callable:
+    writer = csv.writer(file)
+    writer.writerow(EXPORT_COLUMNS)
+
+    def write_page(page: list[tuple], names: dict[int, str]):
+        writer.writerows(
+            (location_id, names.get(location_id, ""), *row)
+            for location_id, *row in page
+        )
+
+    return write_page
+
+
+def _jsonl_writer(file: IO[str]) -> Callable:
+    # Rows are formatted directly. Only the names need json.dumps(), once each.
+    line = (
+        '{{"location_id": {}, "location_name": {}, "epoch_timestamp": {}, '
+        '"location_visitors": {}, "sample_interval": {}, "is_run": {}}}\n'
+    )
+    quoted: dict[int, str] = {}
+
+    def write_page(page: list[tuple], names: dict[int, str]):
+        for location_id in {row[0] for row in page} - quoted.keys():
+            quoted[location_id] = json.dumps(
+                names.get(location_id, ""), ensure_ascii=False
+            )
+
+        file.write(
+            "".join(
+                line.format(
+                    location_id,
+                    quoted[location_id],
+                    epoch,
+                    "null" if visitors is None else visitors,
+                    "null" if interval is None else interval,
+                    "null" if is_run is None else is_run,
+                )
+                for location_id, epoch, visitors, interval, is_run in page
+            )
+        )
+
+    return write_page
+
+
+class DataExportJob(threading.Thread):
+    """Runs export_activity() on a worker thread with its own connection.
+
+    Poll `is_alive()` to find out when the export is done, and `written` and
+    `total` for the progress. `cancel()` stops the export and removes the
+    unfinished file. If the export failed, the exception is stored in `error`
+    (QueryCancelled if it was cancelled).
+
+    Arguments are the same as export_activity() takes, except db_path instead
+    of an open database handle.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        file_path: str,
+        location_ids: Iterable[int] | None = None,
+        start: int | None = None,
+        end: int | None = None,
+        fmt: str | None = None,
+        compress: bool | None = None,
+    ):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.file_path = file_path
+        self.location_ids = None if location_ids is None else list(location_ids)
+        self.start_epoch = start
+        self.end_epoch = end
+        self.fmt = fmt
+        self.compress = compress
+
+        self.token = CancellationToken()
+        self.total: int | None = None  # Counted before the export starts
+        self.written = 0
+        self.error: Exception | None = None
+
+    def cancel(self):
+        """Stop the export. Safe to call from any thread."""
+        self.token.cancel()
+
+    def run(self):
+        try:
+            with SQLiteDBManager(
+                self.db_path, read_only=True, token=self.token
+            ) as db_handle:
+                location_ids = self.location_ids
+                if location_ids is None:
+                    location_ids = sorted(dict(db_handle.get_locations()))
+                self.total = count_activity(
+                    db_handle, location_ids, self.start_epoch, self.end_epoch
+                )
+                export_activity(
+                    db_handle,
+                    self.file_path,
+                    location_ids,
+                    self.start_epoch,
+                    self.end_epoch,
+                    self.fmt,
+                    self.compress,
+                    progress=self._set_written,
+                )
+        except Exception as err:
+            self.error = err
+
+    def _set_written(self, written: int):
+        self.written = written
@@ -305,3 +305,177 @@ def are_ints(*args):
         if not isinstance(arg, int):
             return False
     return True
+
+
+def make_runs(
+    rows: List[tuple[int, int, int | None, int | None]],
+    next_epoch: int | None,
+    keepalive: int,
+    default_interval: int,
+) -> List[tuple[int, int, int, int, bool]]:
+    """
+    Turns visitor readings into runs and single readings.
+
+    A reading stored as a run is valid until the next reading, unless the next
+    reading is more than `keepalive + sample_interval` seconds away (data
+    collection was stopped). Then the reading is valid for its sample interval.
+
+    Other readings are single readings. They represent their sample interval,
+    or if they have none the time until the next reading, at most
+    `default_interval` seconds (like db_manager.SAMPLE_WEIGHT).
+
+    Parameters:
+    - rows (List[tuple[int, int, int | None, int | None]]): (epoch_timestamp,
+        location_visitors, sample_interval, is_run) tuples in chronological
+        order.
+    - next_epoch (int | None): Timestamp of the reading after the last row.
+    - keepalive (int): Longest time in seconds between two stored readings
+        while data is being collected.
+    - default_interval (int): Sample interval of readings without one.
+
+    Returns:
+    - List[tuple[int, int, int, int, bool]]: (start, end, location_visitors,
+        sample_interval, is_run) tuples. End is exclusive. Single readings
+        end after the time they represent.
+    """
+    runs = []
+
+    for i, (epoch, visitors, sample_interval, is_run) in enumerate(rows):
+        next_time = rows[i + 1][0] if i + 1 < len(rows) else next_epoch
+
+        if sample_interval is None:
+            sample_interval = default_interval
+            if not is_run and next_time is not None:
+                sample_interval = min(next_time - epoch, default_interval)
+
+        if (
+            is_run
+            and next_time is not None
+            and next_time - epoch <= keepalive + sample_interval
+        ):
+            end = next_time
+        else:
+            end = epoch + sample_interval
+
+        runs.append((epoch, end, visitors, sample_interval, bool(is_run)))
+
+    return runs
+
+
+def aggregate_runs(
+    runs: List[tuple[int, int, int, int, bool]],
+    start: int,
+    end: int,
+    interval: int,
+    mode: str,
+) -> list[int | float | None]:
+    """
+    Aggregates of runs for every interval between start and end. AVG is
+    weighted by time. SUM and COUNT are calculated from the readings that the
+    runs represent (see expand_runs()). Single readings are aggregated in the
+    interval of their timestamp only, like SQL aggregates of the rows.
+
+    Parameters:
+    - runs (List[tuple[int, int, int, int, bool]]): Runs from make_runs().
+    - mode (str): "AVG", "MAX", "MIN", "SUM", "COUNT", "WEIGHTED_SUM" (visitor
+        seconds) or "WEIGHT" (seconds with data).
+
+    Returns:
+    - list[int | float | None]: Aggregate of each interval. None for intervals
+        without data, except 0 for "COUNT" and "WEIGHT".
+    """
+    loops = math.floor((end - start) / interval)
+    window_end = start + loops * interval
+
+    seconds = [0] * loops
+    weighted_sums = [0] * loops
+    counts = [0] * loops
+    sums = [0] * loops
+    maxs: list[int | None] = [None] * loops
+    mins: list[int | None] = [None] * loops
+
+    for run_start, run_end, visitors, sample_interval, is_run in runs:
+        if not is_run:
+            if start <= run_start < window_end:
+                i = (run_start - start) // interval
+                seconds[i] += sample_interval
+                weighted_sums[i] += visitors * sample_interval
+                counts[i] += 1
+                sums[i] += visitors
+                if maxs[i] is None or visitors > maxs[i]:
+                    maxs[i] = visitors
+                if mins[i] is None or visitors < mins[i]:
+                    mins[i] = visitors
+            continue
+
+        first_epoch = run_start
+        run_start = max(run_start, start)
+        run_end = min(run_end, window_end)
+        if run_start >= run_end:
+            continue
+
+        first = (run_start - start) // interval
+        last = (run_end - 1 - start) // interval
+        for i in range(first, last + 1):
+            overlap_start = max(run_start, start + i * interval)
+            overlap_end = min(run_end, start + (i + 1) * interval)
+            overlap = overlap_end - overlap_start
+            seconds[i] += overlap
+            weighted_sums[i] += visitors * overlap
+            # Readings first_epoch + k * sample_interval in the overlap
+            readings = -((first_epoch - overlap_end) // sample_interval) + (
+                (first_epoch - overlap_start) // sample_interval
+            )
+            counts[i] += readings
+            sums[i] += visitors * readings
+            if maxs[i] is None or visitors > maxs[i]:
+                maxs[i] = visitors
+            if mins[i] is None or visitors < mins[i]:
+                mins[i] = visitors
+
+    if mode == "AVG":
+        return [s / c if c else None for s, c in zip(weighted_sums, seconds)]
+    if mode == "SUM":
+        return [s if c else None for s, c in zip(sums, counts)]
+    if mode == "COUNT":
+        return counts
+    if mode == "WEIGHTED_SUM":
+        return [s if c else None for s, c in zip(weighted_sums, seconds)]
+    if mode == "WEIGHT":
+        return seconds
+    if mode == "MAX":
+        return maxs
+    if mode == "MIN":
+        return mins
+
+    raise ValueError(f"Unknown mode '{mode}'")
+
+
+def expand_runs(
+    runs: List[tuple[int, int, int, int, bool]], start: int, end: int
+) -> List[tuple[int, int]]:
+    """
+    Readings that the runs represent between start (inclusive) and end
+    (exclusive). Each run is repeated every sample interval. Single readings
+    are returned as they are.
+
+    Returns:
+    - List[tuple[int, int]]: (epoch_timestamp, location_visitors) tuples.
+    """
+    readings = []
+
+    for run_start, run_end, visitors, sample_interval, is_run in runs:
+        if not is_run:
+            if start <= run_start < end:
+                readings.append((run_start, visitors))
+            continue
+
+        epoch = run_start
+        if epoch < start:
+            epoch += math.ceil((start - epoch) / sample_interval) * sample_interval
+
+        while epoch < run_end and epoch < end:
+            readings.append((epoch, visitors))
+            epoch += sample_interval
+
+    return readings
@@ -0,0 +1,354 @@
+"""Opt-in log of the SQL statements that SQLiteDBManager runs.
+
+While `query_log.enabled` is True, new connections trace every statement:
+its normalized text, parameters, duration (execute and fetches) and the
+number of rows returned. The query plan (EXPLAIN QUERY PLAN) of a SELECT is
+captured the first time its shape is seen. Statements slower than
+`slow_threshold` or whose plan scans a whole table are flagged. Slow
+statements are passed to `on_alert`, and so is the first full scan of each
+shape.
+
+Connections opened while the log is disabled aren't traced and have no
+overhead.
+
+Example:
+    query_log.enabled = True
+    with SQLiteDBManager(db_path) as db_handle:
+        db_handle.get_average_visitors(1, "mon")
+    print(query_log.table())
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable
+
+# Largest number of parameters stored per statement
+MAX_PARAMS = 20
+
+_WHITESPACE = re.compile(r"\s+")
+# String and number literals. Identifiers with digits (e.g. table names) are kept.
+_LITERAL = re.compile(r"'(?:[^']|'')*'|(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+# Lists of placeholders, e.g. "IN (?, ?, ?)"
+_PLACEHOLDER_LIST = re.compile(r"IN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+# Plan detail of a full table scan, e.g. "SCAN visitor_activity"
+_FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)")
+# Tables that stay small. Full scans of them aren't flagged.
+SMALL_TABLES = frozenset({"locations", "meta", "sqlite_master", "sqlite_schema"})
+
+
+def normalize_sql(sql: str) -> str:
+    """Statement with literals replaced by ? and whitespace collapsed, so
+    statements that only differ by their values have the same shape."""
+    sql = _LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("IN (?)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+@dataclass(slots=True)
+class QueryRecord:
+    """A single executed statement. Duration and rows include the fetches."""
+
+    sql: str
+    params: tuple
+    started: float  # epoch
+    duration: float = 0.0  # seconds
+    rows: int = 0
+    slow: bool = False
+    full_scan: bool = False
+
+    def to_dict(self) -> dict:
+        return {
+            "sql": self.sql,
+            "params": [repr(param) for param in self.params],
+            "started": self.started,
+            "duration_ms": round(self.duration * 1000, 3),
+            "rows": self.rows,
+            "slow": self.slow,
+            "full_scan": self.full_scan,
+        }
+
+
+@dataclass
+class QueryShape:
+    """Totals of every statement with the same normalized text."""
+
+    sql: str
+    plan: list[str] = field(default_factory=list)
+    full_scan: bool = False
+    count: int = 0
+    total: float = 0.0  # seconds
+    max: float = 0.0  # seconds
+    rows: int = 0
+    slow: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "sql": self.sql,
+            "plan": self.plan,
+            "full_scan": self.full_scan,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "slow": self.slow,
+        }
+
+
+class QueryLog:
+    """Statements traced by connections opened with `connect()`.
+
+    :param slow_threshold: Statements that take longer (seconds) are flagged
+        as slow, defaults to 0.1.
+    :type slow_threshold: float, optional
+    :param max_records: Newest statements that are kept, defaults to 1000.
+    :type max_records: int, optional
+    :param small_tables: Tables whose full scans aren't flagged, defaults to
+        SMALL_TABLES.
+    :type small_tables: frozenset[str], optional
+    :param on_alert: Called with every slow statement and the first full scan
+        statement of each shape. Called from the thread that ran the statement.
+    :type on_alert: Callable[[QueryRecord], None] | None, optional
+    """
+
+    def __init__(
+        self,
+        slow_threshold: float = 0.1,
+        max_records: int = 1000,
+        small_tables: frozenset[str] = SMALL_TABLES,
+        on_alert: Callable[[QueryRecord], None] | None = None,
+    ):
+        self.enabled = False
+        self.slow_threshold = slow_threshold
+        self.small_tables = small_tables
+        self.on_alert = on_alert
+        self.records: deque[QueryRecord] = deque(maxlen=max_records)
+        self.shapes: dict[str, QueryShape] = {}
+        self._lock = threading.Lock()
+
+    def connect(self, database: str, **kwargs) -> sqlite3.Connection:
+        """sqlite3.connect() that returns a traced connection while the log
+        is enabled."""
+        if self.enabled:
+            kwargs["factory"] = TracedConnection
+        conn = sqlite3.connect(database, **kwargs)
+        if self.enabled:
+            conn.query_log = self
+        return conn
+
+    def reset(self):
+        with self._lock:
+            self.records.clear()
+            self.shapes.clear()
+
+    def _needs_plan(self, sql: str) -> bool:
+        """True if the shape hasn't been seen yet. Registers the shape."""
+        with self._lock:
+            if sql in self.shapes:
+                return False
+            self.shapes[sql] = QueryShape(sql)
+            return True
+
+    def _set_plan(self, sql: str, plan: list[str]):
+        with self._lock:
+            shape = self.shapes[sql]
+            shape.plan = plan
+            shape.full_scan = any(
+                match.group(1) not in self.small_tables
+                for match in map(_FULL_SCAN.match, plan)
+                if match
+            )
+
+    def _finish(self, record: QueryRecord):
+        """Add a statement whose results have been fetched (or discarded)."""
+        with self._lock:
+            shape = self.shapes.get(record.sql)
+            if shape is None:
+                shape = self.shapes[record.sql] = QueryShape(record.sql)
+
+            record.slow = record.duration > self.slow_threshold
+            record.full_scan = shape.full_scan
+
+            shape.count += 1
+            shape.total += record.duration
+            shape.max = max(shape.max, record.duration)
+            shape.rows += record.rows
+            shape.slow += record.slow
+            self.records.append(record)
+            alert = record.slow or (record.full_scan and shape.count == 1)
+
+        if alert and self.on_alert:
+            self.on_alert(record)
+
+    def slow_records(self) -> list[QueryRecord]:
+        """Kept statements that were slow or scanned a whole table."""
+        with self._lock:
+            return [
+                record for record in self.records if record.slow or record.full_scan
+            ]
+
+    def table(self) -> str:
+        """Statement shapes as a text table, slowest total time first.
+        Durations in milliseconds. Flags: S = slow, F = full scan."""
+        with self._lock:
+            shapes = sorted(
+                (shape.to_dict() for shape in self.shapes.values() if shape.count),
+                key=lambda shape: shape["total_ms"],
+                reverse=True,
+            )
+
+        lines = [f"{'count':>8}{'mean':>10}{'max':>10}{'rows':>10}  flags  statement"]
+        for shape in shapes:
+            flags = "S" if shape["slow"] else "-"
+            flags += "F" if shape["full_scan"] else "-"
+            lines.append(
+                f"{shape['count']:>8}{shape['mean_ms']:>10.3f}"
+                f"{shape['max_ms']:>10.3f}{shape['rows']:>10}  {flags:<5}  "
+                + shape["sql"]
+            )
+
+        return "\n".join(lines)
+
+    def export_json(self, path: str):
+        """Write the statement shapes (with query plans) and the kept
+        statements to a JSON file."""
+        with self._lock:
+            data = {
+                "slow_threshold_ms": self.slow_threshold * 1000,
+                "shapes": [shape.to_dict() for shape in self.shapes.values()],
+                "records": [record.to_dict() for record in self.records],
+            }
+
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors are TracedCursors."""
+
+    query_log: QueryLog
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or TracedCursor)
+
+    # Connection.execute() doesn't create its cursor with cursor()
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that records its statements to the connection's QueryLog. A
+    statement is recorded when the next statement is executed or the cursor
+    is closed, so the rows and time of its fetches are included."""
+
+    def __init__(self, connection: TracedConnection):
+        super().__init__(connection)
+        self._log = connection.query_log
+        self._record: QueryRecord | None = None
+
+    def execute(self, sql, parameters=(), /):
+        self._start(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record.duration += time.perf_counter() - start
+
+    def executemany(self, sql, seq_of_parameters, /):
+        seq_of_parameters = list(seq_of_parameters)
+        self._start(sql, (f"<{len(seq_of_parameters)} parameter sets>",))
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record.duration += time.perf_counter() - start
+            self._record.rows = max(self.rowcount, 0)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0)
+            raise
+        self._fetched(start, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Cursors that weren't closed
+        self._finish()
+
+    def _start(self, sql: str, parameters):
+        self._finish()
+
+        normalized = normalize_sql(sql)
+        if self._log._needs_plan(normalized):
+            self._log._set_plan(normalized, self._explain(sql, parameters))
+
+        if isinstance(parameters, dict):
+            params = tuple(parameters.items())[:MAX_PARAMS]
+        else:
+            params = tuple(parameters)[:MAX_PARAMS]
+        self._record = QueryRecord(normalized, params, time.time())
+
+    def _explain(self, sql: str, parameters) -> list[str]:
+        """Query plan details of a SELECT. Empty for other statements or if the
+        plan couldn't be queried."""
+        keyword = sql.split(None, 1)[0].upper() if sql.strip() else ""
+        if keyword not in ("SELECT", "WITH"):
+            return []
+
+        # Plain cursor, so the EXPLAIN itself isn't traced
+        cursor = sqlite3.Cursor(self.connection)
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+            return [row[3] for row in cursor.fetchall()]
+        except sqlite3.Error:
+            return []
+        finally:
+            cursor.close()
+
+    def _fetched(self, start: float, rows: int):
+        if self._record is not None:
+            self._record.duration += time.perf_counter() - start
+            self._record.rows += rows
+
+    def _finish(self):
+        record = getattr(self, "_record", None)
+        if record is not None:
+            self._record = None
+            self._log._finish(record)
+
+
+# Log of the whole app. Disabled by default.
+query_log = QueryLog()
@@ -0,0 +1,197 @@
+import os
+from pathlib import Path
+import sqlite3
+import struct
+import threading
+from typing import List
+import zlib
+
+from .db_manager import SQLiteDBManager
+
+# Every record starts with MAGIC, so reading can continue after a damaged record
+MAGIC = b"VT"
+# location_id, epoch_timestamp, location_visitors, sample_interval (-1 if None)
+# and length of location_name. Followed by location_name (UTF-8) and CRC32 of
+# the header and the name.
+_HEADER = struct.Struct("<2sqqiiH")
+_CRC = struct.Struct("<I")
+# Names are cut to the longest length that fits the header
+MAX_NAME_SIZE = 0xFFFF
+
+
+def _encode_name(name: str) -> bytes:
+    """UTF-8 name cut to MAX_NAME_SIZE bytes without splitting a character."""
+    encoded = name.encode("utf-8")[:MAX_NAME_SIZE]
+    return encoded.decode("utf-8", errors="ignore").encode("utf-8")
+
+
+def _parse(
+    data: bytes,
+) -> tuple[List[tuple[int, str, int, int, int | None]], int, int]:
+    """Valid readings in data, the number of damaged parts and the end of the
+    last valid record. Anything after that end is a record cut short by a
+    crash or damaged data."""
+    readings = []
+    corrupt = 0
+    offset = end = 0
+
+    while offset + _HEADER.size + _CRC.size <= len(data):
+        magic, location_id, epoch, visitors, sample_interval, name_size = (
+            _HEADER.unpack_from(data, offset)
+        )
+        record_end = offset + _HEADER.size + name_size
+
+        if (
+            magic != MAGIC
+            or record_end + _CRC.size > len(data)
+            or zlib.crc32(data[offset:record_end])
+            != _CRC.unpack_from(data, record_end)[0]
+        ):
+            # Continue from the next record. Damaged data between two valid
+            # records is counted once.
+            if offset == end:
+                corrupt += 1
+            offset = data.find(MAGIC, offset + 1)
+            if offset == -1:
+                break
+            continue
+
+        readings.append(
+            (
+                location_id,
+                data[offset + _HEADER.size : record_end].decode("utf-8"),
+                epoch,
+                visitors,
+                None if sample_interval == -1 else sample_interval,
+            )
+        )
+        offset = end = record_end + _CRC.size
+
+    return readings, corrupt, end
+
+
+class Spool:
+    """Append-only file of binary readings.
+
+    Readings are appended and fsynced before they are added to the database,
+    so a locked or full database doesn't lose them. `drain()` adds the spooled
+    readings to the database in large transactions and empties the spool.
+    Readings that are already in the database are skipped, so replaying the
+    spool after a crash is safe.
+
+    Every record has a CRC32. A record cut short by a crash is dropped when
+    the spool is opened, and records with a wrong CRC are skipped. Location
+    names are stored in full, so new locations get their real names.
+
+    Reading: (location_id, location_name, epoch_timestamp, location_visitors,
+    sample_interval), the same tuple as SQLiteDBManager.add_many_data takes.
+
+    :param path: Path of the spool file. Created if it doesn't exist.
+    :type path: str
+    :param fsync: fsync after every append, defaults to True.
+    :type fsync: bool, optional
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.corrupt = 0  # Skipped records with a wrong CRC
+        self._lock = threading.Lock()
+        self._file = open(self.path, "ab+")
+
+        # Drop a record that was cut short by a crash
+        self._file.seek(0)
+        data = self._file.read()
+        end = _parse(data)[2]
+        if end < len(data):
+            self._file.truncate(end)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __len__(self) -> int:
+        """Number of valid spooled records."""
+        with self._lock:
+            self._file.seek(0)
+            data = self._file.read()
+
+        return len(_parse(data)[0])
+
+    def append(self, readings: List[tuple[int, str, int, int, int | None]]):
+        """Append readings with a single write and fsync."""
+        data = bytearray()
+        for location_id, location_name, epoch, visitors, sample_interval in readings:
+            name = _encode_name(location_name)
+            record = (
+                _HEADER.pack(
+                    MAGIC,
+                    location_id,
+                    epoch,
+                    visitors,
+                    -1 if sample_interval is None else sample_interval,
+                    len(name),
+                )
+                + name
+            )
+            data += record + _CRC.pack(zlib.crc32(record))
+
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def read(self) -> List[tuple[int, str, int, int, int | None]]:
+        """All valid spooled readings in the order they were appended."""
+        return self._read()[0]
+
+    def _read(self) -> tuple[List[tuple[int, str, int, int, int | None]], int]:
+        """Valid readings and the size of the file that was read."""
+        with self._lock:
+            self._file.seek(0)
+            data = self._file.read()
+
+        readings, corrupt, _ = _parse(data)
+        self.corrupt += corrupt
+
+        return readings, len(data)
+
+    def drain(self, db_handle: SQLiteDBManager, batch_size: int = 10_000) -> int:
+        """Add all spooled readings to the database and empty the spool.
+        The spool is only emptied after every batch has been committed.
+
+        :raises sqlite3.Error: If the database couldn't be written. The spool
+            is kept and can be drained again later.
+        :return: Number of readings added (readings already in the database
+            aren't counted).
+        :rtype: int
+        """
+        readings, size = self._read()
+        added = 0
+
+        try:
+            for start in range(0, len(readings), batch_size):
+                added += db_handle.add_many_data(readings[start : start + batch_size])
+        except sqlite3.Error:
+            db_handle.conn.rollback()
+            raise
+
+        with self._lock:
+            # Keep readings that were appended while draining
+            self._file.seek(size)
+            appended = self._file.read()
+            self._file.truncate(0)
+            self._file.write(appended)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+        return added
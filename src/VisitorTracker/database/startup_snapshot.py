@@ -0,0 +1,45 @@
+from dataclasses import dataclass, field
+
+import constants
+
+from .db_manager import SQLiteDBManager
+
+
+@dataclass
+class StartupSnapshot:
+    """Database values that the app needs on startup.
+
+    :param locations: all locations {location_name: location_id}.
+        constants.NO_LOCATIONS if the database has no locations.
+    :param default_location: first location of the database. Selected by default.
+    :param unique_dates: dates with data of the default location ("%d-%m-%Y").
+    :param first_time: first epoch timestamp of the default location or None
+        if it has no data.
+    """
+
+    locations: dict[str, int] = field(
+        default_factory=lambda: dict(constants.NO_LOCATIONS)
+    )
+    default_location: str = constants.DEFAULT_LOCATION
+    unique_dates: list[str] = field(default_factory=list)
+    first_time: int | None = None
+
+
+def load_startup_snapshot(db_path: str) -> StartupSnapshot:
+    """Load locations, dates and first timestamp with a single connection.
+    Loaded once and shared by every page that needs them."""
+    snapshot = StartupSnapshot()
+
+    with SQLiteDBManager(db_path) as db_handle:
+        locations_dict = db_handle.get_locations_dict()
+
+        if locations_dict:
+            snapshot.locations = locations_dict
+            snapshot.default_location = next(iter(locations_dict.keys()))
+
+        location_id = snapshot.locations.get(snapshot.default_location)
+        snapshot.unique_dates = db_handle.get_unique_dates(location_id)
+        if location_id:
+            snapshot.first_time = db_handle.get_first_time(location_id)
+
+    return snapshot
@@ -0,0 +1,310 @@
+"""Database maintenance tool.
+
+Runs database jobs without the GUI. Imports nothing from tkinter or
+matplotlib.
+
+Examples:
+    python dbtool.py export --out visitors.csv
+    python dbtool.py export --out visitors.jsonl.gz --location "FUN Oulu Ritaharju"
+    python dbtool.py export --out may.csv --start 01-05-2024 --end 31-05-2024
+    python dbtool.py import-csv history.csv.gz --reindex
+    python dbtool.py snapshot-export snapshot
+    python dbtool.py --db other.db snapshot-import snapshot
+
+The export format is taken from the file extension (.csv, .jsonl, either with
+.gz) unless --format or --gzip is given.
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from typing import Callable
+
+import database
+from database.csv_import import CHUNK_SIZE
+from database.export import EXPORT_FORMATS, count_activity
+from settings.settings import Settings
+import utils
+
+
+def _progress(total: int) -> Callable[[int], None]:
+    def show(written: int):
+        percent = written / total * 100 if total else 100.0
+        print(
+            f"\r{written:,} / {total:,} rows ({percent:.0f} %)", end="", file=sys.stderr
+        )
+
+    return show
+
+
+def _location_ids(db_handle: database.SQLiteDBManager, names: list[str]) -> list[int]:
+    """IDs of locations given by name or ID. db_handle can also be a
+    columnar.SnapshotReader.
+
+    :raises KeyError: If a location isn't in the database.
+    """
+    locations = db_handle.get_locations_dict()
+    location_ids = []
+    for name in names:
+        if name in locations:
+            location_ids.append(locations[name])
+        elif name.isdigit() and int(name) in locations.values():
+            location_ids.append(int(name))
+        else:
+            raise KeyError(f"Unknown location '{name}'")
+
+    return location_ids
+
+
+def _date_range(start: str | None, end: str | None) -> tuple[int | None, int | None]:
+    """Epochs of start and end dates (DD-MM-YYYY). End date is included."""
+    start_epoch = end_epoch = None
+    if start:
+        start_epoch = utils.formatted_date_to_epoch(f"{start} 00:00:00")
+    if end:
+        end_epoch = utils.next_time(
+            utils.formatted_date_to_epoch(f"{end} 00:00:00"), days=1
+        )
+
+    return start_epoch, end_epoch
+
+
+def export(args: argparse.Namespace) -> int:
+    try:
+        start, end = _date_range(args.start, args.end)
+    except ValueError as err:
+        print(f"Invalid date: {err}", file=sys.stderr)
+        return 1
+
+    try:
+        with database.SQLiteDBManager(args.db, read_only=True) as db_handle:
+            if args.location:
+                location_ids = _location_ids(db_handle, args.location)
+            else:
+                location_ids = sorted(dict(db_handle.get_locations()))
+
+            total = count_activity(db_handle, location_ids, start, end)
+            written = database.export_activity(
+                db_handle,
+                args.out,
+                location_ids,
+                start,
+                end,
+                fmt=args.format,
+                compress=args.gzip or None,
+                progress=None if args.quiet else _progress(total),
+            )
+    except KeyError as err:
+        print(err.args[0], file=sys.stderr)
+        return 1
+    except (ValueError, OSError, sqlite3.Error) as err:
+        print(f"Export failed: {err}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("\nExport cancelled", file=sys.stderr)
+        return 130
+
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Exported {written:,} rows to {args.out}")
+    return 0
+
+
+def import_csv(args: argparse.Namespace) -> int:
+    def show(read: int, size: int):
+        print(f"\r{read / size * 100:.0f} % read", end="", file=sys.stderr)
+
+    start = time.perf_counter()
+    try:
+        with database.SQLiteDBManager(args.db) as db_handle:
+            result = database.import_csv(
+                db_handle,
+                args.file,
+                chunk_size=args.chunk_size,
+                fast=not args.safe,
+                reindex=args.reindex,
+                progress=None if args.quiet else show,
+            )
+    except (ValueError, OSError, sqlite3.Error) as err:
+        print(f"Import failed: {err}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("\nImport cancelled, added chunks are kept", file=sys.stderr)
+        return 130
+    seconds = time.perf_counter() - start
+
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(
+        f"Read {result.rows:,} rows in {seconds:.1f} s "
+        f"({result.rows / seconds if seconds else 0:,.0f} rows/s)"
+    )
+    print(f"Added {result.added:,} readings and {result.locations} new locations")
+    print(f"Duplicates: {result.duplicates:,}")
+    print(f"Invalid rows: {result.invalid:,}", end="")
+    if result.invalid_lines:
+        print(f" (first on lines {', '.join(map(str, result.invalid_lines))})", end="")
+    print()
+
+    return 0
+
+
+def snapshot_export(args: argparse.Namespace) -> int:
+    # Imported here, only the snapshot commands need NumPy
+    from database import columnar
+
+    start = time.perf_counter()
+    try:
+        with database.SQLiteDBManager(args.db, read_only=True) as db_handle:
+            location_ids = None
+            if args.location:
+                location_ids = _location_ids(db_handle, args.location)
+            manifest = columnar.export_snapshot(db_handle, args.dir, location_ids)
+    except KeyError as err:
+        print(err.args[0], file=sys.stderr)
+        return 1
+    except (OSError, sqlite3.Error) as err:
+        print(f"Snapshot failed: {err}", file=sys.stderr)
+        return 1
+
+    rows = sum(location["rows"] for location in manifest["locations"])
+    print(
+        f"Wrote {rows:,} rows of {len(manifest['locations'])} locations to "
+        f"{args.dir} in {time.perf_counter() - start:.1f} s"
+    )
+    return 0
+
+
+def snapshot_import(args: argparse.Namespace) -> int:
+    from database import columnar
+
+    start = time.perf_counter()
+    try:
+        with database.SQLiteDBManager(args.db) as db_handle:
+            location_ids = None
+            if args.location:
+                reader = columnar.SnapshotReader(args.dir)
+                location_ids = _location_ids(reader, args.location)
+            result = columnar.import_snapshot(
+                db_handle, args.dir, location_ids, fast=not args.safe
+            )
+    except KeyError as err:
+        print(err.args[0], file=sys.stderr)
+        return 1
+    except (ValueError, OSError, sqlite3.Error) as err:
+        print(f"Import failed: {err}", file=sys.stderr)
+        return 1
+
+    print(
+        f"Read {result.rows:,} rows in {time.perf_counter() - start:.1f} s. Added "
+        f"{result.added:,} readings and {result.locations} new locations, "
+        f"{result.duplicates:,} already existed"
+    )
+    return 0
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="VisitorTracker database tool.")
+    parser.add_argument(
+        "--db", help="database file, defaults to the database in settings"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser(
+        "export", help="export visitor data to a CSV or JSON Lines file"
+    )
+    export_parser.add_argument(
+        "--out", required=True, help="file to write (.csv, .jsonl, .csv.gz, ...)"
+    )
+    export_parser.add_argument(
+        "--location",
+        action="append",
+        help="location name or ID, can be repeated, defaults to all locations",
+    )
+    export_parser.add_argument("--start", help="first date, DD-MM-YYYY")
+    export_parser.add_argument("--end", help="last date (included), DD-MM-YYYY")
+    export_parser.add_argument(
+        "--format",
+        choices=EXPORT_FORMATS,
+        help="file format, defaults to the file extension",
+    )
+    export_parser.add_argument(
+        "--gzip", action="store_true", help="compress the file with gzip"
+    )
+    export_parser.add_argument(
+        "-q", "--quiet", action="store_true", help="don't show the progress"
+    )
+    export_parser.set_defaults(func=export)
+
+    import_parser = subparsers.add_parser(
+        "import-csv", help="add visitor data from a CSV file"
+    )
+    import_parser.add_argument(
+        "file",
+        help="CSV file (.csv or .csv.gz) with a header row of location_id, "
+        "epoch_timestamp, location_visitors and optionally location_name, "
+        "sample_interval and is_run",
+    )
+    import_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help=f"rows per transaction, defaults to {CHUNK_SIZE}",
+    )
+    import_parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="rebuild the index and query planner statistics after the import",
+    )
+    import_parser.add_argument(
+        "--safe",
+        action="store_true",
+        help="keep the database's synchronous and cache settings during the "
+        "import (slower)",
+    )
+    import_parser.add_argument(
+        "-q", "--quiet", action="store_true", help="don't show the progress"
+    )
+    import_parser.set_defaults(func=import_csv)
+
+    snapshot_export_parser = subparsers.add_parser(
+        "snapshot-export",
+        help="write visitor data to a columnar snapshot directory (NumPy .npy)",
+    )
+    snapshot_export_parser.add_argument("dir", help="snapshot directory")
+    snapshot_export_parser.add_argument(
+        "--location",
+        action="append",
+        help="location name or ID, can be repeated, defaults to all locations",
+    )
+    snapshot_export_parser.set_defaults(func=snapshot_export)
+
+    snapshot_import_parser = subparsers.add_parser(
+        "snapshot-import", help="add the visitor data of a snapshot directory"
+    )
+    snapshot_import_parser.add_argument("dir", help="snapshot directory")
+    snapshot_import_parser.add_argument(
+        "--location",
+        action="append",
+        help="location name or ID, can be repeated, defaults to all locations",
+    )
+    snapshot_import_parser.add_argument(
+        "--safe",
+        action="store_true",
+        help="keep the database's synchronous and cache settings (slower)",
+    )
+    snapshot_import_parser.set_defaults(func=snapshot_import)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    args.db = args.db or Settings().db_path
+
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
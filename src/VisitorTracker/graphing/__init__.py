@@ -0,0 +1,33 @@
+__all__ = ["axes", "data", "export"]
+
+import importlib
+
+from .data import (
+    GraphSpec,
+    GraphValues,
+    get_search_range,
+    load_graph_values,
+    load_visitors,
+    make_graph_values,
+)
+
+# Names that need matplotlib. Their modules are imported on first use, so that
+# importing graphing doesn't import matplotlib.
+_LAZY_NAMES = {
+    "GraphSnapshot": "axes",
+    "style_axes": "axes",
+    "set_title_and_labels": "axes",
+    "plot_values": "axes",
+    "plot_snapshot": "axes",
+    "get_limits": "axes",
+    "ExportJob": "export",
+    "export_figure": "export",
+    "render_figure": "export",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        module = importlib.import_module(f".{_LAZY_NAMES[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module 'graphing' has no attribute '{name}'")
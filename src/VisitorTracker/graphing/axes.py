@@ -0,0 +1,224 @@
+from dataclasses import dataclass
+import datetime
+
+from matplotlib.axes import Axes
+import matplotlib.dates as mdates
+import numpy as np
+
+import constants
+
+
+@dataclass
+class GraphSnapshot:
+    """Plotted values and style of a single graph. Everything needed to plot
+    the graph again without the database or tkinter."""
+
+    time_mode: str
+    graph_type: str
+    title: str
+    x_label: str
+    y_label: str
+    x_values: list[datetime.datetime]
+    y_values: list[int | float]
+    element_color: str
+    ylim: tuple[float | None, float | None] = (None, None)
+    graph_amount: int = 1
+    facecolor: str = constants.LIGHT_GREY
+    axis_colors: str = "white"
+    edge_color: str = "grey"
+
+
+def style_axes(
+    ax: Axes,
+    time_mode: str,
+    graph_amount: int,
+    x_values: list[datetime.datetime],
+    axis_colors="white",
+    edge_color="grey",
+):
+    """Clears previous axis values and then sets all axis values to the new ones.
+
+    :param ax: Axes to style.
+    :param time_mode: One of constants.TIME_MODES.
+    :type time_mode: str
+    :param graph_amount: amount of graphs that will be drawn. Affects the
+        interval of data to reduce graph label overlap
+    :type graph_amount: int
+    :param x_values: x-values of the graph. Used for x-limits of hour graphs.
+    :type x_values: list[datetime.datetime]
+    """
+    ax.clear()
+    ax.set_facecolor(axis_colors)
+    ax.yaxis.set_tick_params(color=axis_colors, labelcolor=axis_colors)
+    ax.xaxis.set_tick_params(
+        which="both",
+        color=axis_colors,
+        labelcolor=axis_colors,
+    )
+
+    for spine in ax.axes.spines.values():
+        spine.set_edgecolor(edge_color)
+
+    if time_mode == "Time Range":
+
+        locator = mdates.AutoDateLocator(tz=constants.DEFAULT_TIMEZONE)
+        formatter = mdates.ConciseDateFormatter(locator, tz=constants.DEFAULT_TIMEZONE)
+
+        # '%#d' only works with windows. '%-d' on linux
+        formatter.formats = [
+            "%y",  # ticks are mostly years
+            "%b",  # ticks are mostly months
+            "%a, %#d.",  # ticks are mostly days
+            "%H:%M",  # hrs
+            "%H:%M",  # min
+            "%S.%f",  # secs
+        ]
+
+        formatter.zero_formats = [
+            "",
+            "%b %Y",
+            "%b '%y",
+            "%a, %#d.",  # '%#d' only works with windows. '%-d' on linux
+            "%H:%M",
+            "%H:%M",
+        ]
+
+        formatter.offset_formats = [
+            "%Y",
+            "%Y",
+            "%b %Y",
+            "%d %b %Y",
+            "%d %b %Y",
+            "%d %b %Y %H:%M",
+        ]
+
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(formatter)
+    else:
+        interval = 1
+
+        # x-values go over each other if 4 graphs on screen. Figures are too small.
+        if graph_amount == 4:
+            interval = 2
+
+        locator = mdates.HourLocator(
+            byhour=range(24), interval=interval, tz=constants.DEFAULT_TIMEZONE
+        )
+        # '%#H' only works on windows
+        formatter = mdates.DateFormatter("%#H", tz=constants.DEFAULT_TIMEZONE)
+
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(formatter)
+
+        ax.set_xlim(*get_limits(x_values))
+
+
+def set_title_and_labels(
+    ax: Axes, title: str, x_label: str, y_label: str, color="white"
+):
+    ax.set_title(title, color=color)
+    ax.set_xlabel(x_label, color=color)
+    ax.set_ylabel(y_label, color=color)
+
+
+def plot_values(
+    ax: Axes,
+    graph_type: str,
+    x_values: list[datetime.datetime],
+    y_values: list[int | float],
+    color: str,
+):
+    """Plot values as a bar graph or a line graph.
+
+    :param graph_type: "bar graph" or "line graph" (case insensitive)
+    :type graph_type: str
+    :return: BarContainer for a bar graph, Line2D for a line graph
+        or None for an unknown graph type.
+    """
+    if graph_type.lower() == "bar graph":
+        width = np.diff(x_values).min() * 0.80
+
+        return ax.bar(
+            x_values,
+            y_values,
+            color=color,
+            align="center",
+            width=width,
+        )
+
+    if graph_type.lower() == "line graph":
+        (line,) = ax.plot(
+            x_values,
+            y_values,
+            color=color,
+            linewidth=4,
+        )
+        return line
+
+    return None
+
+
+def plot_snapshot(ax: Axes, snapshot: GraphSnapshot):
+    """Plot a graph snapshot on the given axes."""
+    style_axes(
+        ax,
+        snapshot.time_mode,
+        snapshot.graph_amount,
+        snapshot.x_values,
+        snapshot.axis_colors,
+        snapshot.edge_color,
+    )
+    set_title_and_labels(
+        ax, snapshot.title, snapshot.x_label, snapshot.y_label, snapshot.axis_colors
+    )
+    plot_values(
+        ax,
+        snapshot.graph_type,
+        snapshot.x_values,
+        snapshot.y_values,
+        snapshot.element_color,
+    )
+    ax.set_ylim(*snapshot.ylim)
+
+
+def get_limits(
+    datetimes: list[datetime.datetime],
+) -> tuple[datetime.datetime, datetime.datetime]:
+    """
+    Calculate and return the lower and upper limits based on a list of datetime objects.
+
+    The function computes the difference between the first two datetime objects in the list.
+    It then uses this difference to calculate a lower limit by subtracting 0.75% of
+    the difference from the first datetime, and an upper limit by adding 0.75% of
+    the difference to the last datetime.
+
+    Parameters:
+    ---
+    datetimes : list[datetime]
+        A list of datetime objects. The list must contain at least two elements.
+        The datetime should be in chronological order, starting from the earliest
+        to the latest.
+
+    Returns:
+    ---
+    tuple[datetime, datetime]
+        A tuple containing the calculated lower and upper limits as datetime objects.
+
+    Raises:
+    ---
+    ValueError
+        If the list contains fewer than two datetime objects.
+    """
+    if len(datetimes) >= 2:
+        difference = (
+            datetimes[1] - datetimes[0]
+            if datetimes[0] < datetimes[1]
+            else datetimes[0] - datetimes[1]
+        )
+    else:
+        raise ValueError("The list must contain at least two datetime objects")
+
+    lower_lim = datetimes[0] - (difference * 0.75)
+    upper_lim = datetimes[-1] + (difference * 0.75)
+
+    return lower_lim, upper_lim
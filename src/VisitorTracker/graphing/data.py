@@ -0,0 +1,163 @@
+from dataclasses import dataclass, field
+import datetime
+
+import constants
+import database
+import utils
+from utils.profiling import spans
+
+HOUR = 60 * 60
+
+
+@dataclass
+class GraphSpec:
+    """Everything that selects the values of a single graph.
+
+    Graph mode, weekday and time range use the same names as the GUI dropdowns
+    (keys of constants.GRAPH_MODES, constants.WEEKDAYS and constants.TIME_RANGES).
+    Graph date follows format "%d-%m-%Y".
+    """
+
+    location_id: int
+    location_name: str
+    time_mode: str = constants.DEFAULT_TIME_MODE
+    graph_mode: str = constants.DEFAULT_GRAPH_MODE
+    graph_type: str = constants.DEFAULT_GRAPH_TYPE
+    graph_date: str = constants.DEFAULT_GRAPH_DATE
+    weekday: str = constants.DEFAULT_WEEKDAY
+    time_range: str = constants.DEFAULT_TIME_RANGE
+
+
+@dataclass
+class GraphValues:
+    """Title, labels and values of a graph loaded from the database."""
+
+    title: str
+    x_label: str
+    y_label: str
+    x_values: list[datetime.datetime] = field(default_factory=list)
+    y_values: list[int | float] = field(default_factory=list)
+
+
+def get_search_range(
+    db_handle: database.SQLiteDBManager, spec: GraphSpec
+) -> tuple[int, int]:
+    """Search range of a "Calendar" or "Time Range" graph in epoch format.
+
+    :param db_handle: Open database handle. Only used for the "ALL" time range.
+    :type db_handle: database.SQLiteDBManager
+    :return: start (inclusive) and end (exclusive) of the search range
+    :rtype: tuple[int, int]
+    """
+    search_start: int
+    search_end: int
+
+    if spec.time_mode == "Calendar":
+        search_start = utils.formatted_date_to_epoch(f"{spec.graph_date} 00:00:00")
+        search_end = utils.next_time(search_start, days=1)  # +1 day
+    elif spec.time_mode == "Time Range":
+        search_end_dt = datetime.datetime.now()
+        search_end = utils.datetime_to_epoch(search_end_dt)
+
+        time_dif_td = utils.get_time_delta(spec.time_range, "negative")
+        if time_dif_td:
+            search_start_dt = search_end_dt + time_dif_td
+            search_start = utils.datetime_to_epoch(search_start_dt)
+        else:
+            search_start = _get_all_search_start(db_handle, spec.location_id)
+
+    return search_start, search_end
+
+
+def _get_all_search_start(
+    db_handle: database.SQLiteDBManager, location_id: int
+) -> int | None:
+    search_start = db_handle.get_first_time(location_id)
+
+    if not search_start:
+        return search_start
+
+    search_start_dt = utils.top_of_the_hour(utils.get_localized_datetime(search_start))
+
+    return utils.datetime_to_epoch(search_start_dt)
+
+
+def load_visitors(
+    db_handle: database.SQLiteDBManager, spec: GraphSpec
+) -> tuple[list[int], list[int | float | None]]:
+    """Retrieve the visitors of a graph from the database.
+
+    :return: timestamps (epoch) and visitors of every hour of the graph.
+        Visitors is None for hours without data.
+    :rtype: tuple[list[int], list[int | float | None]]
+    """
+    if spec.time_mode == "Calendar" or spec.time_mode == "Time Range":
+        search_start, search_end = get_search_range(db_handle, spec)
+        visitors = db_handle.get_data_by_mode(
+            spec.location_id,
+            search_start,
+            search_end,
+            constants.GRAPH_MODES.get(spec.graph_mode),
+            HOUR,
+        )
+        timestamps = database.helpers.calculate_timestamps(
+            search_start, search_end, HOUR
+        )
+    elif spec.time_mode == "Daily Average":
+        visitors = db_handle.get_average_visitors(
+            spec.location_id,
+            constants.WEEKDAYS.get(spec.weekday),
+        )
+        timestamps = utils.day_epochs()
+    else:
+        raise ValueError(f"Unknown time mode '{spec.time_mode}'")
+
+    return timestamps, visitors
+
+
+@spans.timed("graph.make_values")
+def make_graph_values(
+    spec: GraphSpec,
+    timestamps: list[int],
+    visitors: list[int | float | None],
+) -> GraphValues:
+    """Build the title, labels and plottable values of a graph."""
+    title, x_label, y_label = get_title_and_labels(spec, timestamps)
+
+    return GraphValues(
+        title,
+        x_label,
+        y_label,
+        utils.epochs_to_format(timestamps, "datetime"),
+        utils.nones_to_zeros(visitors),
+    )
+
+
+def load_graph_values(
+    db_handle: database.SQLiteDBManager, spec: GraphSpec
+) -> GraphValues:
+    """Retrieve the values of a graph from the database. Doesn't need tkinter,
+    so it can be used by the GUI and by headless reports."""
+    return make_graph_values(spec, *load_visitors(db_handle, spec))
+
+
+def get_title_and_labels(
+    spec: GraphSpec, timestamps: list[int]
+) -> tuple[str, str, str]:
+    """Title, x-label and y-label of a graph based on its time mode.
+
+    :param list[int] timestamps: A list of epoch timestamps.
+    """
+    if spec.time_mode == "Calendar":
+        found_date = next(
+            (time_stamp for time_stamp in timestamps if time_stamp is not None), None
+        )
+        date = utils.get_finnish_date(found_date)
+        day = utils.get_finnish_day(found_date)
+
+        return f"{spec.location_name}, {day}, {date}", "Hour", spec.graph_mode
+
+    if spec.time_mode == "Daily Average":
+        return f"{spec.location_name}, {spec.weekday}", "Hour", spec.graph_mode
+
+    return f"{spec.location_name}", "", spec.graph_mode
@@ -0,0 +1,123 @@
+import os
+import threading
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+import constants
+
+from .axes import GraphSnapshot, plot_snapshot
+
+RASTER_FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG"}
+VECTOR_FORMATS = {".svg": "svg", ".pdf": "pdf"}
+
+# Size of a single graph in the exported figure (inches)
+GRAPH_SIZE = (8, 5)
+
+
+def _grid_shape(graph_amount: int) -> tuple[int, int]:
+    """Rows and columns of the exported figure. Graph order matches the
+    graph numbers on the screen (1 | 2 on top, 3 | 4 below)."""
+    if graph_amount == 1:
+        return 1, 1
+    if graph_amount == 2:
+        return 2, 1
+    return 2, 2
+
+
+def render_figure(
+    snapshots: list[GraphSnapshot | None],
+    dpi: int = 100,
+    facecolor=constants.LIGHT_GREY,
+) -> Figure:
+    """Render graph snapshots offscreen into one composite figure.
+
+    :param snapshots: Snapshot for every graph position in the layout (1, 2 or 4).
+        None leaves the position empty.
+    :type snapshots: list[GraphSnapshot | None]
+    :param dpi: Resolution of the figure, defaults to 100.
+    :type dpi: int, optional
+    :return: Figure with an Agg canvas. Not connected to tkinter.
+    :rtype: Figure
+    """
+    rows, cols = _grid_shape(len(snapshots))
+
+    fig = Figure(
+        figsize=(GRAPH_SIZE[0] * cols, GRAPH_SIZE[1] * rows),
+        dpi=dpi,
+        facecolor=facecolor,
+        layout="constrained",
+    )
+    FigureCanvasAgg(fig)
+
+    axes = fig.subplots(rows, cols, squeeze=False).flat
+
+    for ax, snapshot in zip(axes, snapshots):
+        if snapshot is None:
+            ax.set_visible(False)
+        else:
+            plot_snapshot(ax, snapshot)
+
+    return fig
+
+
+def export_figure(
+    snapshots: list[GraphSnapshot | None],
+    file_path: str,
+    dpi: int = 100,
+):
+    """Render graph snapshots into one figure and save it to file_path.
+
+    File format is chosen by the file extension. Raster images (.png, .jpg) are
+    saved straight from the Agg buffer. Vector images (.svg, .pdf) are rendered
+    with the matching matplotlib backend.
+
+    :raises ValueError: If the file extension isn't supported.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension not in RASTER_FORMATS and extension not in VECTOR_FORMATS:
+        raise ValueError(f"Unsupported file format '{extension}'")
+
+    fig = render_figure(snapshots, dpi)
+
+    if extension in VECTOR_FORMATS:
+        fig.savefig(file_path, format=VECTOR_FORMATS[extension])
+        return
+
+    fig.canvas.draw()
+    width, height = fig.canvas.get_width_height()
+    # frombuffer shares memory with the Agg buffer instead of copying it
+    image = Image.frombuffer(
+        "RGBA", (width, height), fig.canvas.buffer_rgba(), "raw", "RGBA", 0, 1
+    )
+
+    if RASTER_FORMATS[extension] == "JPEG":
+        # JPEG doesn't support transparency
+        image = image.convert("RGB")
+
+    image.save(file_path, RASTER_FORMATS[extension], dpi=(dpi, dpi))
+
+
+class ExportJob(threading.Thread):
+    """Runs export_figure() on a worker thread.
+
+    Poll `is_alive()` to find out when the export is done. If the export failed,
+    the exception is stored in `error`.
+    """
+
+    def __init__(
+        self, snapshots: list[GraphSnapshot | None], file_path: str, dpi: int = 100
+    ):
+        super().__init__(daemon=True)
+        self.snapshots = snapshots
+        self.file_path = file_path
+        self.dpi = dpi
+        self.error: Exception | None = None
+
+    def run(self):
+        try:
+            export_figure(self.snapshots, self.file_path, self.dpi)
+        except Exception as err:
+            self.error = err
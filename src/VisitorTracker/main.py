@@ -1,32 +1,62 @@
+import time
+
+# Start of app startup. Used by --profile-startup.
+STARTUP_START = time.perf_counter()
+
+import argparse
 import datetime
+import functools
 import ntpath
 import os
 from pathlib import Path
 import threading
-import time
 import webbrowser
 
 from tkinter import filedialog, messagebox
-from typing import Any
+from typing import Any, TYPE_CHECKING
 
 import customtkinter as ctk
 from CTkMenuBar import CTkMenuBar, CustomDropdownMenu
-import numpy as np
-from PIL import Image
-import requests
-
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-import matplotlib.dates as mdates
 
 import constants
 import database
+import graphing
 import retrieve_data.retrieve_data as rd
+from retrieve_data.adaptive import AdaptiveScheduler
+from retrieve_data.http_client import BudgetExceeded, HttpClient
+from retrieve_data.live_feed import LiveFeed, LiveSeries
+from retrieve_data.scheduler import TickScheduler
 from settings.settings import Settings
 import utils
 from utils import DropdownAndLabel, InfoButton, MyPopup, CustomDateEntry
+from utils.event_log import EventLog
+from utils.profiling import StartupProfiler, spans
+
+# matplotlib, PIL and requests are imported on first use to keep startup fast
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+startup_profiler = StartupProfiler(start=STARTUP_START)
+startup_profiler.mark("imports")
 
 app_settings = Settings()
+live_feed = LiveFeed(window=constants.LIVE_WINDOW)
+startup_profiler.mark("settings")
+
+
+@functools.cache
+def _canvas_class() -> type:
+    """FigureCanvasTkAgg that records its draws as "graph.canvas_draw" spans.
+    Created on first use, so that matplotlib isn't imported on startup."""
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+    class TimedFigureCanvas(FigureCanvasTkAgg):
+        # draw_idle() only schedules draw(), so draw() is the actual render
+        @spans.timed("graph.canvas_draw")
+        def draw(self):
+            super().draw()
+
+    return TimedFigureCanvas
 
 
 class App(ctk.CTk):
@@ -35,6 +65,7 @@ class App(ctk.CTk):
         title,
         size=constants.WINDOW_START_SIZE,
         min_size=constants.WINDOW_MIN_SIZE,
+        profile_startup=False,
     ):
         super().__init__()
         self.title(title)
@@ -43,29 +74,59 @@ class App(ctk.CTk):
         self.minsize(min_size[0], min_size[1])
 
         ctk.set_appearance_mode("Dark")
+        startup_profiler.mark("window")
+
+        # Locations and dates are loaded once and shared by the pages
+        snapshot = database.load_startup_snapshot(app_settings.db_path)
+        startup_profiler.mark("startup snapshot")
 
         # Create menubar
         self.menu = MyMenuBar(self)
+        startup_profiler.mark("menubar")
 
         # Create Frame for pages (otherwise pages overlap menubar)
         container = ctk.CTkFrame(self)
         container.pack(side=ctk.TOP, fill=ctk.BOTH, expand=True)
 
         # Create pages
-        self.pages: dict[str, GraphPage | DatabasePage] = {}
-        self.pages["graph"] = GraphPage(container)
+        self.pages: dict[str, GraphPage | DatabasePage | PerformancePage] = {}
+        self.pages["graph"] = GraphPage(container, snapshot)
+        startup_profiler.mark("graph page")
         self.pages["database"] = DatabasePage(container)
+        startup_profiler.mark("database page")
+        self.pages["performance"] = PerformancePage(container)
+        startup_profiler.mark("performance page")
 
         # Place pages in Frame
         self.pages.get("graph").place(x=0, y=0, relwidth=1, relheight=1)
         self.pages.get("database").place(x=0, y=0, relwidth=1, relheight=1)
+        self.pages.get("performance").place(x=0, y=0, relwidth=1, relheight=1)
+
+        # Slow and full scan queries are shown in the database events
+        database.query_log.on_alert = self._query_alert
 
         # Bring graph page on top
         self.lift_page("graph")
 
+        if profile_startup:
+            self.after_idle(self._report_startup)
+
         # run
         self.mainloop()
 
+    def _query_alert(self, record: database.QueryRecord):
+        """Log a slow or full scan query. Called from the thread that ran it."""
+        reason = "Slow query" if record.slow else "Full table scan"
+        self.pages["database"].main_frame.write_to_textbox(
+            f"{reason} ({record.duration * 1000:.1f} ms, {record.rows} rows):\n"
+            f"{record.sql}\n\n"
+        )
+
+    def _report_startup(self):
+        """Print startup timings once the window has been built and shown."""
+        startup_profiler.mark("first idle")
+        startup_profiler.report()
+
     def _calculate_positions(self, size: tuple):
         window_width = size[0]
         window_height = size[1]
@@ -92,15 +153,23 @@ class App(ctk.CTk):
 
         page.lift()
 
+        if page_name == "database":
+            page.main_frame.update_storage_mode()
+        elif page_name == "performance":
+            page.refresh()
+
 
 class GraphPage(ctk.CTkFrame):
-    def __init__(self, parent):
+    def __init__(self, parent, snapshot: database.StartupSnapshot):
         super().__init__(parent, corner_radius=0)
 
         self.all_graphs: list[Graph] = []
         self.graph_amount = constants.DEFAULT_GRAPH_AMOUNT
         # Used to decide if graphs need to be rearranged
         self.active_graph_amount = None
+        self.active_layout: tuple[int, bool, bool] | None = None
+        # Single figure for the 2- and 4-graph layouts. Created on first use.
+        self.shared_figure: SharedFigure | None = None
 
         # main frame
         self.main_frame = ctk.CTkFrame(self)
@@ -118,11 +187,22 @@ class GraphPage(ctk.CTkFrame):
         )
         self.label.place(relx=0.5, rely=0.45, anchor=ctk.CENTER)
 
+        self.render_scheduler = RenderScheduler(self)
+        # Graph values that are being loaded in a worker thread
+        self.plot_request: PlotRequest | None = None
+        self._plot_job: str | None = None
+
         for color in constants.GRAPH_COLORS:
-            self.all_graphs.append(Graph(master=self.main_frame, element_color=color))
+            self.all_graphs.append(
+                Graph(
+                    master=self.main_frame,
+                    element_color=color,
+                    render_scheduler=self.render_scheduler,
+                )
+            )
 
         # Sidebar
-        self.sidebar = GraphSidebar(self)
+        self.sidebar = GraphSidebar(self, snapshot)
         self.sidebar.pack(fill=ctk.Y, side=ctk.LEFT)
         self.main_frame.pack(
             fill=ctk.BOTH, expand=True, side=ctk.LEFT, padx=10, pady=10
@@ -131,40 +211,26 @@ class GraphPage(ctk.CTkFrame):
     def set_ylims(
         self, lower_ylim: float | None, upper_ylim: float | None, graph_amount: int
     ):
-        """Set the y-axis limits for a specified number of graphs.
+        """Set the y-axis limits for a specified number of graphs. Graphs that
+        haven't been plotted are skipped.
 
         :param float | None lower_ylim: The lower limit for the y-axis.
         :param float | None upper_ylim: The upper limit for the y-axis.
         :param int graph_amount: The number of graphs to update.
         """
         for graph_num in range(graph_amount):
-            self.all_graphs[graph_num].ax.set_ylim(lower_ylim, upper_ylim)
-
-    def redraw_graphs(self, graph_amount: int):
-        """Redraw the specified number of graphs on their canvases.
-
-        :param int graph_amount: The number of graphs to redraw.
-        """
-        for graph_num in range(graph_amount):
-            self.all_graphs[graph_num].canvas.draw()
-            self.all_graphs[graph_num].is_drawn = True
+            graph = self.all_graphs[graph_num]
+            if graph.is_drawn or graph.needs_render:
+                graph.ax.set_ylim(lower_ylim, upper_ylim)
 
     def draw_all_graphs(self):
-        """Rearrange graphs and draw all graphs on screen."""
-        if self.graph_amount != self.active_graph_amount:
-            self._arrange_graphs()
-
-        for graph_num in range(self.graph_amount):
-            self.all_graphs[graph_num].draw_graph(self.graph_amount)
-
-        if app_settings.ymode == "Auto Limit":
-            self.set_ylims(*self._get_ylim(), self.graph_amount)
-            self.redraw_graphs(self.graph_amount)
-
-        self.active_graph_amount = self.graph_amount
+        """Rearrange graphs and draw all graphs on screen. Values are loaded
+        in a worker thread, see _request_plot()."""
+        self._request_plot(range(self.graph_amount), draw_all=True)
 
     def draw_single_graph(self, graph_num: int):
-        """Draw a specific graph based on the provided graph number.
+        """Draw a specific graph based on the provided graph number. Values are
+        loaded in a worker thread, see _request_plot().
 
         Note: redraws other graphs if ymode is set to "Auto Limit" and the limit
         needs be changed according to auto limit logic.
@@ -172,17 +238,75 @@ class GraphPage(ctk.CTkFrame):
         :param graph_num: The index of the graph to be drawn. Must be less than `graph_amount`.
         :type graph_num: int
         """
-        if self.graph_amount != self.active_graph_amount:
+        graph_nums = [graph_num] if self.graph_amount >= (graph_num + 1) else []
+        self._request_plot(graph_nums, draw_all=False)
+
+    def _request_plot(self, graph_nums, draw_all: bool):
+        """Start loading the values of the graphs in a worker thread. Graphs
+        are drawn when the values have been loaded.
+
+        A plot request that is still loading is cancelled, and its graphs are
+        loaded again with their current selections together with the new ones.
+        Loading fails with an error message if it takes longer than
+        app_settings.query_timeout.
+        """
+        graph_nums = set(graph_nums)
+
+        if self.plot_request is not None:
+            self.plot_request.cancel()
+            self.after_cancel(self._plot_job)
+            graph_nums.update(
+                num for num in self.plot_request.specs if num < self.graph_amount
+            )
+            draw_all = draw_all or self.plot_request.draw_all
+
+        self.plot_request = PlotRequest(
+            {num: self.all_graphs[num].get_spec() for num in sorted(graph_nums)},
+            app_settings.query_timeout or None,
+            draw_all,
+        )
+        self._plot_job = self.after(constants.PLOT_POLL_INTERVAL, self._poll_plot)
+
+    def _poll_plot(self):
+        """Draw the graphs of the plot request once their values are loaded."""
+        request = self.plot_request
+        if not request.done.is_set():
+            self._plot_job = self.after(constants.PLOT_POLL_INTERVAL, self._poll_plot)
+            return
+
+        self.plot_request = None
+        self._plot_job = None
+
+        if isinstance(request.error, database.QueryTimeout):
+            # Graphs that were loaded before the timeout are drawn
+            self._draw_loaded(request)
+            messagebox.showerror(
+                "Error",
+                f"Loading the graph took longer than {app_settings.query_timeout} "
+                "seconds and was stopped. The query timeout can be changed in "
+                "Settings.",
+            )
+        elif isinstance(request.error, database.QueryCancelled):
+            pass
+        elif request.error is not None:
+            raise request.error
+        else:
+            self._draw_loaded(request)
+
+    def _draw_loaded(self, request: "PlotRequest"):
+        """Rearrange graphs if needed and draw the loaded graphs."""
+        if self._get_layout() != self.active_layout:
             self._arrange_graphs()
 
-        if self.graph_amount >= (graph_num + 1):
-            self.all_graphs[graph_num].draw_graph(self.graph_amount)
+        for graph_num, loaded in request.results.items():
+            if graph_num < self.graph_amount:
+                self.all_graphs[graph_num].draw_graph(self.graph_amount, loaded=loaded)
 
-        if app_settings.ymode == "Auto Limit":
-            self.set_ylims(*self._get_ylim(), self.graph_amount)
-            self.redraw_graphs(self.graph_amount)
+        self.render_scheduler.schedule()
 
         self.active_graph_amount = self.graph_amount
+        if request.draw_all:
+            self.active_layout = self._get_layout()
 
     def _get_auto_ylim(self) -> tuple[float, float]:
         """Calculate auto ylim from all graphs on screen.
@@ -222,12 +346,46 @@ class GraphPage(ctk.CTkFrame):
 
         return ylim
 
+    def uses_shared_figure(self) -> bool:
+        """True if graphs should be drawn on the shared figure with the current
+        settings and graph amount."""
+        return app_settings.graph_layout == "Shared Figure" and self.graph_amount in (
+            2,
+            4,
+        )
+
+    def shared_figure_active(self) -> bool:
+        """True if the graphs on screen are drawn on the shared figure."""
+        return self.active_layout is not None and self.active_layout[1]
+
+    def _get_layout(self) -> tuple[int, bool, bool]:
+        """
+        :return: (graph_amount, uses shared figure, graphs share y-axis)
+        :rtype: tuple[int, bool, bool]
+        """
+        shared = self.uses_shared_figure()
+        return (
+            self.graph_amount,
+            shared,
+            shared and app_settings.ymode == "Auto Limit",
+        )
+
     def _arrange_graphs(self):
-        """Rearrange graphs depending on `graph_amount`."""
+        """Rearrange graphs depending on `graph_amount` and graph layout setting."""
         if self.label:
             self.label.destroy()
             self.label = None
 
+        if self.uses_shared_figure():
+            self._arrange_shared_figure()
+            return
+
+        if self.shared_figure:
+            self.shared_figure.pack_forget()
+
+        for graph in self.all_graphs:
+            graph.attach_own_figure(self.graph_amount)
+
         if self.graph_amount == 1:
             for graph in self.all_graphs:
                 graph.grid_forget()
@@ -270,6 +428,28 @@ class GraphPage(ctk.CTkFrame):
                 sticky="nsew", row=1, column=1, padx=(0, 10), pady=(0, 10)
             )
 
+    def _arrange_shared_figure(self):
+        """Draw all visible graphs on the subplots of the shared figure."""
+        for graph in self.all_graphs:
+            graph.pack_forget()
+            graph.grid_forget()
+
+        if not self.shared_figure:
+            self.shared_figure = SharedFigure(self.main_frame)
+
+        self.shared_figure.pack(
+            side=ctk.TOP, fill=ctk.BOTH, expand=True, padx=10, pady=10
+        )
+
+        _, _, sharey = self._get_layout()
+        axes = self.shared_figure.set_grid(self.graph_amount, sharey)
+
+        for graph_num, graph in enumerate(self.all_graphs):
+            if graph_num < self.graph_amount:
+                graph.attach(axes[graph_num], self.shared_figure.canvas, self.graph_amount)
+            else:
+                graph.attach_own_figure(self.graph_amount)
+
     def get_drawn_graphs(self) -> list[int]:
         """Return list of indexes of graphs that have been drawn."""
         drawn_graphs: list[int] = []
@@ -279,13 +459,130 @@ class GraphPage(ctk.CTkFrame):
 
         return drawn_graphs
 
-    def get_fig(self, graph_num: int) -> Figure:
-        """Retrieve the Figure object for a specified graph.
 
-        :param graph_num: graph's index
-        :type graph_num: int
+class PlotRequest:
+    """Loads the values of graphs from the database in a worker thread, so
+    that Tk stays responsive during long queries. The GraphPage polls `done`
+    and draws the graphs once it's set.
+
+    :param specs: Selections of the graphs to load by graph number.
+    :type specs: dict[int, graphing.GraphSpec]
+    :param timeout: Seconds that loading may take, None for no limit.
+    :type timeout: float | None
+    :param draw_all: Request was made by "Plot all".
+    :type draw_all: bool
+    """
+
+    def __init__(
+        self,
+        specs: dict[int, graphing.GraphSpec],
+        timeout: float | None,
+        draw_all: bool,
+    ):
+        self.specs = specs
+        self.draw_all = draw_all
+        self.token = database.CancellationToken(timeout)
+        # Loaded values by graph number (see Graph.load_values())
+        self.results: dict[int, tuple] = {}
+        self.error: Exception | None = None
+        self.done = threading.Event()
+
+        thread = threading.Thread(target=self._load, daemon=True)
+        thread.start()
+
+    def cancel(self):
+        """Stop the queries of the request. Safe to call from any thread."""
+        self.token.cancel()
+
+    def _load(self):
+        try:
+            for graph_num, spec in self.specs.items():
+                self.results[graph_num] = Graph.load_values(spec, self.token)
+        except Exception as err:
+            self.error = err
+        finally:
+            self.done.set()
+
+
+class RenderScheduler:
+    """Coalesces graph redraws on the GraphPage.
+
+    Graphs mark themselves as needing a render when their data changes. When
+    the scheduled flush runs, the shared "Auto Limit" y-limit is calculated once
+    and only the canvases whose data or y-limits changed are redrawn with
+    `draw_idle()`. Multiple schedule() calls before the flush are coalesced
+    into a single flush. Graphs that aren't on screen are rendered once they
+    are visible again.
+    """
+
+    def __init__(self, page: GraphPage):
+        self.page = page
+        self._flush_id: str | None = None
+
+    def schedule(self):
+        """Schedule a flush for when Tk is idle. Does nothing if a flush is
+        already scheduled."""
+        if self._flush_id is None:
+            self._flush_id = self.page.after_idle(self.flush)
+
+    @spans.timed("graph.render")
+    def flush(self):
+        """Set y-limits and redraw every graph that has changed since its last render."""
+        if self._flush_id is not None:
+            self.page.after_cancel(self._flush_id)
+            self._flush_id = None
+
+        if app_settings.ymode == "Auto Limit":
+            self.page.set_ylims(*self.page._get_ylim(), self.page.graph_amount)
+
+        for graph in self.page.all_graphs[: self.page.graph_amount]:
+            if graph.needs_render or (
+                graph.is_drawn and graph.ax.get_ylim() != graph.rendered_ylim
+            ):
+                graph.render()
+
+
+class SharedFigure(ctk.CTkFrame):
+    """Single figure with a grid of subplots for the 2- and 4-graph layouts.
+
+    All visible graphs are drawn on the same canvas, so only one Agg buffer
+    is needed and the figure can be saved as is.
+    """
+
+    def __init__(self, master, *args, facecolor=constants.LIGHT_GREY, **kwargs):
+        super().__init__(master, *args, **kwargs)
+        self.pack_propagate(False)
+        self.grid_key: tuple[int, bool] | None = None
+        self.axes: list = []
+
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=(20, 20), facecolor=facecolor, layout="constrained")
+        self.canvas = _canvas_class()(self.fig, master=self)
+        self.canvas.get_tk_widget().pack()
+        self.canvas.get_tk_widget().configure(background=facecolor)
+
+    def set_grid(self, graph_amount: int, sharey: bool) -> list:
+        """Create the subplot grid for the graph amount if it doesn't exist yet.
+
+        :param graph_amount: 2 (2x1 grid) or 4 (2x2 grid).
+        :type graph_amount: int
+        :param sharey: share y-axis between the subplots
+        :type sharey: bool
+        :return: list of Axes in graph order
+        :rtype: list[Axes]
         """
-        return self.all_graphs[graph_num].fig
+        grid_key = (graph_amount, sharey)
+
+        if grid_key != self.grid_key:
+            self.fig.clear()
+            rows, cols = (2, 1) if graph_amount == 2 else (2, 2)
+            self.axes = list(
+                self.fig.subplots(rows, cols, sharey=sharey, squeeze=False).flat
+            )
+            self.grid_key = grid_key
+
+        return self.axes
 
 
 class DatabasePage(ctk.CTkFrame):
@@ -300,19 +597,165 @@ class DatabasePage(ctk.CTkFrame):
         self.sidebar.pack(fill=ctk.Y, side=ctk.LEFT)
 
 
+class PerformancePage(ctk.CTkFrame):
+    """Timing spans of database queries, graph drawing and data collection,
+    and the SQL query log.
+
+    Spans are recorded only while "Record timings" is checked (or the app was
+    started with --profile). SQL statements are logged only while "Trace SQL
+    queries" is checked (or the app was started with --trace-sql), by
+    connections opened after it was checked. The tables are refreshed while
+    either is on.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent, corner_radius=0)
+        self._refresh_job: str | None = None
+
+        # Sidebar
+        sidebar = ctk.CTkFrame(self, width=constants.SIDEBAR_WIDTH, corner_radius=0)
+        sidebar.pack(fill=ctk.Y, side=ctk.LEFT)
+        sidebar.pack_propagate(False)
+
+        logo_label = ctk.CTkLabel(
+            sidebar, text="Performance", font=ctk.CTkFont(size=20, weight="bold")
+        )
+        logo_label.pack(side=ctk.TOP, padx=10, pady=(20, 20))
+
+        self.record_checkbox = ctk.CTkCheckBox(
+            sidebar, text="Record timings", command=self.toggle_recording
+        )
+        self.record_checkbox.pack(side=ctk.TOP, padx=10, pady=(10, 10))
+
+        self.trace_checkbox = ctk.CTkCheckBox(
+            sidebar, text="Trace SQL queries", command=self.toggle_tracing
+        )
+        self.trace_checkbox.pack(side=ctk.TOP, padx=10, pady=(10, 10))
+
+        reset_button = ctk.CTkButton(
+            sidebar,
+            text="Reset",
+            width=constants.SIDEBAR_BUTTON_WIDTH,
+            command=self.reset,
+        )
+        reset_button.pack(side=ctk.TOP, padx=10, pady=(10, 10))
+
+        export_button = ctk.CTkButton(
+            sidebar,
+            text="Export JSON",
+            width=constants.SIDEBAR_BUTTON_WIDTH,
+            command=self.export_json,
+        )
+        export_button.pack(side=ctk.TOP, padx=10, pady=(10, 10))
+
+        export_queries_button = ctk.CTkButton(
+            sidebar,
+            text="Export Queries",
+            width=constants.SIDEBAR_BUTTON_WIDTH,
+            command=self.export_queries,
+        )
+        export_queries_button.pack(side=ctk.TOP, padx=10, pady=(10, 10))
+
+        # Span and query tables (read only)
+        self.textbox = ctk.CTkTextbox(
+            self, font=ctk.CTkFont(family="Courier", size=13), wrap="none"
+        )
+        self.textbox.pack(fill=ctk.BOTH, expand=True, side=ctk.RIGHT, padx=10, pady=10)
+        self.textbox.bind("<Key>", lambda e: "break")
+        self.textbox.bind("<Control-c>", lambda e: None)  # Enable Ctrl + c
+        self.textbox.bind("<Control-a>", lambda e: None)  # Enable Ctrl + a
+
+        if spans.enabled:
+            self.record_checkbox.select()
+        if database.query_log.enabled:
+            self.trace_checkbox.select()
+        self.refresh()
+
+    def toggle_recording(self):
+        spans.enabled = bool(self.record_checkbox.get())
+        self.refresh()
+
+    def toggle_tracing(self):
+        database.query_log.enabled = bool(self.trace_checkbox.get())
+        self.refresh()
+
+    def reset(self):
+        spans.reset()
+        database.query_log.reset()
+        self.refresh()
+
+    def refresh(self):
+        """Show the current span table. Refreshed periodically while recording."""
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None
+
+        text = spans.table()
+        if not spans.enabled:
+            text += "\n\nRecording is off. Check 'Record timings' to record spans."
+
+        text += "\n\n\nSQL queries (ms, flags: S = slow, F = full table scan)\n\n"
+        text += database.query_log.table()
+        if not database.query_log.enabled:
+            text += "\n\nTracing is off. Check 'Trace SQL queries' to log queries."
+
+        self.textbox.delete("1.0", ctk.END)
+        self.textbox.insert("1.0", text)
+
+        if spans.enabled or database.query_log.enabled:
+            self._refresh_job = self.after(
+                constants.PERF_REFRESH_INTERVAL, self.refresh
+            )
+
+    def export_json(self):
+        export_path = filedialog.asksaveasfilename(
+            confirmoverwrite=True,
+            defaultextension=".json",
+            initialfile=constants.PERF_DEFAULT_FILENAME,
+            title="Export Timings",
+            filetypes=[("JSON", "*.json")],
+        )
+
+        if export_path:
+            try:
+                spans.export_json(export_path)
+            except OSError as err:
+                messagebox.showerror("Error", f"Unable to export timings.\n{err}")
+                return
+            messagebox.showinfo("Info", "Timings exported.")
+
+    def export_queries(self):
+        export_path = filedialog.asksaveasfilename(
+            confirmoverwrite=True,
+            defaultextension=".json",
+            initialfile=constants.QUERY_LOG_DEFAULT_FILENAME,
+            title="Export Queries",
+            filetypes=[("JSON", "*.json")],
+        )
+
+        if export_path:
+            try:
+                database.query_log.export_json(export_path)
+            except OSError as err:
+                messagebox.showerror("Error", f"Unable to export queries.\n{err}")
+                return
+            messagebox.showinfo("Info", "Queries exported.")
+
+
 class GraphSidebar(ctk.CTkFrame):
     def __init__(
         self,
         parent: GraphPage,
+        snapshot: database.StartupSnapshot,
         width=constants.SIDEBAR_WIDTH,
     ):
         super().__init__(parent, width=width, corner_radius=0)
         self.pack_propagate(False)
         self.parent: GraphPage = parent
 
-        self.locations, self.default_location, self.unique_dates = (
-            self._get_locations_dates()
-        )
+        self.locations = snapshot.locations
+        self.default_location = snapshot.default_location
+        self.unique_dates = snapshot.unique_dates
 
         # Sidebar "Graphs"-label
         self.logo_label = ctk.CTkLabel(
@@ -357,10 +800,8 @@ class GraphSidebar(ctk.CTkFrame):
                     graph_name,
                     self.parent,
                     i,
-                    self.unique_dates,
                     self.parent.all_graphs[i],
-                    self.locations,
-                    self.default_location,
+                    snapshot,
                 )
             )
 
@@ -387,33 +828,14 @@ class GraphSidebar(ctk.CTkFrame):
         Call whenever updating calendar/locations is necessary. (e.g. database is changed to
         a different database or the database gets new locations)
         """
-        locations, location_name, unique_dates = self._get_locations_dates()
-        for graph_tab in self.graph_tabs:
-            graph_tab.update_cal(unique_dates)
-            graph_tab.update_loc(locations, location_name)
-
-    def _get_locations_dates(self) -> tuple[dict[str, int], str, list[str]]:
-        """Get all locations from the database. The first location from the database
-        is used as the selected location (location_name). The selected location is used to get
-        unique dates that have visitor data.
-
-        :return: tuple[all_locations, location_name, unique_dates]
-        :rtype: tuple[dict[str, int], str, list[str]]
-        """
-        locations = constants.NO_LOCATIONS
-        default_location = constants.DEFAULT_LOCATION
-        unique_dates = []
+        snapshot = database.load_startup_snapshot(app_settings.db_path)
+        self.locations = snapshot.locations
+        self.default_location = snapshot.default_location
+        self.unique_dates = snapshot.unique_dates
 
-        with database.SQLiteDBManager(app_settings.db_path) as db_handle:
-            locations_dict = db_handle.get_locations_dict()
-
-            if locations_dict:
-                locations = locations_dict
-                default_location = next(iter(locations_dict.keys()))
-
-            unique_dates = db_handle.get_unique_dates(locations.get(default_location))
-
-        return locations, default_location, unique_dates
+        for graph_tab in self.graph_tabs:
+            graph_tab.update_loc(snapshot.locations, snapshot.default_location)
+            graph_tab.update_cal(snapshot.unique_dates, snapshot.first_time)
 
     def disable_tab_buttons(self, graph_amount: int):
         """Disable 'Plot Graph'-button in all GraphTabs that exceed graph amount"""
@@ -434,10 +856,18 @@ class GraphSidebar(ctk.CTkFrame):
 
 class Graph(ctk.CTkFrame):
     def __init__(
-        self, *args, master=None, element_color="red", padx=0, pady=0, **kwargs
+        self,
+        *args,
+        master=None,
+        element_color="red",
+        padx=0,
+        pady=0,
+        render_scheduler: RenderScheduler | None = None,
+        **kwargs,
     ):
         super().__init__(master, *args, **kwargs)
         self.pack_propagate(False)
+        self.render_scheduler = render_scheduler
         self.time_mode: str = constants.DEFAULT_TIME_MODE
         self.locations: dict = constants.NO_LOCATIONS
         self.location_name: str = constants.DEFAULT_LOCATION
@@ -460,319 +890,412 @@ class Graph(ctk.CTkFrame):
         self.edge_color: str = "grey"
         self.axis_colors: str = "white"
 
+        # Artists are kept between draws and updated in place. Axes are only
+        # rebuilt when axes_key (time mode, graph type, graph amount) changes.
+        self.axes_key: tuple[str, str, int] | None = None
+        self.line = None
+        self.bars = None
+        self.bar_width: float = 0.0
+        # Used by the RenderScheduler to skip redrawing graphs that haven't changed
+        self.values_key: tuple | None = None
+        self.needs_render = False
+        self.rendered_ylim: tuple[float, float] | None = None
+
+        # Live mode. Time Range graphs in constants.LIVE_TIME_RANGES are kept up
+        # to date with samples from live_feed while live mode is on.
+        self.live = False
+        self.live_series: LiveSeries | None = None
+        self._live_job: str | None = None
+
+        # Figure is created when the graph is drawn for the first time
+        self.padx = padx
+        self.pady = pady
+        self.fig: Figure | None = None
+        self.ax = None
+        self.canvas = None
+
+        # Graph's own axes and canvas. Graph is drawn on SharedFigure's axes
+        # and canvas when the shared figure is in use.
+        self.own_ax = None
+        self.own_canvas = None
+
+    def _create_figure(self):
+        """Create the graph's own figure and canvas if they don't exist yet.
+        Figures are created on first use, so that matplotlib isn't imported
+        and no figures are built on startup."""
+        if self.fig is not None:
+            return
+
+        from matplotlib.figure import Figure
+
         self.fig = Figure(
             figsize=(20, 20),
             facecolor=self.facecolor,
             layout="constrained",
         )
-        self.ax = self.fig.add_subplot()
+        self.own_ax = self.fig.add_subplot()
 
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(padx=padx, pady=pady)
+        self.own_canvas = _canvas_class()(self.fig, master=self)
+        self.own_canvas.get_tk_widget().pack(padx=self.padx, pady=self.pady)
 
         # Hide annoying white lines caused by canvas background by changing canvas bg color
         # to match surrounding color. (These lines seem to only show up with certain fig sizes)
-        self.canvas.get_tk_widget().configure(background=constants.LIGHT_GREY)
+        self.own_canvas.get_tk_widget().configure(background=constants.LIGHT_GREY)
+
+        if self.ax is None:
+            self.ax = self.own_ax
+            self.canvas = self.own_canvas
+
+    @spans.timed("graph.draw_graph")
+    def draw_graph(
+        self,
+        graph_amount: int = 1,
+        force_draw=False,
+        loaded: "tuple[graphing.GraphValues, LiveSeries | None] | None" = None,
+    ):
+        """Retrieve graph values from the database, set axes values and plot graph.
+        The graph is marked as needing a render if anything visible changed. The
+        canvas itself is redrawn by the GraphPage's RenderScheduler, which also
+        sets the shared y-limits when app_settings.ymode is "Auto Limit".
 
-    def draw_graph(self, graph_amount: int = 1, force_draw=False):
-        """Retrieve graph values from the database, set axes values, plot graph
-        and finally if app_settings.ymode isn't "Auto Limit" draw the graph on
-        tkinter canvas.
+        Axes and artists are only rebuilt when time mode, graph type or graph amount
+        changes. Otherwise the existing artists are updated in place.
 
         :param graph_amount: amount of graphs that will be drawn, defaults to 1.
             If graph amount is 4, only every other value is used for bar graph
         :type graph_amount: int, optional
-        :param force_draw: force drawing the graph on tkinter canvas even if
-            app_settings.ymode is "Auto Limit", defaults to False
+        :param force_draw: render the graph even if nothing has changed since
+            the last render, defaults to False
         :type force_draw: bool, optional
+        :param loaded: values from load_values(), defaults to None (values are
+            loaded now)
+        :type loaded: tuple[graphing.GraphValues, LiveSeries | None] | None, optional
         """
-        self._update_graph_values()
-        self._set_axes(graph_amount)
+        if self.ax is None:
+            self._create_figure()
 
-        # Plot graph
-        if self.graph_type.lower() == "bar graph":
-            width = np.diff(self.x_values).min() * 0.80
-
-            self.ax.bar(
-                self.x_values,
-                self.y_values,
-                color=self.element_color,
-                align="center",
-                width=width,
-            )
-            # self.ax.xaxis_date()
-        elif self.graph_type.lower() == "line graph":
-            self.ax.plot(
-                self.x_values,
-                self.y_values,
-                color=self.element_color,
-                linewidth=4,
-            )
+        self._update_graph_values(loaded)
+
+        axes_key = (self.time_mode, self.graph_type.lower(), graph_amount)
+        values_key = (
+            self.title,
+            self.x_label,
+            self.y_label,
+            tuple(self.x_values),
+            tuple(self.y_values),
+        )
+
+        if axes_key != self.axes_key or not self._artists_fit():
+            self.axes_key = axes_key
+            self._set_axes(graph_amount)
+            self._plot_values()
+            self.needs_render = True
+        elif values_key != self.values_key:
+            self._update_values()
+            self.needs_render = True
+
+        self.values_key = values_key
 
-        # Set ylimits
+        if force_draw or not self.is_drawn:
+            self.needs_render = True
+
+        self._set_ylim()
+        self._update_live()
+
+    def _set_ylim(self):
+        """Set ylimits. ("Auto Limit" ylims are set by the RenderScheduler)"""
         if app_settings.ymode == "Select Limit":
             self.ax.set_ylim(*app_settings.ylim)
         elif app_settings.ymode == "No Limit":
             self.ax.set_ylim(app_settings.ylim[0], None)
-        elif app_settings.ymode == "Auto Limit":
-            # Force drawing graphs even if auto limit ymode is set
-            if force_draw:
-                self.canvas.draw()
-                self.is_drawn = True
-
-            # The Graphs need the ylims of other graphs before drawing,
-            # so the graphs will be drawn with redraw_graphs() later.
-            return  # Stop graphs from being drawn twice.
-
-        # Draw graph on tkinter canvas
-        self.canvas.draw()
-        self.is_drawn = True
 
-    def _update_graph_values(self):
-        """Update the graph values based on the current time mode and location.
+    def attach(self, ax, canvas, graph_amount: int):
+        """Draw the graph on the given axes and canvas. Values that are currently
+        plotted are replotted on the new axes.
 
-        Retrieves data from the database and sets the title, x-label, y-label,
-        x-values, and y-values for the graph.
+        :param ax: matplotlib Axes
+        :param canvas: FigureCanvasTkAgg that the axes belongs to
+        :param graph_amount: amount of graphs that will be drawn
+        :type graph_amount: int
         """
-        with database.SQLiteDBManager(app_settings.db_path) as db_handle:
-            if self.time_mode == "Calendar":
-                search_start, search_end = self._get_search_range()
-                visitors = db_handle.get_data_by_mode(
-                    self.locations.get(self.location_name),
-                    search_start,
-                    search_end,
-                    constants.GRAPH_MODES.get(self.graph_mode),
-                    60 * 60,
-                )
-                timestamps = database.helpers.calculate_timestamps(
-                    search_start, search_end, 60 * 60
-                )
-            elif self.time_mode == "Daily Average":
-                visitors = db_handle.get_average_visitors(
-                    self.locations.get(self.location_name),
-                    constants.WEEKDAYS.get(self.weekday),
-                )
-                timestamps = utils.day_epochs()
-            elif self.time_mode == "Time Range":
-                time_r_interval = 60 * 60
-                search_start, search_end = self._get_search_range()
-                visitors = db_handle.get_data_by_mode(
-                    self.locations.get(self.location_name),
-                    search_start,
-                    search_end,
-                    constants.GRAPH_MODES.get(self.graph_mode),
-                    time_r_interval,
-                )
-                timestamps = database.helpers.calculate_timestamps(
-                    search_start, search_end, time_r_interval
-                )
-
-        self._set_title_and_labels(timestamps)
-        self.x_values = utils.epochs_to_format(timestamps, "datetime")
-        self.y_values = utils.nones_to_zeros(visitors)
-
-    def _get_search_range(self) -> tuple[int, int]:
-        search_start: int
-        search_end: int
-
-        if self.time_mode == "Calendar":
-            search_start = utils.formatted_date_to_epoch(f"{self.graph_date} 00:00:00")
-            search_end = utils.next_time(search_start, days=1)  # +1 day
-        elif self.time_mode == "Time Range":
-            search_end_dt = datetime.datetime.now()
-            search_end = utils.datetime_to_epoch(search_end_dt)
-
-            time_dif_td = utils.get_time_delta(self.time_range, "negative")
-            if time_dif_td:
-                search_start_dt = search_end_dt + time_dif_td
-                search_start = utils.datetime_to_epoch(search_start_dt)
-            else:
-                search_start = self._get_all_search_start()
+        if ax is self.ax:
+            return
 
-        # print("\nSearch start:", utils.get_formatted_finnish_time(search_start))
-        # print("Search end:  ", utils.get_formatted_finnish_time(search_end))
+        self.ax = ax
+        self.canvas = canvas
+        self.rendered_ylim = None
 
-        return search_start, search_end
+        if self.axes_key is None:
+            return
 
-    def get_first(self) -> datetime.datetime | None:
-        """Get first epoch of chosen location from the database.
+        time_mode, graph_type, _ = self.axes_key
+        self.axes_key = (time_mode, graph_type, graph_amount)
+        self._set_axes(graph_amount)
+        self._plot_values()
+        self._set_ylim()
+        self.needs_render = self.is_drawn
+
+    def attach_own_figure(self, graph_amount: int):
+        """Draw the graph on its own axes and canvas."""
+        if self.axes_key is None:
+            # Nothing plotted yet. Own figure is created on first draw.
+            self.ax = self.own_ax
+            self.canvas = self.own_canvas
+            return
+
+        self._create_figure()
+        self.attach(self.own_ax, self.own_canvas, graph_amount)
+
+    def get_snapshot(self) -> "graphing.GraphSnapshot | None":
+        """Return a copy of the plotted values and style of the graph. None if
+        the graph hasn't been plotted."""
+        if self.axes_key is None:
+            return None
+
+        time_mode, graph_type, graph_amount = self.axes_key
+
+        return graphing.GraphSnapshot(
+            time_mode=time_mode,
+            graph_type=graph_type,
+            title=self.title,
+            x_label=self.x_label,
+            y_label=self.y_label,
+            x_values=list(self.x_values),
+            y_values=list(self.y_values),
+            element_color=self.element_color,
+            ylim=tuple(self.ax.get_ylim()),
+            graph_amount=graph_amount,
+            facecolor=self.facecolor,
+            axis_colors=self.axis_colors,
+            edge_color=self.edge_color,
+        )
+
+    def set_live(self, live: bool):
+        """Turn live mode on or off."""
+        self.live = live
+        self._update_live()
+
+    def _is_live(self) -> bool:
+        """True if the graph should currently be updated from the live feed."""
+        return (
+            self.live
+            and self.live_series is not None
+            and self.time_mode == "Time Range"
+            and self.time_range in constants.LIVE_TIME_RANGES
+            and self.axes_key is not None
+            and self.axes_key[0] == "Time Range"
+        )
+
+    def _update_live(self):
+        """Start or stop live updates depending on the current graph settings."""
+        if self._live_job is not None:
+            self.after_cancel(self._live_job)
+            self._live_job = None
+
+        if self._is_live():
+            self._live_job = self.after(self._live_delay(), self._live_tick)
+
+    def _live_delay(self) -> int:
+        """Delay between live updates in milliseconds. Live updates are throttled
+        to the active data collection interval."""
+        interval = live_feed.interval or constants.DATA_COL_INTERVALS.get(
+            constants.DEFAULT_COL_INTERVAL
+        )
+        return interval * 1000
+
+    def _live_tick(self):
+        """Add new samples from the live feed to the graph and slide the graph
+        window to the current time."""
+        self._live_job = None
+
+        if not self._is_live():
+            return
+
+        series = self.live_series
+        series.add_many(live_feed.get_since(series.location_id, series.last_epoch))
+        series.advance_to(utils.datetime_to_epoch(datetime.datetime.now()))
+
+        self.x_values = utils.epochs_to_format(series.timestamps(), "datetime")
+        self.y_values = utils.nones_to_zeros(series.averages())
+        self.values_key = None
+
+        self._update_values()
+        self._set_ylim()
+        self.needs_render = True
+        if self.render_scheduler:
+            self.render_scheduler.schedule()
+
+        self._live_job = self.after(self._live_delay(), self._live_tick)
+
+    def render(self):
+        """Redraw the graph on tkinter canvas when Tk is idle."""
+        self.canvas.draw_idle()
+        self.rendered_ylim = self.ax.get_ylim()
+        self.needs_render = False
+        self.is_drawn = True
 
-        :return: first epoch of chosen location as datetime Object
-        :rtype: datetime.datetime | None
-        """
-        with database.SQLiteDBManager(app_settings.db_path) as db_handle:
-            search_start = db_handle.get_first_time(
-                self.locations.get(self.location_name)
+    def _artists_fit(self) -> bool:
+        """True if the current artists can be updated in place with the new values."""
+        if self.graph_type.lower() == "bar graph":
+            return self.bars is not None and len(self.bars.patches) == len(
+                self.y_values
             )
 
-        if search_start:
-            search_start = utils.get_localized_datetime(search_start)
-
-        return search_start
+        return self.line is not None
 
-    def _get_all_search_start(self) -> int | None:
-        search_start_dt = self.get_first()
+    def _plot_values(self):
+        """Create new bar or line artists from the graph values."""
+        _, graph_type, _ = self.axes_key
 
-        if not search_start_dt:
-            return search_start_dt
+        artist = graphing.plot_values(
+            self.ax, graph_type, self.x_values, self.y_values, self.element_color
+        )
 
-        search_start_dt = utils.top_of_the_hour(search_start_dt)
+        if graph_type == "bar graph":
+            self.bars = artist
+            # Bar width in axis units. Used for moving the bars in place.
+            self.bar_width = self.bars.patches[0].get_width()
+        elif graph_type == "line graph":
+            self.line = artist
 
-        return utils.datetime_to_epoch(search_start_dt)
+    def _update_values(self):
+        """Update title, labels and existing artists with the graph values without
+        rebuilding the axes."""
+        import matplotlib.dates as mdates
 
-    def _set_axes(self, graph_amount: int):
-        """Clears previous axis values and then sets all axis values to the new ones.
+        time_mode, graph_type, _ = self.axes_key
 
-        :param graph_amount: amount of graphs that will be drawn. Affects the
-            interval of data to reduce graph label overlap
-        :type graph_amount: int
-        """
-        self.ax.clear()
-        self.ax.set_facecolor(self.axis_colors)
-        self.ax.set_title(self.title, color=self.axis_colors)
-        self.ax.set_xlabel(self.x_label, color=self.axis_colors)
-        self.ax.set_ylabel(self.y_label, color=self.axis_colors)
-        self.ax.yaxis.set_tick_params(
-            color=self.axis_colors, labelcolor=self.axis_colors
+        graphing.set_title_and_labels(
+            self.ax, self.title, self.x_label, self.y_label, self.axis_colors
         )
-        self.ax.xaxis.set_tick_params(
-            which=ctk.BOTH,
-            color=self.axis_colors,
-            labelcolor=self.axis_colors,
-        )
-
-        for spine in self.ax.axes.spines.values():
-            spine.set_edgecolor(self.edge_color)
-
-        if self.time_mode == "Time Range":
 
-            locator = mdates.AutoDateLocator(tz=constants.DEFAULT_TIMEZONE)
-            formatter = mdates.ConciseDateFormatter(
-                locator, tz=constants.DEFAULT_TIMEZONE
-            )
+        if graph_type == "bar graph":
+            x_nums = mdates.date2num(self.x_values)
+            for rect, x_num, height in zip(self.bars.patches, x_nums, self.y_values):
+                rect.set_x(x_num - self.bar_width / 2)
+                rect.set_height(height)
+        elif graph_type == "line graph":
+            self.line.set_data(self.x_values, self.y_values)
 
-            # '%#d' only works with windows. '%-d' on linux
-            formatter.formats = [
-                "%y",  # ticks are mostly years
-                "%b",  # ticks are mostly months
-                "%a, %#d.",  # ticks are mostly days
-                "%H:%M",  # hrs
-                "%H:%M",  # min
-                "%S.%f",  # secs
-            ]
-
-            formatter.zero_formats = [
-                "",
-                "%b %Y",
-                "%b '%y",
-                "%a, %#d.",  # '%#d' only works with windows. '%-d' on linux
-                "%H:%M",
-                "%H:%M",
-            ]
-
-            formatter.offset_formats = [
-                "%Y",
-                "%Y",
-                "%b %Y",
-                "%d %b %Y",
-                "%d %b %Y",
-                "%d %b %Y %H:%M",
-            ]
-
-            self.ax.xaxis.set_major_locator(locator)
-            self.ax.xaxis.set_major_formatter(formatter)
+        if time_mode == "Time Range":
+            self.ax.relim()
+            self.ax.autoscale(enable=True, axis="both")
         else:
-            interval = 1
-
-            # x-values go over each other if 4 graphs on screen. Figures are too small.
-            if graph_amount == 4:
-                interval = 2
+            self.ax.set_xlim(*self.get_limits(self.x_values))
+            self.ax.relim()
+            self.ax.autoscale(enable=True, axis="y")
+
+    @staticmethod
+    @spans.timed("graph.load_values")
+    def load_values(
+        spec: graphing.GraphSpec, token: database.CancellationToken | None = None
+    ) -> "tuple[graphing.GraphValues, LiveSeries | None]":
+        """Retrieve the values of a graph from the database. Doesn't use Tk, so
+        it can be called from a worker thread.
+
+        :param spec: selections of the graph
+        :type spec: graphing.GraphSpec
+        :param token: stops the queries when cancelled or past its deadline
+        :type token: database.CancellationToken | None, optional
+        :raises database.QueryCancelled: If the token stopped the queries.
+        :return: graph values and the samples for live updates (None if the
+            graph can't be updated live)
+        :rtype: tuple[graphing.GraphValues, LiveSeries | None]
+        """
+        live_series = None
 
-            locator = mdates.HourLocator(
-                byhour=range(24), interval=interval, tz=constants.DEFAULT_TIMEZONE
-            )
-            # '%#H' only works on windows
-            formatter = mdates.DateFormatter("%#H", tz=constants.DEFAULT_TIMEZONE)
+        with database.SQLiteDBManager(app_settings.db_path, token=token) as db_handle:
+            if (
+                spec.time_mode == "Time Range"
+                and spec.time_range in constants.LIVE_TIME_RANGES
+                and constants.GRAPH_MODES.get(spec.graph_mode) == "avg"
+            ):
+                # Keep the samples in memory so the graph can be updated live
+                search_start, search_end = graphing.get_search_range(db_handle, spec)
+                live_series = LiveSeries(
+                    spec.location_id, search_start, search_end, graphing.data.HOUR
+                )
+                live_series.add_many(
+                    db_handle.get_sampled_activity_between(
+                        spec.location_id, search_start, search_end
+                    )
+                )
+                values = graphing.make_graph_values(
+                    spec,
+                    live_series.timestamps(),
+                    live_series.averages(),
+                )
+            else:
+                values = graphing.load_graph_values(db_handle, spec)
 
-            self.ax.xaxis.set_major_locator(locator)
-            self.ax.xaxis.set_major_formatter(formatter)
+        return values, live_series
 
-            lower_limit, upper_limit = self.get_limits(self.x_values)
-            self.ax.set_xlim(lower_limit, upper_limit)
+    def _update_graph_values(
+        self, loaded: "tuple[graphing.GraphValues, LiveSeries | None] | None" = None
+    ):
+        """Update the graph values based on the current time mode and location.
 
-    def _set_title_and_labels(self, timestamps: list[int]):
-        """Set the title and axis labels for the graph based on the current
-        time mode and timestamps.
+        Sets the title, x-label, y-label, x-values, and y-values for the graph.
 
-        This method updates the graph's title, x-axis label, and y-axis label
-        according to the current time mode.
+        :param loaded: values from load_values(), defaults to None (values are
+            retrieved from the database now)
+        :type loaded: tuple[graphing.GraphValues, LiveSeries | None] | None, optional
+        """
+        if loaded is None:
+            loaded = self.load_values(self.get_spec())
+
+        values, self.live_series = loaded
+
+        self.title = values.title
+        self.x_label = values.x_label
+        self.y_label = values.y_label
+        self.x_values = values.x_values
+        self.y_values = values.y_values
+
+    def get_spec(self) -> graphing.GraphSpec:
+        """Current selections of the graph as a GraphSpec."""
+        return graphing.GraphSpec(
+            location_id=self.locations.get(self.location_name),
+            location_name=self.location_name,
+            time_mode=self.time_mode,
+            graph_mode=self.graph_mode,
+            graph_type=self.graph_type,
+            graph_date=self.graph_date,
+            weekday=self.weekday,
+            time_range=self.time_range,
+        )
+
+    @spans.timed("graph.set_axes")
+    def _set_axes(self, graph_amount: int):
+        """Clears previous axis values and then sets all axis values to the new ones.
+        Time mode of the axes is read from `axes_key`.
 
-        :param list[int] timestamps: A list of epoch timestamps.
+        :param graph_amount: amount of graphs that will be drawn. Affects the
+            interval of data to reduce graph label overlap
+        :type graph_amount: int
         """
-        if self.time_mode == "Calendar":
-            # Korjaa! Lisää check, että oikean tyyppistä dataa.
-            # for time_stamp in data[0]:
-            for time_stamp in timestamps:
-                if time_stamp is not None:
-                    found_date = time_stamp
-                    break
-            date = utils.get_finnish_date(found_date)
-            day = utils.get_finnish_day(found_date)
-
-            self.title = f"{self.location_name}, {day}, {date}"
-            self.x_label = "Hour"
-            self.y_label = self.graph_mode
-        elif self.time_mode == "Daily Average":
-            self.title = f"{self.location_name}, {self.weekday}"
-            self.x_label = "Hour"
-            self.y_label = self.graph_mode
-        elif self.time_mode == "Time Range":
-            self.title = f"{self.location_name}"
-            self.x_label = ""
-            self.y_label = self.graph_mode
+        graphing.style_axes(
+            self.ax,
+            self.axes_key[0],
+            graph_amount,
+            self.x_values,
+            self.axis_colors,
+            self.edge_color,
+        )
+        graphing.set_title_and_labels(
+            self.ax, self.title, self.x_label, self.y_label, self.axis_colors
+        )
+        self.line = None
+        self.bars = None
 
     def get_limits(
         self, datetimes: list[datetime.datetime]
     ) -> tuple[datetime.datetime, datetime.datetime]:
         """
         Calculate and return the lower and upper limits based on a list of datetime objects.
-
-        The function computes the difference between the first two datetime objects in the list.
-        It then uses this difference to calculate a lower limit by subtracting 0.75% of
-        the difference from the first datetime, and an upper limit by adding 0.75% of
-        the difference to the last datetime.
-
-        Parameters:
-        ---
-        datetimes : list[datetime]
-            A list of datetime objects. The list must contain at least two elements.
-            The datetime should be in chronological order, starting from the earliest
-            to the latest.
-
-        Returns:
-        ---
-        tuple[datetime, datetime]
-            A tuple containing the calculated lower and upper limits as datetime objects.
-
-        Raises:
-        ---
-        ValueError
-            If the list contains fewer than two datetime objects.
+        See graphing.get_limits().
         """
-        if len(datetimes) >= 2:
-            difference = (
-                datetimes[1] - datetimes[0]
-                if datetimes[0] < datetimes[1]
-                else datetimes[0] - datetimes[1]
-            )
-        else:
-            raise ValueError("The list must contain at least two datetime objects")
-
-        lower_lim = datetimes[0] - (difference * 0.75)
-        upper_lim = datetimes[-1] + (difference * 0.75)
-
-        return lower_lim, upper_lim
+        return graphing.get_limits(datetimes)
 
     def reduce_values(self, values: list[Any | str]) -> list[Any | str]:
         """Change every other value in a list to empty string ''."""
@@ -794,10 +1317,8 @@ class GraphTab:
         tab_name: str,
         graph_page: GraphPage,
         graph_num: int,
-        unique_dates: list[str],
         graph: Graph,
-        locations: dict[str, int],
-        default_location: str,
+        snapshot: database.StartupSnapshot,
     ):
         parent.add(tab_name)
         self.handle = parent.tab(tab_name)
@@ -805,8 +1326,8 @@ class GraphTab:
         self.graph_page = graph_page
         self.graph_num = graph_num
         self.graph: Graph = graph
-        self.graph.locations = locations
-        self.graph.location_name = default_location
+        self.graph.locations = snapshot.locations
+        self.graph.location_name = snapshot.default_location
 
         # create scrollable frame
         self.scrollable_frame = ctk.CTkScrollableFrame(self.handle)
@@ -878,7 +1399,7 @@ class GraphTab:
         # Create Calendar
         self.cal = CustomDateEntry(
             self.cal_frame,
-            dates=unique_dates,
+            dates=snapshot.unique_dates,
             date_pattern="dd-mm-yyyy",
             justify="center",
             width=constants.SIDEBAR_BUTTON_WIDTH,
@@ -895,10 +1416,9 @@ class GraphTab:
             cursor="hand2",
             background=ctk.ThemeManager.theme["CTkFrame"]["fg_color"][1],
             selectbackground=ctk.ThemeManager.theme["CTkButton"]["fg_color"][1],
-            mindate=self.graph.get_first(),
+            mindate=self._get_mindate(snapshot.first_time),
             maxdate=datetime.date.today(),
         )
-        self.cal.highlight_dates()
         self.cal.bind("<<DateEntrySelected>>", self.update_date)  # Update calendar date
         self.cal.bind("<Key>", lambda e: "break")  # Disable writing in calendar
         self.cal.bind("<Control-c>", lambda e: None)  # Enable Ctrl + c
@@ -954,7 +1474,16 @@ class GraphTab:
             constants.DEFAULT_TIME_RANGE,
             constants.SIDEBAR_BUTTON_WIDTH,
         )
-        self.time_range_menu.pack(side=ctk.TOP, padx=10, pady=(10, 10))
+        self.time_range_menu.pack(side=ctk.TOP, padx=10, pady=(5, 5))
+        # Live checkbox
+        self.live_checkbox = ctk.CTkCheckBox(
+            self.time_range_frame,
+            text="Live",
+            command=self.change_live_event,
+            checkbox_width=18,
+            checkbox_height=18,
+        )
+        self.live_checkbox.pack(side=ctk.TOP, padx=10, pady=(0, 5))
 
         # Lift calendar frame to top
         self.calendar_frame.lift()
@@ -992,16 +1521,22 @@ class GraphTab:
         )
         self.location_menu.pack(side=ctk.TOP, padx=10, pady=(10, 10))
 
-    def update_cal(self, dates: list[str]):
-        """Removes old highlighted dates from the calendar and highlights dates in the
-        given dates list."""
+    def update_cal(self, dates: list[str], first_time: int | None):
+        """Set dates that are highlighted in the calendar. Highlighting is done
+        when the calendar is opened.
+
+        :param dates: dates with data ("%d-%m-%Y")
+        :param first_time: first epoch timestamp of the location, None if no data
+        """
         self.cal.dates = dates
-        mindate = self.graph.get_first()
         maxdate = datetime.date.today()
-        if not mindate:
-            mindate = maxdate
+        mindate = self._get_mindate(first_time) or maxdate
         self.cal.configure(mindate=mindate, maxdate=maxdate)
-        self.cal.highlight_dates()
+
+    def _get_mindate(self, first_time: int | None) -> datetime.datetime | None:
+        if not first_time:
+            return None
+        return utils.get_localized_datetime(first_time)
 
     def update_loc(self, locations: dict[str, int], location_name: str):
         """Update locations"""
@@ -1071,14 +1606,24 @@ class GraphTab:
     def change_time_range_event(self, value):
         self.graph.time_range = value
 
+        if value in constants.LIVE_TIME_RANGES:
+            self.live_checkbox.configure(state=ctk.NORMAL)
+        else:
+            self.live_checkbox.configure(state=ctk.DISABLED)
+
+    def change_live_event(self):
+        self.graph.set_live(bool(self.live_checkbox.get()))
+
     def change_location_event(self, value):
         self.graph.location_name = value
 
+        location_id = self.graph.locations.get(self.graph.location_name)
+
         with database.SQLiteDBManager(app_settings.db_path) as db_handle:
-            unique_dates = db_handle.get_unique_dates(
-                self.graph.locations.get(self.graph.location_name)
-            )
-            self.update_cal(unique_dates)
+            unique_dates = db_handle.get_unique_dates(location_id)
+            first_time = db_handle.get_first_time(location_id)
+
+        self.update_cal(unique_dates, first_time)
 
 
 class DatabaseMainFrame(ctk.CTkFrame):
@@ -1088,6 +1633,11 @@ class DatabaseMainFrame(ctk.CTkFrame):
         self.col_interval = constants.DEFAULT_COL_INTERVAL
         self.col_active = False
 
+        # Events can be logged from any thread. Textbox is updated in batches
+        # from the Tk thread.
+        self.event_log = EventLog(constants.LOG_MAX_ENTRIES)
+        self.textbox_entries = 0  # Entries currently in the textbox
+
         # create frame for textbox label and textbox
         self.textbox_frame = ctk.CTkFrame(parent, width=constants.TEXTBOX_WIDTH)
         self.textbox_frame.pack(side=ctk.RIGHT, fill=ctk.Y, padx=(0, 10), pady=10)
@@ -1157,14 +1707,104 @@ class DatabaseMainFrame(ctk.CTkFrame):
         )
         self.interval_label.pack(side=ctk.TOP, pady=(10, 10))
 
+        # Log file Checkbox
+        self.log_file_checkbox = ctk.CTkCheckBox(
+            master=self,
+            text="Write log to file",
+            command=self.toggle_log_file,
+        )
+        self.log_file_checkbox.pack(side=ctk.TOP, pady=(10, 0))
+
+        # Storage mode Checkbox. Updated from the database when the page is shown.
+        self.storage_mode_checkbox = ctk.CTkCheckBox(
+            master=self,
+            text="Store only changes",
+            command=self.toggle_storage_mode,
+        )
+        self.storage_mode_checkbox.pack(side=ctk.TOP, pady=(10, 0))
+
+        self.after(constants.LOG_DRAIN_INTERVAL, self._drain_log)
+
     def write_to_textbox(self, text: str):
-        self.textbox.insert("0.0", text)
+        """Log an event. Safe to call from any thread. The textbox is updated
+        by the Tk thread in _drain_log()."""
+        self.event_log.put(text)
+
+    def _drain_log(self):
+        self._show_entries(self.event_log.drain())
+        self.after(constants.LOG_DRAIN_INTERVAL, self._drain_log)
+
+    def _show_entries(self, entries: list[str]):
+        """Insert entries to the top of the textbox (newest first). When the
+        textbox has LOG_TRIM_SLACK entries more than the event log keeps, it is
+        rebuilt from the event log."""
+        if not entries:
+            return
+
+        self.textbox.insert("0.0", "".join(reversed(entries)))
+        self.textbox_entries += len(entries)
+
+        if self.textbox_entries > self.event_log.max_entries + constants.LOG_TRIM_SLACK:
+            self.textbox.delete("0.0", ctk.END)
+            self.textbox.insert("0.0", "".join(reversed(self.event_log.entries)))
+            self.textbox_entries = len(self.event_log.entries)
+
+    def toggle_log_file(self):
+        """Write events to a rotating log file instead of the textbox."""
+        if self.log_file_checkbox.get():
+            file_path = Path(__file__).parent / constants.LOG_FILE
+            try:
+                self.event_log.set_file(
+                    file_path,
+                    constants.LOG_FILE_MAX_BYTES,
+                    constants.LOG_FILE_BACKUPS,
+                )
+            except OSError as err:
+                self.log_file_checkbox.deselect()
+                messagebox.showerror("Error", f"Unable to open log file.\n{err}")
+                return
+            entry = f"Writing log to file: {file_path}\n\n"
+        else:
+            self.event_log.set_file(None)
+            entry = "Writing log to file stopped.\n\n"
+
+        self.event_log.put(entry, widget_only=True)
+
+    def update_storage_mode(self):
+        """Set storage mode checkbox to the storage mode of the database."""
+        with database.SQLiteDBManager(app_settings.db_path) as db_handle:
+            storage_mode = db_handle.storage_mode
+
+        if storage_mode == "changes":
+            self.storage_mode_checkbox.select()
+        else:
+            self.storage_mode_checkbox.deselect()
+
+    def toggle_storage_mode(self):
+        """Store only readings that change the visitor count (and keep-alive
+        readings) or every reading."""
+        storage_mode = "changes" if self.storage_mode_checkbox.get() else "all"
+
+        with database.SQLiteDBManager(app_settings.db_path) as db_handle:
+            db_handle.set_storage_mode(storage_mode)
+
+        if storage_mode == "changes":
+            self.write_to_textbox(
+                "Storing only changes. Repeated visitor amounts extend the "
+                "previous reading.\n\n"
+            )
+        else:
+            self.write_to_textbox("Storing every reading.\n\n")
 
     def toggle_collection(self):
         self.col_active = not self.col_active
         self.collection_checkbox.configure(state=ctk.NORMAL)
         self.collection_checkbox.toggle()
         self.collection_checkbox.configure(state=ctk.DISABLED)
+        # The collector reads the storage mode when it starts
+        self.storage_mode_checkbox.configure(
+            state=ctk.DISABLED if self.col_active else ctk.NORMAL
+        )
 
     def change_interval(self, interval: str):
         self.col_interval = interval
@@ -1185,17 +1825,16 @@ class DatabaseSidebar(ctk.CTkFrame):
     ):
         super().__init__(parent, width=width, corner_radius=0)
         self.pack_propagate(False)
-        self.thread_id = 1  # Used for stopping data collection
+        # Scheduler of the running data collection. Stopping it stops collection.
+        self.tick_scheduler: TickScheduler | None = None
+        # Set by the data collection thread if collection was aborted because of
+        # an error. Checked by the Tk thread, which stops data collection.
+        self.collection_aborted = threading.Event()
+        self._check_job: str | None = None
         self.col_interval = constants.DEFAULT_COL_INTERVAL
 
         self.parent = parent
         self.main_frame = main_frame
-        self.unique_dates = []
-
-        with database.SQLiteDBManager(app_settings.db_path) as db_handle:
-            self.unique_dates = db_handle.get_unique_dates(
-                constants.RETRIEVAL_LOCATIONS.get(constants.DEFAULT_RETRIEVAL_LOCATION)
-            )
 
         # Sidebar label
         self.logo_label = ctk.CTkLabel(
@@ -1247,7 +1886,8 @@ class DatabaseSidebar(ctk.CTkFrame):
         # Interval dropdown menu
         self.interval_option_menu = ctk.CTkOptionMenu(
             self,
-            values=list(constants.DATA_COL_INTERVALS.keys()),
+            values=list(constants.DATA_COL_INTERVALS.keys())
+            + [constants.ADAPTIVE_COL_INTERVAL],
             command=self.change_interval_event,
             variable=ctk.StringVar(value=constants.DEFAULT_COL_INTERVAL),
             width=constants.SIDEBAR_BUTTON_WIDTH,
@@ -1262,17 +1902,37 @@ class DatabaseSidebar(ctk.CTkFrame):
         self.main_frame.toggle_collection()
         self.main_frame.change_interval_label(self.col_interval)
         self.write_to_textbox("Data Collection Started!\n\n")
+        # None interval collects data with an adaptive interval
+        interval = constants.DATA_COL_INTERVALS.get(self.col_interval)
+        live_feed.interval = interval or constants.ADAPTIVE_MIN_INTERVAL
+        self.tick_scheduler = TickScheduler(live_feed.interval)
 
         daemon_thread = threading.Thread(
             target=self._get_data_in_intervals,
-            args=(constants.DATA_COL_INTERVALS.get(self.col_interval), self.thread_id),
+            args=(interval, self.tick_scheduler),
         )
         daemon_thread.daemon = True
         daemon_thread.start()
+        self._check_job = self.after(500, self._check_collection)
+
+    def _check_collection(self):
+        """Stop data collection if the collection thread was aborted."""
+        if self.collection_aborted.is_set():
+            self._check_job = None
+            self.stop_collecting_data()
+        else:
+            self._check_job = self.after(500, self._check_collection)
 
     def stop_collecting_data(self):
+        if self._check_job is not None:
+            self.after_cancel(self._check_job)
+            self._check_job = None
+        self.collection_aborted.clear()
         self.start_button.lift()
-        self.thread_id += 1  # Stop data collection
+        if self.tick_scheduler is not None:
+            self.tick_scheduler.stop()
+            self.tick_scheduler = None
+        live_feed.interval = None
         self.main_frame.toggle_collection()
         self.write_to_textbox("Data Collection Stopped!\n\n")
 
@@ -1280,49 +1940,124 @@ class DatabaseSidebar(ctk.CTkFrame):
         self.col_interval = value  # Set sidebar interval
         self.main_frame.change_interval(value)  # Set main_frame interval
 
-    def _get_data_in_intervals(self, interval: int, thread_id: int):
+    def _get_data_in_intervals(
+        self, interval: int | None, tick_scheduler: TickScheduler
+    ):
+        """Collect data on every tick until tick_scheduler is stopped.
+
+        :param interval: Collection interval in seconds. None adapts the interval
+            of each location to how fast its visitor count changes.
+        :type interval: int | None
+        """
+        import requests
+
+        adaptive = None
+        if interval is None:
+            adaptive = AdaptiveScheduler(
+                constants.ADAPTIVE_MIN_INTERVAL, constants.ADAPTIVE_MAX_INTERVAL
+            )
+
+        # Fetching may not delay the next tick
+        budget = min(tick_scheduler.interval, constants.FETCH_TIME_BUDGET)
+        failures = 0  # Consecutive failed fetches
+
         try:
-            with database.SQLiteDBManager(app_settings.db_path) as db_handle:
-                # Collect data until thread_id changes
-                while thread_id == self.thread_id:
-                    start_time = time.perf_counter()
+            with (
+                database.SQLiteDBManager(app_settings.db_path) as db_handle,
+                HttpClient() as client,
+            ):
+                for tick in tick_scheduler:
+                    if tick.missed:
+                        self.write_to_textbox(
+                            f"Data collection fell behind. Skipped {tick.missed} "
+                            f"collection(s).\n\n"
+                        )
+                    elif tick.lateness > constants.COL_LATENESS_WARNING:
+                        self.write_to_textbox(
+                            f"Data collection is {tick.lateness:.1f} s late.\n\n"
+                        )
 
-                    data = rd.get_data()
-                    location: rd.Location
-                    for location in data:
-                        added = db_handle.add_data(
-                            location.location_id,
-                            location.location_name,
-                            location.epoch_timestamp,
-                            location.location_visitors,
+                    try:
+                        data = rd.get_data(client=client, budget=budget)
+                    except (
+                        requests.exceptions.RequestException,
+                        BudgetExceeded,
+                        ValueError,
+                    ) as err:
+                        # Keep collecting, the next tick might succeed
+                        failures += 1
+                        self.write_to_textbox(
+                            f"Fetching data failed ({failures} in a row). "
+                            f"{type(err).__name__} occurred."
+                            + "\nInternet connection might have been lost."
+                            + " Trying again on the next collection.\n\n"
                         )
-                        if not added:
-                            self.write_to_textbox(
-                                f"Unable to add data to the database. A record with the "
-                                f"same timestamp already exists. "
-                                f"Discarded data: \n{self._format_data(location)}\n\n"
-                            )
-                        else:
-                            self.write_to_textbox(
-                                f"Added to the database: {self._format_data(location)}\n\n"
-                            )
+                        continue
 
-                    func_time = time.perf_counter() - start_time
-                    sleep_time = max(0, (interval - func_time))
-                    time.sleep(sleep_time)  # Sleep for remaining time
-        except requests.exceptions.ConnectionError as err:
-            self.write_to_textbox(
-                f"Data collection aborted. {type(err).__name__} occurred."
-                + "\nInternet connection might have been lost.\n\n"
-            )
-            self.stop_collecting_data()  # Toggle data collection button off
+                    if failures:
+                        self.write_to_textbox(
+                            f"Fetching data succeeded after {failures} failure(s).\n\n"
+                        )
+                        failures = 0
+
+                    location: rd.Location
+                    with spans.span("collect.write"):
+                        for location in data:
+                            sample_interval = interval
+                            if adaptive is not None:
+                                now = time.monotonic()
+                                if not adaptive.is_due(location.location_id, now):
+                                    continue
+                                sample_interval = adaptive.record(
+                                    location.location_id,
+                                    location.location_visitors,
+                                    now,
+                                )
+
+                            added = db_handle.add_data(
+                                location.location_id,
+                                location.location_name,
+                                location.epoch_timestamp,
+                                location.location_visitors,
+                                sample_interval,
+                            )
+                            if not added:
+                                self.write_to_textbox(
+                                    f"Unable to add data to the database. A record "
+                                    f"with the same timestamp already exists. "
+                                    f"Discarded data: \n"
+                                    f"{self._format_data(location)}\n\n"
+                                )
+                            else:
+                                self.write_to_textbox(
+                                    f"Added to the database: "
+                                    f"{self._format_data(location)}\n\n"
+                                )
+                                live_feed.publish(
+                                    location,
+                                    sample_interval,
+                                    db_handle.storage_mode == "changes",
+                                )
+
+                    if adaptive is not None:
+                        tick_scheduler.reschedule(
+                            adaptive.time_until_next(time.monotonic())
+                        )
         except Exception as err:
             self.write_to_textbox(
                 f"Data collection aborted. {type(err).__name__} occurred."
                 + "\nRestarting app might be necessary."
                 + f"\nError info:\n{err}\n\n"
             )
-            self.stop_collecting_data()  # Toggle data collection button off
+            self._abort_collection(tick_scheduler)
+
+        self.write_to_textbox(f"Data collection ended: {tick_scheduler.summary()}\n\n")
+
+    def _abort_collection(self, tick_scheduler: TickScheduler):
+        """Ask the Tk thread to toggle data collection button off. Called from
+        the data collection thread."""
+        if tick_scheduler is self.tick_scheduler:
+            self.collection_aborted.set()
 
     def _format_data(self, location_data: rd.Location):
         formatted_str = f"""
@@ -1356,7 +2091,9 @@ class MyMenuBar(CTkMenuBar):
         file_dropdown.add_separator()
         # Import data / Create Backup buttons
         file_dropdown.add_option(option="Import Data", command=self.import_data)
+        file_dropdown.add_option(option="Import CSV", command=self.import_csv)
         file_dropdown.add_option(option="Create Backup", command=self.create_backup)
+        file_dropdown.add_option(option="Export Data", command=self.export_data)
         # file_dropdown.add_separator()
         # Change database button
         file_dropdown.add_option(option="Change Database", command=self.select_db)
@@ -1369,6 +2106,9 @@ class MyMenuBar(CTkMenuBar):
         view_dropdown.add_option(
             option="Database", command=lambda: parent.lift_page("database")
         )
+        view_dropdown.add_option(
+            option="Performance", command=lambda: parent.lift_page("performance")
+        )
 
     def open_doc(
         self,
@@ -1380,6 +2120,9 @@ class MyMenuBar(CTkMenuBar):
     def open_settings(self):
         SettingsPopup(self.parent, "Settings")
 
+    def import_csv(self):
+        ImportCsvPopup(self.parent, "Import CSV")
+
     def create_backup(self):
         backup_path = filedialog.asksaveasfilename(
             confirmoverwrite=True,
@@ -1399,6 +2142,9 @@ class MyMenuBar(CTkMenuBar):
                     message="Choose a different name or a location for the backup.",
                 )
 
+    def export_data(self):
+        ExportDataPopup(self.parent, "Export Data")
+
     def import_data(self):
         import_path = filedialog.askopenfilename(
             defaultextension=constants.DB_DEFAULTEXTENSION,
@@ -1452,7 +2198,8 @@ class MyMenuBar(CTkMenuBar):
             )
 
     def save_fig(self):
-        drawn_graphs = self.parent.pages.get("graph").get_drawn_graphs()
+        graph_page = self.parent.pages.get("graph")
+        drawn_graphs = graph_page.get_drawn_graphs()
         if drawn_graphs:
 
             file_path = filedialog.asksaveasfilename(
@@ -1463,75 +2210,35 @@ class MyMenuBar(CTkMenuBar):
             )
 
             if file_path:
-                images = []
-
-                for i in range(self.parent.pages.get("graph").active_graph_amount):
-                    canvas = self.parent.pages.get("graph").all_graphs[i].fig.canvas
-                    images.append(
-                        Image.frombytes(
-                            "RGB", canvas.get_width_height(), canvas.tostring_rgb()
-                        )
-                    )
-
-                width, height = self._new_fig_size(images)
-
-                new_im = self._combine_images(images, width, height)
-                new_im.save(file_path)
+                snapshots = [
+                    graph.get_snapshot() if graph.is_drawn else None
+                    for graph in graph_page.all_graphs[: graph_page.active_graph_amount]
+                ]
+                self.export_graphs(snapshots, file_path)
         else:
             messagebox.showerror(
                 "Error",
                 "No graphs have been drawn yet. Draw a graph before attempting to save.",
             )
 
-    def _new_fig_size(self, images: list[Image.Image]) -> tuple[int, int]:
-        """Returns the size of the new image.
-
-        If images has only 1 image the new image size is the size of the original image
-
-        If images has 2 images
-            the new width is image0 + image1 width
-            the new height is the max(height) of the two images
-
-        if images has 4 images
-            the new width is max(image0, image2) + max(image1, image3) width
-            the new height is max(image0, image1) + max(image2, image3) height
-
-        :return: size of the new image. (width, height)
-        :rtype: tuple[int, int]
-        """
-        width = 0
-        height = 0
-        if len(images) == 1:
-            return images[0].size
-        if len(images) == 2:
-            for img in images:
-                height += img.height
-            width = max([img.width for img in images])
-
-        if len(images) == 4:
-            width += max(images[0].width, images[2].width)
-            width += max(images[1].width, images[3].width)
-
-            height += max(images[0].height, images[1].height)
-            height += max(images[2].height, images[3].height)
-
-        return width, height
-
-    def _combine_images(
-        self, images: list[Image.Image], width: int, height: int
-    ) -> Image.Image:
-        new_im = Image.new("RGB", (width, height))
-
-        x_offset = 0
-        y_offset = 0
-        for i, im in enumerate(images):
-            new_im.paste(im, (x_offset, y_offset))
-            x_offset += im.size[0]
-            if (i == 1 and len(images) == 4) or (i == 0 and len(images) == 2):
-                x_offset = 0
-                y_offset += im.size[1]
-
-        return new_im
+    def export_graphs(
+        self, snapshots: "list[graphing.GraphSnapshot | None]", file_path: str
+    ):
+        """Render the graph snapshots offscreen into one figure with the export DPI
+        setting and save it to file_path. Rendering is done on a worker thread."""
+        export_job = graphing.ExportJob(snapshots, file_path, app_settings.export_dpi)
+        export_job.start()
+        self._wait_for_export(export_job)
+
+    def _wait_for_export(self, export_job: "graphing.ExportJob"):
+        if export_job.is_alive():
+            self.after(100, self._wait_for_export, export_job)
+        elif export_job.error:
+            messagebox.showerror(
+                "Error",
+                f"Saving failed. {type(export_job.error).__name__} occurred."
+                + f"\nError info:\n{export_job.error}",
+            )
 
 
 class SettingsFrame(ctk.CTkFrame):
@@ -1731,6 +2438,8 @@ class SaveSinglePopup(MyPopup):
         self.chosen_graph = None
 
         # Open square image
+        from PIL import Image
+
         img_square = Image.open(Path(__file__).parent / "images/square1234.png")
         img_square_ctk = ctk.CTkImage(
             light_image=img_square, dark_image=img_square, size=(150, 150)
@@ -1780,7 +2489,7 @@ class SaveSinglePopup(MyPopup):
         self.ok_button.configure(state=ctk.NORMAL)
 
     def _ok_event(self):
-        fig = self.parent.pages.get("graph").get_fig(self.chosen_graph)
+        graph = self.parent.pages.get("graph").all_graphs[self.chosen_graph]
         file_path = filedialog.asksaveasfilename(
             confirmoverwrite=True,
             defaultextension=constants.IMG_DEFAULTEXTENSION,
@@ -1789,7 +2498,7 @@ class SaveSinglePopup(MyPopup):
         )
 
         if file_path:
-            fig.savefig(fname=file_path)
+            self.parent.menu.export_graphs([graph.get_snapshot()], file_path)
             self.destroy()
 
     def _info_event(self):
@@ -1802,14 +2511,293 @@ class SaveSinglePopup(MyPopup):
         )
 
 
+class ExportDataPopup(MyPopup):
+    """Exports visitor data of the chosen locations and time range to a CSV or
+    JSON Lines file on a worker thread."""
+
+    def __init__(self, parent: App, title: str, *args, **kwargs):
+        super().__init__(
+            parent,
+            title,
+            geometry="300x390",
+            minsize=(300, 390),
+            maxsize=(300, 390),
+            *args,
+            **kwargs,
+        )
+        self.parent = parent
+        self.export_job: database.DataExportJob | None = None
+        self._poll_job: str | None = None
+        self.protocol("WM_DELETE_WINDOW", self._cancel_event)
+
+        with database.SQLiteDBManager(app_settings.db_path) as db_handle:
+            self.locations = {
+                name: location_id for location_id, name in db_handle.get_locations()
+            }
+
+        pad = 8
+
+        self.location_menu = DropdownAndLabel(
+            self,
+            "Location:",
+            [constants.EXPORT_ALL_LOCATIONS] + list(self.locations),
+            None,
+            constants.EXPORT_ALL_LOCATIONS,
+            menu_width=200,
+        )
+        self.location_menu.pack(side=ctk.TOP, padx=pad, pady=(2 * pad, pad))
+
+        self.time_range_menu = DropdownAndLabel(
+            self,
+            "Time range:",
+            constants.EXPORT_TIME_RANGES,
+            None,
+            constants.DEFAULT_EXPORT_TIME_RANGE,
+            menu_width=200,
+        )
+        self.time_range_menu.pack(side=ctk.TOP, padx=pad, pady=pad)
+
+        self.format_menu = DropdownAndLabel(
+            self,
+            "Format:",
+            list(constants.EXPORT_FILE_FORMATS),
+            None,
+            constants.DEFAULT_EXPORT_FILE_FORMAT,
+            menu_width=200,
+        )
+        self.format_menu.pack(side=ctk.TOP, padx=pad, pady=pad)
+
+        self.gzip_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self, text="Compress (gzip)", variable=self.gzip_var).pack(
+            side=ctk.TOP, padx=pad, pady=pad
+        )
+
+        self.progress_bar = ctk.CTkProgressBar(self, width=200)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(side=ctk.TOP, padx=pad, pady=(pad, 0))
+        self.status_label = ctk.CTkLabel(self, text="")
+        self.status_label.pack(side=ctk.TOP, padx=pad, pady=0)
+
+        # Bottom frame
+        self.pack_bottom_frame()
+        self.add_cancel_button()
+        self.export_button: ctk.CTkButton = self.add_bottom_button(
+            text="Export", command=self._export_event
+        )
+
+    def _export_event(self):
+        fmt = constants.EXPORT_FILE_FORMATS[self.format_menu.option_menu.get()]
+        extension = f".{fmt}.gz" if self.gzip_var.get() else f".{fmt}"
+        file_path = filedialog.asksaveasfilename(
+            confirmoverwrite=True,
+            defaultextension=extension,
+            title="Export Data",
+            filetypes=[(f"{fmt.upper()} (*{extension})", f"*{extension}")],
+            parent=self,
+        )
+        if not file_path:
+            return
+
+        location_name = self.location_menu.option_menu.get()
+        location_ids = None
+        if location_name != constants.EXPORT_ALL_LOCATIONS:
+            location_ids = [self.locations[location_name]]
+
+        start = None
+        time_dif_td = utils.get_time_delta(
+            self.time_range_menu.option_menu.get(), "negative"
+        )
+        if time_dif_td:
+            start = utils.datetime_to_epoch(datetime.datetime.now() + time_dif_td)
+
+        self.export_job = database.DataExportJob(
+            app_settings.db_path,
+            file_path,
+            location_ids,
+            start=start,
+            fmt=fmt,
+            compress=self.gzip_var.get(),
+        )
+        self.export_job.start()
+        self.export_button.configure(state=ctk.DISABLED)
+        self._poll_export()
+
+    def _poll_export(self):
+        job = self.export_job
+        if job.is_alive():
+            if job.total:
+                self.progress_bar.set(job.written / job.total)
+                self.status_label.configure(
+                    text=f"{job.written:,} / {job.total:,} rows"
+                )
+            self._poll_job = self.after(
+                constants.EXPORT_POLL_INTERVAL, self._poll_export
+            )
+            return
+
+        self._poll_job = None
+        self.export_job = None
+        if isinstance(job.error, database.QueryCancelled):
+            return
+        if job.error:
+            self.export_button.configure(state=ctk.NORMAL)
+            messagebox.showerror(
+                "Error",
+                f"Export failed. {type(job.error).__name__} occurred."
+                + f"\nError info:\n{job.error}",
+                master=self,
+            )
+            return
+
+        self.progress_bar.set(1)
+        messagebox.showinfo("Info", f"Exported {job.written:,} rows.", master=self)
+        self.destroy()
+
+    def _cancel_event(self):
+        if self._poll_job is not None:
+            self.after_cancel(self._poll_job)
+            self._poll_job = None
+        # Unfinished export file is removed by the job
+        if self.export_job:
+            self.export_job.cancel()
+        self.destroy()
+
+
+class ImportCsvPopup(MyPopup):
+    """Imports visitor readings from a CSV file on a worker thread."""
+
+    def __init__(self, parent: App, title: str, *args, **kwargs):
+        super().__init__(
+            parent,
+            title,
+            geometry="300x230",
+            minsize=(300, 230),
+            maxsize=(300, 230),
+            *args,
+            **kwargs,
+        )
+        self.parent = parent
+        self.import_job: database.DataImportJob | None = None
+        self._poll_job: str | None = None
+        self.protocol("WM_DELETE_WINDOW", self._cancel_event)
+
+        pad = 8
+
+        label = ctk.CTkLabel(
+            self,
+            text="CSV files need the columns location_id,\n"
+            + "epoch_timestamp and location_visitors.",
+            justify="left",
+        )
+        label.pack(side=ctk.TOP, padx=pad, pady=(2 * pad, pad))
+
+        self.reindex_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            self, text="Rebuild index after import", variable=self.reindex_var
+        ).pack(side=ctk.TOP, padx=pad, pady=pad)
+
+        self.progress_bar = ctk.CTkProgressBar(self, width=200)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(side=ctk.TOP, padx=pad, pady=(pad, 0))
+        self.status_label = ctk.CTkLabel(self, text="")
+        self.status_label.pack(side=ctk.TOP, padx=pad, pady=0)
+
+        # Bottom frame
+        self.pack_bottom_frame()
+        self.add_cancel_button()
+        self.import_button: ctk.CTkButton = self.add_bottom_button(
+            text="Import", command=self._import_event
+        )
+
+    def _import_event(self):
+        file_path = filedialog.askopenfilename(
+            filetypes=constants.CSV_FILETYPES,
+            title="Import CSV",
+            parent=self,
+        )
+        if not file_path:
+            return
+
+        self.import_job = database.DataImportJob(
+            app_settings.db_path, file_path, reindex=self.reindex_var.get()
+        )
+        self.import_job.start()
+        self.import_button.configure(state=ctk.DISABLED)
+        self.status_label.configure(text="Importing...")
+        self._poll_import()
+
+    def _poll_import(self):
+        job = self.import_job
+        if job.is_alive():
+            if job.size:
+                self.progress_bar.set(job.read / job.size)
+            self._poll_job = self.after(
+                constants.IMPORT_POLL_INTERVAL, self._poll_import
+            )
+            return
+
+        self._poll_job = None
+        self.import_job = None
+        # Chunks that were committed before a failure are kept
+        self.parent.pages.get("graph").sidebar.update_all()
+        if isinstance(job.error, database.QueryCancelled):
+            return
+        if job.error:
+            self.import_button.configure(state=ctk.NORMAL)
+            self.status_label.configure(text="")
+            messagebox.showerror(
+                "Error",
+                f"Import failed. {type(job.error).__name__} occurred."
+                + f"\nError info:\n{job.error}",
+                master=self,
+            )
+            return
+
+        result = job.result
+        self.progress_bar.set(1)
+        message = (
+            f"Added {result.added:,} readings."
+            + f"\n\nDuplicate readings: {result.duplicates:,}"
+            + f"\nInvalid rows: {result.invalid:,}"
+        )
+        if result.invalid_lines:
+            lines = ", ".join(str(line) for line in result.invalid_lines)
+            message += f"\n(first on lines {lines})"
+        messagebox.showinfo("Info", message, master=self)
+        self.destroy()
+
+    def _cancel_event(self):
+        if self._poll_job is not None:
+            self.after_cancel(self._poll_job)
+            self._poll_job = None
+        if self.import_job:
+            # Chunks that were already added are kept. The job commits the
+            # current chunk before it stops, so refresh after it has stopped.
+            self.import_job.cancel()
+            self._update_sidebar_when_done(self.parent, self.import_job)
+        self.destroy()
+
+    @staticmethod
+    def _update_sidebar_when_done(parent: App, job: database.DataImportJob):
+        if job.is_alive():
+            parent.after(
+                constants.IMPORT_POLL_INTERVAL,
+                ImportCsvPopup._update_sidebar_when_done,
+                parent,
+                job,
+            )
+        else:
+            parent.pages.get("graph").sidebar.update_all()
+
+
 class SettingsPopup(MyPopup):
     def __init__(self, parent: App, title: str, *args, **kwargs):
         super().__init__(
             parent,
             title,
-            geometry="400x400",
-            minsize=(400, 400),
-            maxsize=(600, 400),
+            geometry="400x520",
+            minsize=(400, 520),
+            maxsize=(600, 520),
             *args,
             **kwargs,
         )
@@ -1818,6 +2806,9 @@ class SettingsPopup(MyPopup):
         self.filepath = app_settings.db_path
         self.ylim: tuple[float, float] = app_settings.ylim
         self.ymode = app_settings.ymode
+        self.graph_layout = app_settings.graph_layout
+        self.export_dpi = app_settings.export_dpi
+        self.query_timeout = app_settings.query_timeout
 
         pad = 8
 
@@ -1845,6 +2836,12 @@ class SettingsPopup(MyPopup):
         db_frame.add_setting_button(
             "", "Use Default Database", self.default_db, fill=None
         )
+        self.timeout_dropdown = db_frame.add_settings_dropdown(
+            "Query timeout:",
+            list(constants.QUERY_TIMEOUTS),
+            default_value=self.get_timeout_text(),
+            command=self._select_timeout_event,
+        )
 
         # Graphs
         graph_frame = SettingsFrame(self)
@@ -1858,6 +2855,18 @@ class SettingsPopup(MyPopup):
             default_value=self.get_ylim_text(),
             command=self._select_ylim_event,
         )
+        self.layout_dropdown = graph_frame.add_settings_dropdown(
+            "Graph layout:",
+            constants.GRAPH_LAYOUTS,
+            default_value=self.graph_layout,
+            command=self._select_layout_event,
+        )
+        self.dpi_dropdown = graph_frame.add_settings_dropdown(
+            "Export DPI:",
+            constants.EXPORT_DPIS,
+            default_value=str(self.export_dpi),
+            command=self._select_dpi_event,
+        )
 
         # Bottom frame
         self.pack_bottom_frame()
@@ -1890,6 +2899,15 @@ class SettingsPopup(MyPopup):
                 )
                 self.grab_set()
 
+    def _select_layout_event(self, value):
+        self.graph_layout = value
+
+    def _select_dpi_event(self, value):
+        self.export_dpi = int(value)
+
+    def _select_timeout_event(self, value):
+        self.query_timeout = constants.QUERY_TIMEOUTS[value]
+
     def _ok_event(self):
         if self.filepath and self.filepath != os.path.relpath(app_settings.db_path):
             app_settings.db_path = self.filepath
@@ -1901,6 +2919,10 @@ class SettingsPopup(MyPopup):
             app_settings.ylim = self.ylim
             app_settings.ymode = self.ymode
 
+        app_settings.graph_layout = self.graph_layout
+        app_settings.export_dpi = self.export_dpi
+        app_settings.query_timeout = self.query_timeout
+
         app_settings.update_all()
         self.destroy()
 
@@ -1911,8 +2933,14 @@ class SettingsPopup(MyPopup):
             self.ylim = app_settings.get_default_ylim()
             self.ymode = app_settings.get_default_ymode()
             self.filepath = app_settings.get_default_db_path()
+            self.graph_layout = app_settings.get_default_graph_layout()
+            self.export_dpi = app_settings.get_default_export_dpi()
+            self.query_timeout = app_settings.get_default_query_timeout()
 
             self.settings_dropdown.variable.set(self.get_ylim_text())
+            self.layout_dropdown.variable.set(self.graph_layout)
+            self.dpi_dropdown.variable.set(str(self.export_dpi))
+            self.timeout_dropdown.variable.set(self.get_timeout_text())
 
             _, tail = ntpath.split(self.filepath)
             self.db_path_frame.winfo_children()[1].configure(text=tail)
@@ -1948,6 +2976,14 @@ class SettingsPopup(MyPopup):
             self.db_path_frame.winfo_children()[1].configure(text=tail)
             self.filepath = default_filepath
 
+    def get_timeout_text(self) -> str:
+        "Get text for query timeout dropdown"
+        for text, timeout in constants.QUERY_TIMEOUTS.items():
+            if timeout == self.query_timeout:
+                return text
+
+        return f"{self.query_timeout} s"
+
     def get_ylim_text(self) -> int | float | str:
         "Get text for button"
         if self.ymode == "Select Limit":
@@ -1957,7 +2993,27 @@ class SettingsPopup(MyPopup):
 
 
 def main():
-    App("VisitorTracker")
+    parser = argparse.ArgumentParser(description="VisitorTracker")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print a timing breakdown of app startup",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="record timing spans from startup (see View > Performance)",
+    )
+    parser.add_argument(
+        "--trace-sql",
+        action="store_true",
+        help="log SQL queries and flag slow queries (see View > Performance)",
+    )
+    args, _ = parser.parse_known_args()
+    spans.enabled = args.profile
+    database.query_log.enabled = args.trace_sql
+
+    App("VisitorTracker", profile_startup=args.profile_startup)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,401 @@
+"""Headless batch report renderer.
+
+Renders graphs straight from the database to image files without tkinter.
+Graphs are rendered in parallel in a process pool. Every worker keeps its
+own read-only database connection open for all of its graphs.
+
+Examples:
+    python report.py --month 05-2024 --location "FUN Oulu Ritaharju"
+    python report.py --date 06-05-2024 --weekday Monday --weekday Friday
+    python report.py --specs weekly.json --out reports --format svg
+
+Spec file is a JSON list of graphs. Missing keys use the command line values:
+    [{"time_mode": "Calendar", "graph_date": "06-05-2024"},
+     {"time_mode": "Daily Average", "weekday": "Monday", "graph_type": "Line Graph"}]
+"""
+
+import argparse
+import calendar
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import dataclasses
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import re
+import sqlite3
+import sys
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import constants
+import database
+import graphing
+from settings.settings import Settings
+
+# Keys of a graph in a spec file. "location" is a location name.
+SPEC_KEYS = {
+    field.name
+    for field in dataclasses.fields(graphing.GraphSpec)
+    if field.name not in ("location_id", "location_name")
+} | {"location"}
+
+# Read-only database handle of a worker process
+_db_handle: database.SQLiteDBManager | None = None
+
+
+def _init_worker(db_path: str):
+    global _db_handle
+    _db_handle = database.SQLiteDBManager(db_path, read_only=True).connect()
+
+
+def _render_graph(
+    spec: graphing.GraphSpec,
+    file_path: str,
+    dpi: int,
+    color: str,
+    ylim: tuple[float | None, float | None],
+) -> str:
+    """Load values of a graph with the worker's connection and save the graph
+    to file_path."""
+    values = graphing.load_graph_values(_db_handle, spec)
+
+    snapshot = graphing.GraphSnapshot(
+        time_mode=spec.time_mode,
+        graph_type=spec.graph_type,
+        title=values.title,
+        x_label=values.x_label,
+        y_label=values.y_label,
+        x_values=values.x_values,
+        y_values=values.y_values,
+        element_color=color,
+        ylim=ylim,
+    )
+    graphing.export_figure([snapshot], file_path, dpi)
+
+    return file_path
+
+
+def month_specs(
+    month: str, location_id: int, location_name: str, **options
+) -> list[graphing.GraphSpec]:
+    """Daily Average graph of every weekday and Calendar graph of every day
+    of the month.
+
+    :param month: month in format "%m-%Y"
+    :type month: str
+    :param options: other GraphSpec values (graph_mode, graph_type)
+    :raises ValueError: If month isn't a valid "%m-%Y" month.
+    """
+    month_date = datetime.strptime(month, "%m-%Y")
+    month_num, year = month_date.month, month_date.year
+    days = calendar.monthrange(year, month_num)[1]
+
+    specs = [
+        graphing.GraphSpec(
+            location_id, location_name, "Daily Average", weekday=weekday, **options
+        )
+        for weekday in constants.WEEKDAYS
+    ]
+    specs += [
+        graphing.GraphSpec(
+            location_id,
+            location_name,
+            "Calendar",
+            graph_date=f"{day:02d}-{month_num:02d}-{year}",
+            **options,
+        )
+        for day in range(1, days + 1)
+    ]
+    return specs
+
+
+def _spec_name(spec: graphing.GraphSpec) -> str:
+    if spec.time_mode == "Calendar":
+        name = f"{spec.time_mode}-{spec.graph_date}"
+    elif spec.time_mode == "Daily Average":
+        name = f"{spec.time_mode}-{spec.weekday}"
+    else:
+        name = f"{spec.time_mode}-{spec.time_range}"
+
+    name = f"{spec.location_name}-{name}-{spec.graph_mode}"
+    return re.sub(r"[^\w.-]+", "_", name).strip("_").lower()
+
+
+def _load_specs(
+    path: str, locations: dict[str, int], location_name: str, options: dict
+) -> list[graphing.GraphSpec]:
+    """Graphs of a spec file. Keys that an item doesn't have are taken from
+    `options` and `location_name`.
+
+    :raises ValueError: If the file can't be read or an item isn't a graph.
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            items = json.load(file)
+    except (OSError, ValueError) as err:
+        raise ValueError(f"Unable to read spec file '{path}': {err}") from err
+
+    if not isinstance(items, list):
+        raise ValueError(f"Spec file '{path}' must be a JSON list of graphs")
+
+    specs = []
+    for number, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            raise ValueError(f"Graph {number} of the spec file isn't a JSON object")
+        unknown = item.keys() - SPEC_KEYS
+        if unknown:
+            raise ValueError(
+                f"Unknown keys in graph {number} of the spec file: "
+                f"{', '.join(sorted(unknown))}. Valid keys are "
+                f"{', '.join(sorted(SPEC_KEYS))}."
+            )
+
+        item = dict(item)
+        name = item.pop("location", location_name)
+        if not isinstance(name, str) or name not in locations:
+            raise ValueError(f"Unknown location '{name}'")
+        specs.append(graphing.GraphSpec(locations[name], name, **{**options, **item}))
+
+    return specs
+
+
+def _check_spec(spec: graphing.GraphSpec) -> graphing.GraphSpec:
+    """Raise ValueError if the spec has values the GUI wouldn't allow. Graph mode
+    and graph type are changed to the ones the time mode supports, like in the
+    GUI (Daily Average and Time Range only have "Visitors", Time Range only
+    has "Line Graph")."""
+    if spec.time_mode not in constants.TIME_MODES:
+        raise ValueError(f"Unknown time mode '{spec.time_mode}'")
+    if spec.graph_mode not in constants.GRAPH_MODES:
+        raise ValueError(f"Unknown graph mode '{spec.graph_mode}'")
+    if spec.graph_type not in constants.GRAPH_TYPES:
+        raise ValueError(f"Unknown graph type '{spec.graph_type}'")
+    if spec.time_mode == "Daily Average" and spec.weekday not in constants.WEEKDAYS:
+        raise ValueError(f"Unknown weekday '{spec.weekday}'")
+    if spec.time_mode == "Time Range" and spec.time_range not in constants.TIME_RANGES:
+        raise ValueError(f"Unknown time range '{spec.time_range}'")
+
+    if spec.time_mode != "Calendar":
+        if spec.graph_mode not in constants.WEEKDAY_TIME_RANGE_GRAPH_MODES:
+            spec.graph_mode = constants.DEFAULT_GRAPH_MODE
+    if spec.time_mode == "Time Range":
+        if spec.graph_type not in constants.TIME_RANGE_GRAPH_TYPES:
+            spec.graph_type = constants.DEFAULT_TR_GRAPH_TYPE
+
+    return spec
+
+
+def render_report(
+    specs: list[graphing.GraphSpec],
+    db_path: str,
+    out_dir: str,
+    file_format: str = "png",
+    dpi: int = constants.DEFAULT_EXPORT_DPI,
+    workers: int | None = None,
+    ylim: tuple[float | None, float | None] = (None, None),
+) -> tuple[list[str], list[tuple[graphing.GraphSpec, Exception]]]:
+    """Render every spec to its own file in out_dir using a process pool.
+
+    :param workers: number of worker processes, defaults to os.cpu_count()
+    :type workers: int | None, optional
+    :return: paths of the saved files in spec order and (spec, error) pairs of
+        the graphs that failed
+    :rtype: tuple[list[str], list[tuple[graphing.GraphSpec, Exception]]]
+    """
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    saved: dict[int, str] = {}
+    failed = []
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(db_path,)
+    ) as executor:
+        futures = {}
+        for index, spec in enumerate(specs):
+            file_path = os.path.join(
+                out_dir, f"{index + 1:03d}-{_spec_name(spec)}.{file_format}"
+            )
+            color = constants.GRAPH_COLORS[index % len(constants.GRAPH_COLORS)]
+            future = executor.submit(_render_graph, spec, file_path, dpi, color, ylim)
+            futures[future] = index
+
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                saved[index] = future.result()
+            except Exception as err:
+                failed.append((specs[index], err))
+
+    return [saved[index] for index in sorted(saved)], failed
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Render VisitorTracker graphs to image files without the GUI."
+    )
+    parser.add_argument(
+        "--db", help="database file, defaults to the database in settings"
+    )
+    parser.add_argument(
+        "--location",
+        help="location name, defaults to the first location in the database",
+    )
+    parser.add_argument(
+        "--mode",
+        default=constants.DEFAULT_GRAPH_MODE,
+        choices=constants.GRAPH_MODES,
+        help="graph mode",
+    )
+    parser.add_argument(
+        "--type",
+        default=constants.DEFAULT_GRAPH_TYPE,
+        choices=constants.GRAPH_TYPES,
+        help="graph type",
+    )
+    parser.add_argument(
+        "--month",
+        action="append",
+        default=[],
+        help="MM-YYYY, Daily Average of every weekday and Calendar of every day",
+    )
+    parser.add_argument(
+        "--date", action="append", default=[], help="DD-MM-YYYY, Calendar graph"
+    )
+    parser.add_argument(
+        "--weekday",
+        action="append",
+        default=[],
+        choices=constants.WEEKDAYS,
+        help="Daily Average graph",
+    )
+    parser.add_argument(
+        "--time-range",
+        action="append",
+        default=[],
+        choices=constants.TIME_RANGES,
+        help="Time Range graph",
+    )
+    parser.add_argument("--specs", help="JSON file with a list of graph specs")
+    parser.add_argument("--out", default="reports", help="output directory")
+    parser.add_argument(
+        "--format",
+        default="png",
+        choices=["png", "jpg", "svg", "pdf"],
+        help="image format",
+    )
+    parser.add_argument("--dpi", type=int, default=constants.DEFAULT_EXPORT_DPI)
+    parser.add_argument(
+        "--ylim",
+        type=float,
+        nargs=2,
+        metavar=("LOWER", "UPPER"),
+        help="same y-limits for every graph",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="worker processes, defaults to CPU count"
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    db_path = args.db or Settings().db_path
+
+    try:
+        with database.SQLiteDBManager(db_path, read_only=True) as db_handle:
+            locations = db_handle.get_locations_dict()
+    except sqlite3.Error as err:
+        print(f"Can't open database '{db_path}': {err}", file=sys.stderr)
+        return 1
+
+    if not locations:
+        print("No locations in the database.", file=sys.stderr)
+        return 1
+
+    location_name = args.location or next(iter(locations))
+    if location_name not in locations:
+        print(f"Unknown location '{location_name}'", file=sys.stderr)
+        return 1
+
+    location_id = locations[location_name]
+    options = {"graph_mode": args.mode, "graph_type": args.type}
+
+    specs: list[graphing.GraphSpec] = []
+    for month in args.month:
+        try:
+            specs += month_specs(month, location_id, location_name, **options)
+        except ValueError:
+            print(f"Invalid month '{month}', expected MM-YYYY", file=sys.stderr)
+            return 1
+    for date in args.date:
+        specs.append(
+            graphing.GraphSpec(
+                location_id, location_name, "Calendar", graph_date=date, **options
+            )
+        )
+    for weekday in args.weekday:
+        specs.append(
+            graphing.GraphSpec(
+                location_id, location_name, "Daily Average", weekday=weekday, **options
+            )
+        )
+    for time_range in args.time_range:
+        specs.append(
+            graphing.GraphSpec(
+                location_id,
+                location_name,
+                "Time Range",
+                time_range=time_range,
+                **options,
+            )
+        )
+
+    if args.specs:
+        try:
+            specs += _load_specs(args.specs, locations, location_name, options)
+        except ValueError as err:
+            print(err, file=sys.stderr)
+            return 1
+
+    if not specs:
+        print(
+            "Nothing to render. Use --month, --date, --weekday, --time-range "
+            "or --specs.",
+            file=sys.stderr,
+        )
+        return 1
+
+    try:
+        specs = [_check_spec(spec) for spec in specs]
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    saved, failed = render_report(
+        specs,
+        db_path,
+        args.out,
+        args.format,
+        args.dpi,
+        args.workers,
+        tuple(args.ylim) if args.ylim else (None, None),
+    )
+    elapsed = time.perf_counter() - start
+
+    for spec, err in failed:
+        print(f"Failed: {_spec_name(spec)}: {err}", file=sys.stderr)
+    print(
+        f"Rendered {len(saved)}/{len(specs)} graphs to '{args.out}' in {elapsed:.1f} s"
+    )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class AdaptiveInterval:
+    """Collection interval of a single location that adapts to how fast the
+    visitor count changes.
+
+    After every reading the interval is halved if visitors changed at least
+    `fast_rate` visitors per minute, and doubled if visitors changed less than
+    `min_change`. The interval always stays between `min_interval` and
+    `max_interval` seconds.
+
+    :param min_interval: Shortest interval in seconds, defaults to 30.
+    :param max_interval: Longest interval in seconds, defaults to 30 min.
+    :param min_change: Changes smaller than this count as no change, defaults to 1.
+    :param fast_rate: Visitors per minute that count as a fast change, defaults to 0.5.
+    """
+
+    min_interval: int = 30
+    max_interval: int = 30 * 60
+    min_change: int = 1
+    fast_rate: float = 0.5
+    interval: int | None = None
+    last_visitors: int | None = None
+
+    def __post_init__(self):
+        if self.interval is None:
+            self.interval = self.min_interval
+
+    def update(self, visitors: int) -> int:
+        """Adapt the interval to a new reading.
+
+        :param visitors: Visitors of the new reading.
+        :type visitors: int
+        :return: Interval until the next reading in seconds.
+        :rtype: int
+        """
+        if self.last_visitors is not None:
+            change = abs(visitors - self.last_visitors)
+            rate = change / (self.interval / 60)
+
+            if rate >= self.fast_rate and change >= self.min_change:
+                self.interval = max(self.min_interval, self.interval // 2)
+            elif change < self.min_change:
+                self.interval = min(self.max_interval, self.interval * 2)
+
+        self.last_visitors = visitors
+
+        return self.interval
+
+
+class AdaptiveScheduler:
+    """Keeps an AdaptiveInterval and the next reading time for every location.
+
+    All locations are fetched with a single request, so a request is made when
+    the first location is due. Only readings of locations that are due are
+    stored. Locations that become due within `min_interval / 2` seconds are
+    counted as due, so that they share the same request.
+
+    :param min_interval: Shortest interval in seconds, defaults to 30.
+    :type min_interval: int, optional
+    :param max_interval: Longest interval in seconds, defaults to 30 min.
+    :type max_interval: int, optional
+    """
+
+    def __init__(self, min_interval: int = 30, max_interval: int = 30 * 60):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.intervals: dict[int, AdaptiveInterval] = {}
+        self._next_due: dict[int, float] = {}
+
+    def is_due(self, location_id: int, now: float) -> bool:
+        """True if a reading of the location should be stored. Unknown
+        locations are always due."""
+        next_due = self._next_due.get(location_id)
+        return next_due is None or next_due <= now + self.min_interval / 2
+
+    def record(self, location_id: int, visitors: int, now: float) -> int:
+        """Record a stored reading of the location and schedule its next reading.
+
+        :param now: Time of the reading in seconds (time.monotonic()).
+        :type now: float
+        :return: Interval until the next reading in seconds. This is the time
+            that the reading represents (sample_interval).
+        :rtype: int
+        """
+        adaptive = self.intervals.get(location_id)
+        if adaptive is None:
+            adaptive = AdaptiveInterval(self.min_interval, self.max_interval)
+            self.intervals[location_id] = adaptive
+
+        interval = adaptive.update(visitors)
+        self._next_due[location_id] = now + interval
+
+        return interval
+
+    def time_until_next(self, now: float) -> float:
+        """Seconds until the first location is due. min_interval if no
+        locations have been recorded yet."""
+        if not self._next_due:
+            return self.min_interval
+
+        return max(0.0, min(self._next_due.values()) - now)
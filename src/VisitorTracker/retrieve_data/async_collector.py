@@ -0,0 +1,324 @@
+"""Asyncio collection engine for many sources.
+
+Every registered source is polled in its own task at its own interval.
+Fetches run concurrently in worker threads, limited by a global concurrency
+limit and a minimum time between requests to the same host. All readings go
+through a queue to a single writer that adds them to the database in batches.
+With a spool file, batches are first appended to the spool, so readings
+survive a locked or unavailable database and are added once it's writable.
+
+Example:
+    collector = AsyncCollector("visitorTrackingDB.db")
+    asyncio.run(collector.run(duration=60 * 60))
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List
+from urllib.parse import urlsplit
+
+import database
+from retrieve_data.http_client import HttpClient
+from retrieve_data.retrieve_data import Location
+from retrieve_data.sources import Source, get_sources
+from utils.profiling import spans
+
+# Queue item that stops the writer
+_STOP = None
+
+
+@dataclass
+class SourceStats:
+    polls: int = 0
+    failures: int = 0
+    missed: int = 0
+
+
+class HostRateLimiter:
+    """Keeps at least `min_interval` seconds between the starts of requests to
+    the same host. Used from a single event loop.
+
+    :param min_interval: Seconds between requests to a host, defaults to 1.
+    :type min_interval: float, optional
+    """
+
+    def __init__(self, min_interval: float = 1.0):
+        self.min_interval = min_interval
+        self._next_start: dict[str, float] = {}
+
+    async def wait(self, host: str):
+        """Wait until a request to host may start and reserve that time."""
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next_start.get(host, now))
+        self._next_start[host] = start + self.min_interval
+
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class AsyncCollector:
+    """Polls sources concurrently and writes their readings to the database.
+
+    :param db_path: Database that readings are added to.
+    :type db_path: str
+    :param sources: Sources to poll, defaults to all registered sources.
+    :type sources: List[Source] | None, optional
+    :param max_concurrency: Requests running at the same time, defaults to 8.
+    :type max_concurrency: int, optional
+    :param host_interval: Seconds between requests to the same host, defaults to 1.
+    :type host_interval: float, optional
+    :param batch_size: Readings written in a single transaction, defaults to 100.
+    :type batch_size: int, optional
+    :param flush_interval: Longest time in seconds that a reading waits for a
+        batch to fill, defaults to 1.
+    :type flush_interval: float, optional
+    :param on_event: Called with event messages, defaults to print.
+    :type on_event: Callable[[str], None], optional
+    :param on_added: Called with the readings of every written batch.
+    :type on_added: Callable[[List[Location]], None] | None, optional
+    :param spool_path: Spool file that readings are written to before the
+        database, defaults to None (no spool). Readings left in the spool are
+        added to the database when the collector starts.
+    :type spool_path: str | None, optional
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        sources: List[Source] | None = None,
+        max_concurrency: int = 8,
+        host_interval: float = 1.0,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        on_event: Callable[[str], None] = print,
+        on_added: Callable[[List[Location]], None] | None = None,
+        spool_path: str | None = None,
+    ):
+        self.db_path = db_path
+        self.sources = get_sources() if sources is None else sources
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_event = on_event
+        self.on_added = on_added
+        self.spool_path = spool_path
+
+        self.stats: dict[str, SourceStats] = {
+            source.name: SourceStats() for source in self.sources
+        }
+        self.limiter = HostRateLimiter(host_interval)
+        # One pooled client per host
+        self._clients: dict[str, HttpClient] = {}
+        # sqlite3 connections can only be used by the thread that created them
+        self._db_executor: ThreadPoolExecutor | None = None
+        self._db_handle: database.SQLiteDBManager | None = None
+        self._spool: database.Spool | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop_event: asyncio.Event | None = None
+
+    def stop(self):
+        """Stop a running collector. Safe to call from any thread."""
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    async def run(self, duration: float | None = None):
+        """Poll the sources until stop() is called or duration seconds have
+        passed. Readings that were already fetched are written before returning.
+
+        :raises OSError: If the spool can't be opened.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._db_executor = ThreadPoolExecutor(max_workers=1)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        queue: asyncio.Queue = asyncio.Queue()
+        writer: asyncio.Task | None = None
+        pollers: list[asyncio.Task] = []
+
+        try:
+            if self.spool_path:
+                await self._loop.run_in_executor(self._db_executor, self._replay_spool)
+
+            writer = asyncio.create_task(self._write_batches(queue))
+            pollers = [
+                asyncio.create_task(self._poll(source, semaphore, queue))
+                for source in self.sources
+            ]
+
+            await asyncio.wait_for(self._stop_event.wait(), duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for poller in pollers:
+                poller.cancel()
+            await asyncio.gather(*pollers, return_exceptions=True)
+
+            if writer is not None:
+                queue.put_nowait(_STOP)
+                await writer
+
+            await self._loop.run_in_executor(self._db_executor, self._close_db)
+            self._db_executor.shutdown()
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+            self._stop_event = None
+
+    def _client(self, host: str) -> HttpClient:
+        client = self._clients.get(host)
+        if client is None:
+            client = HttpClient(pool_maxsize=self.max_concurrency)
+            self._clients[host] = client
+        return client
+
+    async def _poll(
+        self, source: Source, semaphore: asyncio.Semaphore, queue: asyncio.Queue
+    ):
+        """Poll a source at absolute deadlines. Deadlines that were missed
+        because of a slow fetch are skipped."""
+        stats = self.stats[source.name]
+        host = urlsplit(source.url).netloc
+        client = self._client(host)
+        sample_interval = round(source.interval)
+
+        deadline = self._loop.time()
+        while True:
+            now = self._loop.time()
+            if now - deadline >= source.interval:
+                missed = int((now - deadline) // source.interval)
+                stats.missed += missed
+                deadline += missed * source.interval
+            if deadline > now:
+                await asyncio.sleep(deadline - now)
+            deadline += source.interval
+
+            await self.limiter.wait(host)
+            async with semaphore:
+                try:
+                    locations = await asyncio.to_thread(
+                        self._fetch, source, client
+                    )
+                except Exception as err:
+                    stats.failures += 1
+                    self.on_event(
+                        f"Fetching {source.name} failed. "
+                        f"{type(err).__name__} occurred: {err}"
+                    )
+                    continue
+
+            stats.polls += 1
+            for location in locations:
+                queue.put_nowait((location, sample_interval))
+
+    def _fetch(self, source: Source, client: HttpClient) -> List[Location]:
+        """Fetch and parse a source. Runs in a worker thread."""
+        with spans.span("collect.fetch"):
+            response = client.get(source.url, budget=source.interval)
+        with spans.span("collect.parse"):
+            return source.parser(response)
+
+    async def _write_batches(self, queue: asyncio.Queue):
+        """Write queued readings in batches of up to batch_size readings. A batch
+        is written when it is full or flush_interval seconds after its first
+        reading."""
+        stopping = False
+
+        while not stopping:
+            item = await queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            flush_at = self._loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = await asyncio.wait_for(
+                        queue.get(), max(0.0, flush_at - self._loop.time())
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[tuple[Location, int]]):
+        readings = [
+            (
+                location.location_id,
+                location.location_name,
+                location.epoch_timestamp,
+                location.location_visitors,
+                sample_interval,
+            )
+            for location, sample_interval in batch
+        ]
+
+        try:
+            added = await self._loop.run_in_executor(
+                self._db_executor, self._write, readings
+            )
+        except Exception as err:
+            if self._spool is not None:
+                self.on_event(
+                    f"Database unavailable, {len(self._spool)} readings kept in "
+                    f"the spool. {type(err).__name__} occurred: {err}"
+                )
+            else:
+                self.on_event(
+                    f"Unable to add {len(readings)} readings to the database. "
+                    f"{type(err).__name__} occurred: {err}"
+                )
+            return
+
+        if self._spool is not None:
+            # Includes readings that were kept in the spool
+            self.on_event(f"Added {added} readings to the database.")
+        else:
+            self.on_event(f"Added {added}/{len(readings)} readings to the database.")
+        if self.on_added:
+            self.on_added([location for location, _ in batch])
+
+    @spans.timed("collect.write")
+    def _write(self, readings: List[tuple[int, str, int, int, int]]) -> int:
+        """Add readings to the database, through the spool if there is one.
+        Runs in the database thread."""
+        if self._spool is not None:
+            self._spool.append(readings)
+            return self._spool.drain(self._get_db())
+
+        return self._get_db().add_many_data(readings)
+
+    def _get_db(self) -> database.SQLiteDBManager:
+        if self._db_handle is None:
+            self._db_handle = database.SQLiteDBManager(self.db_path).connect()
+        return self._db_handle
+
+    def _replay_spool(self):
+        """Open the spool and add readings left from the previous run. Runs in
+        the database thread."""
+        self._spool = database.Spool(self.spool_path)
+        if not len(self._spool):
+            return
+
+        try:
+            added = self._spool.drain(self._get_db())
+        except Exception as err:
+            self.on_event(
+                f"Unable to replay {len(self._spool)} spooled readings. "
+                f"{type(err).__name__} occurred: {err}"
+            )
+            return
+
+        self.on_event(f"Replayed spool, added {added} readings to the database.")
+
+    def _close_db(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        if self._db_handle is not None:
+            self._db_handle.close()
+            self._db_handle = None
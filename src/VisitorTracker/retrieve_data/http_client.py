@@ -0,0 +1,129 @@
+import random
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+# HTTP status codes that are worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class BudgetExceeded(Exception):
+    """The request couldn't be completed within its time budget."""
+
+
+class HttpClient:
+    """HTTP client that keeps a pooled requests.Session open between requests,
+    so consecutive requests to the same host reuse the connection (no new TCP
+    and TLS handshake).
+
+    Transient failures (connection errors, timeouts and RETRY_STATUSES) are
+    retried with exponential backoff and full jitter. All attempts and waits
+    of a request fit in its time budget.
+
+    Use as a context manager or call `close()` when done.
+
+    :param timeout: Timeout of a single attempt in seconds, defaults to 10.
+    :type timeout: float, optional
+    :param retries: Retries after the first attempt, defaults to 3.
+    :type retries: int, optional
+    :param backoff: Base of the backoff in seconds, defaults to 0.5.
+        Wait before retry n is random between 0 and backoff * 2**n.
+    :type backoff: float, optional
+    :param max_backoff: Longest wait between attempts in seconds, defaults to 8.
+    :type max_backoff: float, optional
+    :param pool_maxsize: Connections kept open per host, defaults to 4.
+    :type pool_maxsize: int, optional
+    """
+
+    def __init__(
+        self,
+        timeout: float = 10,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 8,
+        pool_maxsize: int = 4,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_maxsize = pool_maxsize
+        self._session: "requests.Session | None" = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def session(self) -> "requests.Session":
+        """Session is created on first use to keep app startup fast."""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def get(self, url: str, budget: float | None = None) -> "requests.Response":
+        """GET url, retrying transient failures.
+
+        :param budget: Seconds that the request may take in total, including
+            retries. None only limits the attempts and their timeouts.
+        :type budget: float | None, optional
+        :raises BudgetExceeded: If the budget ran out before a response.
+        :raises requests.exceptions.RequestException: If the last attempt failed.
+        :return: Successful response.
+        :rtype: requests.Response
+        """
+        import requests
+
+        deadline = None if budget is None else time.monotonic() + budget
+
+        attempt = 0
+        while True:
+            timeout = self.timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    raise BudgetExceeded(f"No response from {url} within {budget} s")
+
+            try:
+                response = self.session.get(url, timeout=timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} for url: {url}", response=response
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as err:
+                error = err
+
+            if attempt == self.retries:
+                raise error
+
+            wait = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+            if deadline is not None and time.monotonic() + wait >= deadline:
+                raise BudgetExceeded(
+                    f"No response from {url} within {budget} s"
+                ) from error
+            time.sleep(wait)
+            attempt += 1
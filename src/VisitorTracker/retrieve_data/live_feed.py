@@ -0,0 +1,208 @@
+from collections import deque
+import threading
+from typing import Iterable, List
+
+from database.db_manager import KEEPALIVE_INTERVAL
+from retrieve_data.retrieve_data import Location
+
+
+class LiveFeed:
+    """Thread-safe in-memory ring buffer of the most recently collected samples.
+
+    The data collection thread publishes new samples to the feed and live graphs
+    read them from the feed without touching the database.
+
+    :param window: How many seconds of samples are kept for each location,
+        defaults to 48 hours.
+    :type window: int, optional
+    :param min_interval: Shortest possible collection interval in seconds. Used to
+        size the ring buffer, defaults to 30.
+    :type min_interval: int, optional
+    """
+
+    def __init__(self, window: int = 48 * 60 * 60, min_interval: int = 30):
+        self.window = window
+        # Active data collection interval in seconds. None if collection isn't active.
+        self.interval: int | None = None
+        self._maxlen = window // min_interval + 1
+        self._samples: dict[int, deque[tuple[int, int, int, bool]]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, location: Location, sample_interval: int, is_run: bool = False):
+        """Add a collected sample to the feed. sample_interval is the number of
+        seconds the sample represents, is_run if it was stored in "changes" mode.
+        Samples older than `window` seconds compared to the newest sample are
+        dropped."""
+        with self._lock:
+            samples = self._samples.setdefault(
+                location.location_id, deque(maxlen=self._maxlen)
+            )
+            samples.append(
+                (
+                    location.epoch_timestamp,
+                    location.location_visitors,
+                    sample_interval,
+                    is_run,
+                )
+            )
+
+            oldest_allowed = location.epoch_timestamp - self.window
+            while samples and samples[0][0] < oldest_allowed:
+                samples.popleft()
+
+    def get_since(
+        self, location_id: int, epoch: int
+    ) -> List[tuple[int, int, int, bool]]:
+        """Return samples of the location with a timestamp greater than `epoch`.
+
+        :return: list of (epoch_timestamp, location_visitors, sample_interval,
+            is_run) tuples in chronological order.
+        :rtype: List[tuple[int, int, int, bool]]
+        """
+        with self._lock:
+            samples = self._samples.get(location_id)
+            if not samples:
+                return []
+            return [sample for sample in samples if sample[0] > epoch]
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+class LiveSeries:
+    """Averages of a location's visitors in fixed intervals over a sliding
+    time window. The series is updated one sample at a time.
+
+    Samples are weighted by time like in "avg" aggregates of the database. A
+    sample represents its sample interval in the interval of its timestamp. A
+    sample stored as a run (in "changes" storage mode) is valid until the next
+    sample, unless data collection was stopped in between, and is split
+    between the intervals it overlaps (see helpers.make_runs()).
+
+    Intervals are anchored to `start`, so with samples from
+    `SQLiteDBManager.get_sampled_activity_between()` the values match the
+    values of
+    `SQLiteDBManager.get_data_by_mode(location_id, start, end, "avg", interval)`.
+
+    :param location_id: ID of the location.
+    :type location_id: int
+    :param start: Start of the window (inclusive) in epoch format.
+    :type start: int
+    :param end: End of the window (exclusive) in epoch format.
+    :type end: int
+    :param interval: Length of a single interval in seconds, defaults to 1 hour.
+    :type interval: int, optional
+    """
+
+    def __init__(self, location_id: int, start: int, end: int, interval: int = 60 * 60):
+        self.location_id = location_id
+        self.start = start
+        self.interval = interval
+        self.size = (end - start) // interval
+        # Visitor seconds and seconds of every interval
+        self.weighted_sums: List[int] = [0] * self.size
+        self.weights: List[int] = [0] * self.size
+        # Timestamp of the newest added sample
+        self.last_epoch = start - 1
+        # (epoch_timestamp, location_visitors, sample_interval) of the newest
+        # sample if it is a run. Added when the next sample ends it.
+        self._run: tuple[int, int, int] | None = None
+
+    @property
+    def end(self) -> int:
+        return self.start + self.size * self.interval
+
+    def add(self, epoch: int, visitors: int, sample_interval: int, is_run=False):
+        """Add a sample to the series. Slides the window forward if the sample
+        is newer than the end of the window. Samples older than the start of the
+        window are ignored, except for the part of a run that is in the window."""
+        if epoch >= self.end:
+            self.advance_to(epoch + 1)
+
+        self.last_epoch = max(self.last_epoch, epoch)
+
+        if self._run is not None:
+            run_epoch, run_visitors, run_interval = self._run
+            run_end = run_epoch + run_interval
+            if epoch - run_epoch <= KEEPALIVE_INTERVAL + run_interval:
+                run_end = epoch
+            self._add_span(
+                self.weighted_sums, self.weights, run_epoch, run_end, run_visitors
+            )
+            self._run = None
+
+        if is_run:
+            self._run = (epoch, visitors, sample_interval)
+            return
+
+        if epoch < self.start:
+            return
+
+        index = (epoch - self.start) // self.interval
+        self.weighted_sums[index] += visitors * sample_interval
+        self.weights[index] += sample_interval
+
+    def add_many(self, samples: Iterable[tuple[int, int, int, bool]]):
+        """Add (epoch_timestamp, location_visitors, sample_interval, is_run)
+        samples to the series."""
+        for epoch, visitors, sample_interval, is_run in samples:
+            self.add(epoch, visitors, sample_interval, is_run)
+
+    def advance_to(self, epoch: int):
+        """Slide the window forward by whole intervals until `epoch` is inside
+        the window. Old intervals are dropped and new empty intervals are added."""
+        if epoch < self.end:
+            return
+
+        shift = (epoch - self.end) // self.interval + 1
+        shift_kept = min(shift, self.size)
+
+        self.weighted_sums = self.weighted_sums[shift_kept:] + [0] * shift_kept
+        self.weights = self.weights[shift_kept:] + [0] * shift_kept
+        self.start += shift * self.interval
+
+    def timestamps(self) -> List[int]:
+        """Start timestamps of every interval in the window."""
+        return [self.start + i * self.interval for i in range(self.size)]
+
+    def averages(self) -> List[float | None]:
+        """Average visitors for every interval. None if interval has no samples.
+        The newest run is valid for its sample interval until the next sample
+        ends it."""
+        weighted_sums, weights = self.weighted_sums, self.weights
+        if self._run is not None:
+            run_epoch, run_visitors, run_interval = self._run
+            weighted_sums, weights = list(weighted_sums), list(weights)
+            self._add_span(
+                weighted_sums,
+                weights,
+                run_epoch,
+                run_epoch + run_interval,
+                run_visitors,
+            )
+
+        return [
+            weighted_sum / weight if weight else None
+            for weighted_sum, weight in zip(weighted_sums, weights)
+        ]
+
+    def _add_span(
+        self,
+        weighted_sums: List[int],
+        weights: List[int],
+        span_start: int,
+        span_end: int,
+        visitors: int,
+    ):
+        """Add visitors from span_start (inclusive) to span_end (exclusive) to
+        the intervals of the window that the span overlaps."""
+        span_start = max(span_start, self.start)
+        span_end = min(span_end, self.end)
+
+        while span_start < span_end:
+            index = (span_start - self.start) // self.interval
+            piece_end = min(span_end, self.start + (index + 1) * self.interval)
+            weighted_sums[index] += visitors * (piece_end - span_start)
+            weights[index] += piece_end - span_start
+            span_start = piece_end
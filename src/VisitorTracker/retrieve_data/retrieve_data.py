@@ -1,14 +1,17 @@
 from dataclasses import dataclass
 import json
-import time
-from typing import List
-
-import requests
+from typing import Iterator, List, TYPE_CHECKING
 
+from retrieve_data.http_client import HttpClient
+from retrieve_data.scheduler import TickScheduler
 import utils
+from utils.profiling import spans
+
+if TYPE_CHECKING:
+    import requests
 
 
-@dataclass
+@dataclass(slots=True)
 class Location:
     location_id: int
     location_name: str
@@ -16,24 +19,44 @@ class Location:
     location_visitors: int
 
 
-def _get_html(url: str | None = None) -> requests.models.Response:
+DEFAULT_URL = "https://funouluritaharju.fi/?controller=ajax&getentriescount=1&locationId=1"
+
+# Shared by calls that don't pass their own client, so the connection is reused
+_default_client: HttpClient | None = None
+
+
+def _get_client() -> HttpClient:
+    global _default_client
+    if _default_client is None:
+        _default_client = HttpClient()
+    return _default_client
+
+
+def _get_html(
+    url: str | None = None,
+    client: HttpClient | None = None,
+    budget: float | None = None,
+) -> "requests.models.Response":
     """Fetches the response object from the given URL.
 
     :param url: The URL to request. Defaults to a preset URL if None. Preset URL:
         "https://funouluritaharju.fi/?controller=ajax&getentriescount=1&locationId=1"
     :type url: str | None, optional
+    :param client: Client that makes the request. Defaults to a shared client.
+    :type client: HttpClient | None, optional
+    :param budget: Seconds the request may take including retries, defaults to
+        None (no limit besides the client's retries and timeouts)
+    :type budget: float | None, optional
     :return: The response object.
     :rtype: requests.models.Response
     """
     if not url:
-        url = "https://funouluritaharju.fi/?controller=ajax&getentriescount=1&locationId=1"
+        url = DEFAULT_URL
 
-    response = requests.get(url, timeout=10)
+    return (client or _get_client()).get(url, budget)
 
-    return response
 
-
-def _parse_locations_data(response: requests.models.Response) -> List[Location]:
+def _parse_locations_data(response: "requests.models.Response") -> List[Location]:
     """Parses location data from the response object and returns a list
     of Location objects.
 
@@ -63,8 +86,69 @@ def _parse_locations_data(response: requests.models.Response) -> List[Location]:
     return locations
 
 
+def iter_data_periodically(
+    duration: int,
+    interval: int,
+    max_batch_size: int | None = None,
+    url: str | None = None,
+    client: HttpClient | None = None,
+) -> Iterator[List[Location]]:
+    """Retrieves data for given 'duration' in given 'interval' and yields the
+    Location objects of every fetch as soon as they arrive. Nothing is kept
+    between fetches, so memory use stays flat however long the capture is.
+
+    Data is fetched at fixed deadlines (start + n * interval). If fetching takes
+    longer than the interval, the missed fetches are skipped.
+
+    Stream a capture straight into the database:
+
+        for batch in iter_data_periodically(24 * 60 * 60, 30):
+            db_handle.add_many_data([(loc.location_id, loc.location_name,
+                loc.epoch_timestamp, loc.location_visitors, 30) for loc in batch])
+
+    :param duration: Duration of data retrieval in seconds. (Must be greater than > 0)
+    :type duration: int
+    :param interval: Interval of data retrieval in seconds. (Must be greater than > 0)
+    :type interval: int
+    :param max_batch_size: Largest batch that is yielded. A fetch with more
+        locations is split into several batches. Defaults to None (one batch
+        per fetch).
+    :type max_batch_size: int | None, optional
+    :param url: The URL to request, defaults to the preset URL.
+    :type url: str | None, optional
+    :param client: Client that makes the requests, defaults to a shared client.
+    :type client: HttpClient | None, optional
+    :return: Batches of Location objects. Nothing if duration or interval was < 1.
+    :rtype: Iterator[List[Location]]
+    """
+    if duration < 1 or interval < 1:
+        return
+    if max_batch_size is not None and max_batch_size < 1:
+        raise ValueError("max_batch_size must be at least 1.")
+
+    scheduler = TickScheduler(interval)
+    end_time = scheduler.clock() + duration
+
+    # Continue fetching data until the end time is reached
+    for tick in scheduler:
+        if tick.deadline >= end_time:
+            break
+
+        # Fetching may not delay the next tick
+        locations = get_data(url, client, budget=interval)
+
+        if max_batch_size is None:
+            yield locations
+            continue
+
+        for start in range(0, len(locations), max_batch_size):
+            yield locations[start : start + max_batch_size]
+
+
 def get_data_periodically(duration: int, interval: int) -> List[Location]:
     """Retrieves data from a specific URL for given 'duration' in given 'interval'.
+    Returns when the whole duration is over. Use iter_data_periodically() to
+    get the data as it arrives.
 
     :param duration: Duration of data retrieval in seconds. (Must be greater than > 0)
     :type duration: int
@@ -74,34 +158,31 @@ def get_data_periodically(duration: int, interval: int) -> List[Location]:
         duration or interval was < 1.
     :rtype: List[Location]
     """
-    end_time = time.time() + duration
     location_data: List[Location] = []
 
-    if duration < 1 or interval < 1:
-        return location_data
-
-    # Continue fetching data until the end time is reached
-    while time.time() < end_time:
-        function_start = time.perf_counter()
-        hmtl = _get_html()
-        locations = _parse_locations_data(hmtl)
-        for location in locations:
-            location_data.append(location)
-
-        # Time it took took to execute data fetching
-        function_time = time.perf_counter() - function_start
-
-        # Wait for the specified interval before fetching data again
-        time.sleep(float(interval) - function_time)
+    for batch in iter_data_periodically(duration, interval):
+        location_data.extend(batch)
 
     return location_data
 
 
-def get_data() -> List[Location]:
+def get_data(
+    url: str | None = None,
+    client: HttpClient | None = None,
+    budget: float | None = None,
+) -> List[Location]:
+    """Fetches and parses the current visitors of all locations.
+
+    :param url: The URL to request, defaults to the preset URL.
+    :param client: Client that makes the request, defaults to a shared client.
+    :param budget: Seconds the request may take including retries.
+    """
     location_data: List[Location] = []
 
-    hmtl = _get_html()
-    locations = _parse_locations_data(hmtl)
+    with spans.span("collect.fetch"):
+        hmtl = _get_html(url, client, budget)
+    with spans.span("collect.parse"):
+        locations = _parse_locations_data(hmtl)
 
     for location in locations:
         location_data.append(location)
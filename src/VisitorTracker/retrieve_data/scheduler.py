@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+import threading
+import time
+from typing import Callable, Iterator
+
+
+@dataclass
+class Tick:
+    """A single tick of a TickScheduler.
+
+    :param number: Number of the tick, starting from 1.
+    :param deadline: Monotonic time when the tick was due.
+    :param lateness: Seconds between the deadline and the start of the tick.
+    :param missed: Ticks that were skipped before this tick because the
+        previous tick overran its interval.
+    """
+
+    number: int
+    deadline: float
+    lateness: float
+    missed: int
+
+
+class TickScheduler:
+    """Runs ticks at absolute deadlines on a monotonic clock.
+
+    Deadlines are `start + n * interval`, so the time spent in a tick doesn't
+    make the schedule drift. If a tick overruns one or more deadlines, those
+    ticks are skipped and counted instead of being run back to back.
+
+    Use from the thread that does the work:
+
+        scheduler = TickScheduler(30)
+        for tick in scheduler:
+            fetch()
+
+    and call `stop()` from any thread. A waiting scheduler stops immediately.
+
+    :param interval: Seconds between ticks.
+    :type interval: float
+    :param clock: Monotonic clock, defaults to time.monotonic.
+    :type clock: Callable[[], float], optional
+    """
+
+    def __init__(self, interval: float, clock: Callable[[], float] = time.monotonic):
+        if interval <= 0:
+            raise ValueError("Interval must be greater than 0.")
+
+        self.interval = interval
+        self.clock = clock
+        self._stop_event = threading.Event()
+        # Deadline of the next tick. First tick is due when waiting starts.
+        self._deadline: float | None = None
+
+        self.ticks = 0
+        self.missed = 0
+        self.max_lateness = 0.0
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def stop(self):
+        """Stop the scheduler. Safe to call from any thread."""
+        self._stop_event.set()
+
+    def reschedule(self, delay: float):
+        """Move the next deadline to `delay` seconds from now. Later deadlines
+        follow from it in steps of `interval`."""
+        self._deadline = self.clock() + max(0.0, delay)
+
+    def wait(self) -> Tick | None:
+        """Wait until the next deadline.
+
+        :return: The tick or None if the scheduler was stopped.
+        :rtype: Tick | None
+        """
+        if self._deadline is None:
+            self._deadline = self.clock()
+
+        remaining = self._deadline - self.clock()
+        if remaining > 0:
+            self._stop_event.wait(remaining)
+        if self.stopped:
+            return None
+
+        deadline = self._deadline
+        lateness = self.clock() - deadline
+
+        # Skip the deadlines that have already passed
+        missed = int(lateness // self.interval) if lateness >= self.interval else 0
+        deadline += missed * self.interval
+        lateness -= missed * self.interval
+
+        self.ticks += 1
+        self.missed += missed
+        self.max_lateness = max(self.max_lateness, lateness)
+        self._deadline = deadline + self.interval
+
+        return Tick(self.ticks, deadline, lateness, missed)
+
+    def __iter__(self) -> Iterator[Tick]:
+        while (tick := self.wait()) is not None:
+            yield tick
+
+    def summary(self) -> str:
+        return (
+            f"{self.ticks} ticks, {self.missed} missed, "
+            f"max lateness {self.max_lateness:.2f} s"
+        )
@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+from typing import Callable, List, TYPE_CHECKING
+
+from retrieve_data.retrieve_data import DEFAULT_URL, Location, _parse_locations_data
+
+if TYPE_CHECKING:
+    import requests
+
+
+@dataclass
+class Source:
+    """A website that visitor data is collected from.
+
+    Location IDs returned by the parser must be unique across all sources,
+    because every source writes to the same database.
+
+    :param name: Unique name of the source.
+    :param url: URL that is polled.
+    :param parser: Turns the response into Location objects.
+    :param interval: Seconds between polls, defaults to 30.
+    """
+
+    name: str
+    url: str
+    parser: Callable[["requests.Response"], List[Location]] = _parse_locations_data
+    interval: float = 30
+
+
+_registry: dict[str, Source] = {}
+
+
+def register_source(source: Source):
+    """Add a source to the registry. Replaces a source with the same name."""
+    _registry[source.name] = source
+
+
+def unregister_source(name: str):
+    _registry.pop(name, None)
+
+
+def get_source(name: str) -> Source:
+    """
+    :raises KeyError: If no source has the name.
+    """
+    return _registry[name]
+
+
+def get_sources() -> List[Source]:
+    """All registered sources in registration order."""
+    return list(_registry.values())
+
+
+register_source(Source("FUN Oulu", DEFAULT_URL))
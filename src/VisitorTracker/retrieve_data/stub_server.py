@@ -0,0 +1,210 @@
+"""Local stand-in for the visitor count endpoint.
+
+Serves a recorded entriesByLocation payload, so collectors can be tested and
+benchmarked without requests to funouluritaharju.fi. Only uses the standard
+library, so it can be run on its own:
+
+    python retrieve_data/stub_server.py --port 8765 --locations 50 --latency 0.05
+
+and the collector pointed at http://127.0.0.1:8765/.
+"""
+
+import argparse
+import copy
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import random
+import threading
+import time
+
+RECORDED_PAYLOAD = Path(__file__).parent / "example.json"
+
+
+class StubServer(ThreadingHTTPServer):
+    """HTTP server that answers every GET with the recorded payload.
+
+    :param port: Port to listen on, defaults to 0 (any free port).
+    :type port: int, optional
+    :param payload: Recorded response, defaults to example.json.
+    :type payload: dict | None, optional
+    :param locations: Number of locations in the response, defaults to the
+        locations of the payload. Extra locations are copies of the first one
+        with IDs counting up from the largest recorded ID.
+    :type locations: int | None, optional
+    :param latency: Seconds before each response, defaults to 0.
+    :type latency: float, optional
+    :param error_rate: Share of requests (0-1) answered with 503, defaults to 0.
+    :type error_rate: float, optional
+    :param start_epoch: Date header of the first response, defaults to None
+        (Date header is the current time).
+    :type start_epoch: int | None, optional
+    :param date_step: Seconds that the Date header advances after every
+        response when start_epoch is given, defaults to 30.
+    :type date_step: int, optional
+    :param change_rate: Chance (0-1) that a location's visitor count changes
+        between responses, defaults to 0.
+    :type change_rate: float, optional
+    :param seed: Seed of the random errors and changes, defaults to None.
+    :type seed: int | None, optional
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        payload: dict | None = None,
+        locations: int | None = None,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        start_epoch: int | None = None,
+        date_step: int = 30,
+        change_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        super().__init__(("127.0.0.1", port), _StubHandler)
+
+        if payload is None:
+            payload = json.loads(RECORDED_PAYLOAD.read_text(encoding="utf-8"))
+        self.entries = self._make_entries(payload["entriesByLocation"], locations)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.date_step = date_step
+        self.change_rate = change_rate
+        self.requests = 0
+        self.errors = 0
+
+        self._next_epoch = start_epoch
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @staticmethod
+    def _make_entries(recorded: list[dict], locations: int | None) -> list[dict]:
+        entries = copy.deepcopy(recorded)
+        if locations is None:
+            return entries
+
+        entries = entries[:locations]
+        next_id = max(entry["locationId"] for entry in recorded) + 1
+        while len(entries) < locations:
+            entry = copy.deepcopy(recorded[0])
+            entry["locationId"] = next_id
+            entry["locationName"] = f"{recorded[0]['locationName']} {next_id}"
+            entries.append(entry)
+            next_id += 1
+
+        return entries
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def start(self) -> "StubServer":
+        """Serve in a daemon thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def next_response(self) -> tuple[int, bytes, float]:
+        """Status, body and Date header (epoch) of the next response."""
+        with self._lock:
+            self.requests += 1
+
+            if self._next_epoch is None:
+                epoch = time.time()
+            else:
+                epoch = self._next_epoch
+                self._next_epoch += self.date_step
+
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return 503, b"", epoch
+
+            for entry in self.entries:
+                if self.change_rate and self._random.random() < self.change_rate:
+                    change = self._random.choice((-2, -1, 1, 2))
+                    entry["personEntries"] = max(0, entry["personEntries"] + change)
+
+            body = json.dumps(
+                {
+                    "entriesByLocation": self.entries,
+                    "entriesTotal": sum(e["personEntries"] for e in self.entries),
+                }
+            ).encode("utf-8")
+
+        return 200, body, epoch
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    # Headers and body are written separately. Without TCP_NODELAY the body
+    # waits for the client's delayed ACK (~40 ms).
+    disable_nagle_algorithm = True
+    server: StubServer
+
+    def do_GET(self):
+        status, body, self._epoch = self.server.next_response()
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def date_time_string(self, timestamp=None):
+        """Date header of the response."""
+        return formatdate(getattr(self, "_epoch", timestamp), usegmt=True)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--locations", type=int)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="0-1")
+    parser.add_argument(
+        "--start-epoch", type=int, help="Date header of the first response"
+    )
+    parser.add_argument("--date-step", type=int, default=30, help="seconds")
+    parser.add_argument("--change-rate", type=float, default=0.0, help="0-1")
+    args = parser.parse_args(argv)
+
+    server = StubServer(
+        args.port,
+        locations=args.locations,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        start_epoch=args.start_epoch,
+        date_step=args.date_step,
+        change_rate=args.change_rate,
+    )
+    print(f"Serving {len(server.entries)} locations at {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from configparser import ConfigParser
 from pathlib import Path
 
+import constants
 import database
 
 class Settings:
@@ -22,6 +23,15 @@ class Settings:
 
         self.ylim = (lower, upper)
         self.ymode = self.config.get("main", "ymode")
+        self.graph_layout = self.config.get(
+            "main", "graph_layout", fallback=constants.DEFAULT_GRAPH_LAYOUT
+        )
+        self.export_dpi = self.config.getint(
+            "main", "export_dpi", fallback=constants.DEFAULT_EXPORT_DPI
+        )
+        self.query_timeout = self.config.getint(
+            "main", "query_timeout", fallback=constants.DEFAULT_QUERY_TIMEOUT
+        )
 
     def _save(self, config_path):
         with open(config_path, "w", encoding="UTF-8") as f:
@@ -34,12 +44,20 @@ class Settings:
         self.config.set("default", "lower_ylim", str(-0.0001))
         self.config.set("default", "upper_ylim", str(None))
         self.config.set("default", "ymode", "Auto Limit")
+        self.config.set("default", "graph_layout", constants.DEFAULT_GRAPH_LAYOUT)
+        self.config.set("default", "export_dpi", str(constants.DEFAULT_EXPORT_DPI))
+        self.config.set(
+            "default", "query_timeout", str(constants.DEFAULT_QUERY_TIMEOUT)
+        )
 
         self.config.add_section("main")
         self.config.set("main", "db_path", database.DB_REL_PATH)
         self.config.set("main", "lower_ylim", str(-0.0001))
         self.config.set("main", "upper_ylim", str(None))
         self.config.set("main", "ymode", "Auto Limit")
+        self.config.set("main", "graph_layout", constants.DEFAULT_GRAPH_LAYOUT)
+        self.config.set("main", "export_dpi", str(constants.DEFAULT_EXPORT_DPI))
+        self.config.set("main", "query_timeout", str(constants.DEFAULT_QUERY_TIMEOUT))
 
         self._save(self.config_path)
 
@@ -53,12 +71,24 @@ class Settings:
     def _set_ymode(self, ymode: str):
         self.config.set("main", "ymode", ymode)
 
+    def _set_graph_layout(self, graph_layout: str):
+        self.config.set("main", "graph_layout", graph_layout)
+
+    def _set_export_dpi(self, export_dpi: int):
+        self.config.set("main", "export_dpi", str(export_dpi))
+
+    def _set_query_timeout(self, query_timeout: int):
+        self.config.set("main", "query_timeout", str(query_timeout))
+
     def update_all(self):
         """Update config.ini to match set Settings class variables
-        (db_path, ylim, ymode)"""
+        (db_path, ylim, ymode, graph_layout, export_dpi, query_timeout)"""
         self._set_db_path(self.db_path)
         self._set_ylim(str(self.ylim[0]), str(self.ylim[1]))
         self._set_ymode(self.ymode)
+        self._set_graph_layout(self.graph_layout)
+        self._set_export_dpi(self.export_dpi)
+        self._set_query_timeout(self.query_timeout)
 
         self._save(self.config_path)
 
@@ -77,8 +107,27 @@ class Settings:
     def get_default_ymode(self):
         return self.config.get("default", "ymode")
 
+    def get_default_graph_layout(self):
+        return self.config.get(
+            "default", "graph_layout", fallback=constants.DEFAULT_GRAPH_LAYOUT
+        )
+
+    def get_default_export_dpi(self) -> int:
+        return self.config.getint(
+            "default", "export_dpi", fallback=constants.DEFAULT_EXPORT_DPI
+        )
+
+    def get_default_query_timeout(self) -> int:
+        return self.config.getint(
+            "default", "query_timeout", fallback=constants.DEFAULT_QUERY_TIMEOUT
+        )
+
     def set_to_defaults(self):
-        """Set class variables (db_path, ylim, ymode) to default"""
+        """Set class variables (db_path, ylim, ymode, graph_layout, export_dpi,
+        query_timeout) to default"""
         self.db_path = self.get_default_db_path()
         self.ylim = self.get_default_ylim()
         self.ymode = self.get_default_ymode()
+        self.graph_layout = self.get_default_graph_layout()
+        self.export_dpi = self.get_default_export_dpi()
+        self.query_timeout = self.get_default_query_timeout()
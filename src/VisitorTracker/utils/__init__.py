@@ -1,4 +1,16 @@
 __all__ = ["helpers", "mylibrary"]
 
+import importlib
+
 from .helpers import *
-from .mylibrary import *
+
+
+def __getattr__(name):
+    # Widgets of mylibrary are imported on first use, so that helpers can be
+    # used without importing tkinter (headless reports).
+    mylibrary = importlib.import_module(".mylibrary", __name__)
+
+    try:
+        return getattr(mylibrary, name)
+    except AttributeError:
+        raise AttributeError(f"module 'utils' has no attribute '{name}'") from None
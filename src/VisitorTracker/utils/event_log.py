@@ -0,0 +1,79 @@
+from collections import deque
+import logging
+from logging.handlers import RotatingFileHandler
+import queue
+
+
+class EventLog:
+    """Thread-safe log of database events.
+
+    Any thread can `put()` entries. The Tk thread takes them with `drain()`
+    and shows them. Only the last `max_entries` entries are kept in memory.
+
+    When a log file is set with `set_file()`, entries are written to a rotating
+    log file instead of being queued for the widget, unless they are put with
+    `widget_only=True`.
+
+    :param max_entries: how many of the newest entries are kept, defaults to 500
+    :type max_entries: int, optional
+    """
+
+    def __init__(self, max_entries: int = 500):
+        self.entries: deque[str] = deque(maxlen=max_entries)
+        self._queue: queue.SimpleQueue[str] = queue.SimpleQueue()
+        self._logger = logging.getLogger(f"{__name__}.{id(self)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._handler: RotatingFileHandler | None = None
+
+    @property
+    def max_entries(self) -> int:
+        return self.entries.maxlen
+
+    @property
+    def file_path(self) -> str | None:
+        """Path of the log file or None if entries go to the widget."""
+        return self._handler.baseFilename if self._handler else None
+
+    def put(self, text: str, widget_only: bool = False):
+        """Add an entry. Safe to call from any thread. widget_only entries are
+        queued for the widget even when a log file is set (e.g. where the log
+        is written)."""
+        handler = self._handler
+        if handler is not None and not widget_only:
+            self._logger.info(text.strip())
+        else:
+            self._queue.put(text)
+
+    def drain(self, max_items: int = 200) -> list[str]:
+        """Take up to max_items queued entries in the order they were added.
+        Taken entries are added to `entries`."""
+        batch = []
+        try:
+            while len(batch) < max_items:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        self.entries.extend(batch)
+        return batch
+
+    def set_file(
+        self, file_path: str | None, max_bytes: int = 1_000_000, backup_count: int = 3
+    ):
+        """Write entries to a rotating log file instead of the widget.
+        None writes entries to the widget again."""
+        if self._handler is not None:
+            self._logger.removeHandler(self._handler)
+            self._handler.close()
+            self._handler = None
+
+        if file_path is None:
+            return
+
+        handler = RotatingFileHandler(
+            file_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self._logger.addHandler(handler)
+        self._handler = handler
@@ -1,14 +1,16 @@
 import calendar
 from datetime import datetime, timedelta
 import time
-from typing import Callable, Any
+from typing import Callable, Any, TYPE_CHECKING
 
 from dateutil.relativedelta import relativedelta
 import pytz
-import screeninfo
 
+if TYPE_CHECKING:
+    import screeninfo
 
-def get_monitor(x: int, y: int) -> screeninfo.Monitor:
+
+def get_monitor(x: int, y: int) -> "screeninfo.Monitor":
     """Retrieves Monitor of the given x- and y-coordinates.
 
     :param x int: x-coordinate
@@ -18,6 +20,8 @@ def get_monitor(x: int, y: int) -> screeninfo.Monitor:
     :return:
     :rtype: screeninfo.Monitor
     """
+    import screeninfo  # Imported on first use to keep app startup fast
+
     monitors = screeninfo.get_monitors()
 
     for monitor in reversed(monitors):
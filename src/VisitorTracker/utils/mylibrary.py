@@ -58,9 +58,37 @@ class CustomDateEntry(DateEntry):
         if dates is None:
             dates = []
         super().__init__(master, showothermonthdays=showothermonthdays, **kw)
+        # Month (year, month) that currently has calevents. None if dates have
+        # changed since the last highlight.
+        self._highlighted_month: tuple[int, int] | None = None
         self.dates = dates
         self.configure_size()
         self.bind("<Configure>", self.update_on_resize)  # Bind to the Configure event
+        self._calendar.bind(
+            "<<CalendarMonthChanged>>", lambda event: self.highlight_dates(), add="+"
+        )
+
+    @property
+    def dates(self) -> list[str]:
+        return self._dates
+
+    @dates.setter
+    def dates(self, dates: list[str]):
+        """Set dates that have data. Dates are indexed by month, so highlighting
+        a month only touches the dates of that month."""
+        self._dates = dates
+        self._dates_by_month: dict[tuple[int, int], set[datetime.date]] = {}
+
+        for date in dates:
+            day, month, year = (int(part) for part in date.split("-"))
+            self._dates_by_month.setdefault((year, month), set()).add(
+                datetime.date(year, month, day)
+            )
+
+        self._highlighted_month = None
+
+        if self._calendar.winfo_ismapped():
+            self.highlight_dates()
 
     def drop_down(self):
         """
@@ -89,6 +117,8 @@ class CustomDateEntry(DateEntry):
             self._top_cal.deiconify()
             self._calendar.focus_set()
             self._calendar.selection_set(date)
+            # Selection may have changed the displayed month
+            self.highlight_dates()
 
     def configure_size(self, de_font_smallness=7, cal_font_smallness=12):
         """
@@ -117,15 +147,24 @@ class CustomDateEntry(DateEntry):
         self._calendar.configure(font=self.custom_cal_font)
 
     def highlight_dates(self):
-        """Removes all calevents and then adds all dates in 'dates' variable
-        to the calendar as calevents"""
+        """Highlights dates of the displayed month that are in 'dates' variable.
+        Calevents of the previously highlighted month are removed.
+
+        Called when the calendar drops down or the displayed month changes, so
+        only one month of dates is ever added to the calendar as calevents.
+        """
+        month, year = self._calendar.get_displayed_month()
+
+        if (year, month) == self._highlighted_month:
+            return
+
         self._calendar.calevent_remove("all")
         tag_name = "Data"
-        for date in self.dates:
-            dt = datetime.datetime.strptime(date, "%d-%m-%Y")
-            self._calendar.calevent_create(dt, "Has Data", tag_name)
-
         self._calendar.tag_config(tag_name, background="#19a84c", foreground="white")
+        for date in sorted(self._dates_by_month.get((year, month), ())):
+            self._calendar.calevent_create(date, "Has Data", tag_name)
+
+        self._highlighted_month = (year, month)
 
     def update_on_resize(self, event=None):
         """Handle the resize event for the widget."""
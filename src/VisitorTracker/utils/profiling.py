@@ -0,0 +1,233 @@
+import bisect
+import contextlib
+import functools
+import json
+import math
+import sys
+import threading
+import time
+from typing import Callable
+
+
+class StartupProfiler:
+    """Records how long each startup step takes.
+
+    Call `mark(name)` after each step. The time since the previous mark is
+    recorded for the step. Marks are cheap, so they are always recorded and
+    only printed when asked (--profile-startup).
+
+    :param start: perf_counter() value when startup began, defaults to now
+    :type start: float | None, optional
+    """
+
+    def __init__(self, start: float | None = None):
+        self.start = time.perf_counter() if start is None else start
+        self._last = self.start
+        self.steps: list[tuple[str, float]] = []
+
+    def mark(self, name: str):
+        """Record the time since the previous mark as step `name`."""
+        now = time.perf_counter()
+        self.steps.append((name, now - self._last))
+        self._last = now
+
+    def total(self) -> float:
+        """Seconds from start to the last mark."""
+        return self._last - self.start
+
+    def report(self, file=None):
+        """Print the timing breakdown of the recorded steps."""
+        file = file or sys.stdout
+        width = max((len(name) for name, _ in self.steps), default=0)
+        width = max(width, len("total"))
+
+        print("Startup profile:", file=file)
+        for name, duration in self.steps:
+            print(f"  {name:<{width}}  {duration * 1000:8.1f} ms", file=file)
+        print(f"  {'total':<{width}}  {self.total() * 1000:8.1f} ms", file=file)
+        file.flush()
+
+
+# Upper bounds (seconds) of the histogram buckets: 10 µs to ~5 min, each
+# bucket sqrt(2) times wider than the previous one
+HISTOGRAM_BOUNDS = tuple(1e-5 * 2 ** (i / 2) for i in range(50))
+
+
+def _bucket_label(index: int) -> str:
+    """Upper bound of a histogram bucket in milliseconds."""
+    if index == len(HISTOGRAM_BOUNDS):
+        return "inf"
+    return f"{HISTOGRAM_BOUNDS[index] * 1000:.4g}"
+
+
+class Histogram:
+    """Durations in logarithmic buckets. Percentiles are estimated from the
+    buckets, so memory use doesn't grow with the number of samples."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        # Last bucket holds durations longer than the largest bound
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS, duration)] += 1
+
+    def percentile(self, q: float) -> float:
+        """Estimated q-th percentile (0-100) in seconds. Upper bound of the
+        bucket that the percentile falls in, limited to the largest duration."""
+        if not self.count:
+            return 0.0
+
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index, amount in enumerate(self.buckets):
+            seen += amount
+            if seen >= rank:
+                break
+
+        if index == len(HISTOGRAM_BOUNDS):
+            return self.max
+        return min(max(HISTOGRAM_BOUNDS[index], self.min), self.max)
+
+    def to_dict(self) -> dict:
+        """Summary in milliseconds."""
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "min_ms": round(self.min * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p90_ms": round(self.percentile(90) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class SpanRecorder:
+    """Timing spans of hot paths, aggregated into a histogram per span name.
+
+    Spans are recorded only while `enabled` is True. When disabled, `span()`
+    and functions decorated with `timed()` only check the flag, so the
+    instrumentation can stay in place. Spans can be recorded from any thread.
+
+    Example:
+        with spans.span("db.get_data_by_mode"):
+            ...
+
+        @spans.timed("graph.set_axes")
+        def _set_axes(self, graph_amount): ...
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.time()
+        self._histograms: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration: float):
+        """Add a duration in seconds to the histogram of span `name`."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(duration)
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """Time the with block as span `name`."""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator that times every call of the function as span `name`."""
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> dict[str, dict]:
+        """Summaries of the recorded spans (see Histogram.to_dict()) by span
+        name, sorted by name."""
+        with self._lock:
+            return {
+                name: self._histograms[name].to_dict()
+                for name in sorted(self._histograms)
+            }
+
+    def table(self) -> str:
+        """Span summaries as a text table, durations in milliseconds."""
+        snapshot = self.snapshot()
+        width = max((len(name) for name in snapshot), default=0)
+        width = max(width, len("span"))
+        columns = ("count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms")
+
+        lines = [
+            f"{'span':<{width}}"
+            + "".join(f"{column.removesuffix('_ms'):>10}" for column in columns)
+        ]
+        for name, summary in snapshot.items():
+            lines.append(
+                f"{name:<{width}}{summary['count']:>10}"
+                + "".join(f"{summary[column]:>10.3f}" for column in columns[1:])
+            )
+
+        return "\n".join(lines)
+
+    def export_json(self, path: str):
+        """Write the span summaries and histogram buckets to a JSON file."""
+        with self._lock:
+            spans_data = {
+                name: {
+                    **histogram.to_dict(),
+                    "buckets": {
+                        _bucket_label(index): amount
+                        for index, amount in enumerate(histogram.buckets)
+                        if amount
+                    },
+                }
+                for name, histogram in sorted(self._histograms.items())
+            }
+
+        data = {
+            "started": self.started,
+            "exported": time.time(),
+            "bucket_unit": "ms (upper bound)",
+            "spans": spans_data,
+        }
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+
+
+# Spans of the whole app. Enabled from the Performance page or with --profile.
+spans = SpanRecorder()